@@ -9,7 +9,10 @@ import yaml
 
 from src.common.defs.curation import CurationResult, DeltasResponse
 from src.common.defs.insight import BulletEvaluation, Insight, ReflectionResult
+from src.components.hybrid_search.search import HybridSearch
+from src.components.hybrid_search.sharded_search import ShardedSearch
 from src.components.llm_client.client import LLMClient
+from src.components.playbook_store.dedup import NearDuplicateIndex
 from src.components.playbook_store.models import Bullet, DeltaContextItem, Playbook
 from src.components.playbook_store.store import PlaybookStore
 
@@ -169,11 +172,16 @@ class CuratorPromptBuilder:
 class CuratorAgent:
     """InsightsからDelta Context Itemsを生成し、Playbookを更新するエージェント."""
 
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         llm_client: LLMClient,
         prompt_builder: CuratorPromptBuilder,
         playbook_store: PlaybookStore,
+        hybrid_search: HybridSearch | None = None,
+        duplicate_index: NearDuplicateIndex | None = None,
+        *,
+        sharded_search: ShardedSearch | None = None,
+        sidecar_rewrite_ratio: float | None = None,
     ) -> None:
         """CuratorAgentを初期化する.
 
@@ -181,10 +189,20 @@ class CuratorAgent:
             llm_client: LLMクライアント
             prompt_builder: プロンプト構築ビルダー
             playbook_store: Playbook永続化ストア
+            hybrid_search: Bulletの変更を反映する検索インデックス. Noneの場合は反映しない.
+            duplicate_index: ADDの近似重複を判定するインデックス. Noneの場合は判定しない.
+            sharded_search: データセットごとの検索. 指定した場合はhybrid_searchの代わりに
+                更新したデータセットのシャードへ変更を反映する.
+            sidecar_rewrite_ratio: embeddingサイドカーファイルを書き直す古い行の割合の閾値.
+                Noneの場合は更新のたびに書き直す.
         """
         self.llm_client = llm_client
         self.prompt_builder = prompt_builder
         self.playbook_store = playbook_store
+        self.hybrid_search = hybrid_search
+        self.duplicate_index = duplicate_index
+        self.sharded_search = sharded_search
+        self.sidecar_rewrite_ratio = sidecar_rewrite_ratio
 
     def run(
         self,
@@ -198,8 +216,9 @@ class CuratorAgent:
             2. InsightsからDelta Context Items生成（LLM使用）
             3. BulletEvaluationでカウンター更新
             4. Delta Context ItemsをPlaybookにマージ
-            5. PlaybookStoreで永続化
-            6. CurationResult生成・返却
+            5. PlaybookStoreで永続化（他の書き込みと競合した場合は最新のPlaybookに3〜4を適用し直す）
+            6. 保存した変更を検索インデックスと重複インデックスに反映
+            7. CurationResult生成・返却
 
         Args:
             reflection_result: ReflectionResult
@@ -224,21 +243,33 @@ class CuratorAgent:
                 dataset,
             )
 
-            # 4. BulletEvaluationでカウンター更新
-            self._apply_bullet_evaluations(
-                reflection_result.bullet_evaluations,
-                playbook,
-            )
+            # 4-5. カウンター更新・Delta Context Itemsのマージ・永続化
+            #      （他の書き込みと競合した場合は最新のPlaybookに適用し直す）
+            #      applyは再実行されるため、インデックスには触れず変更内容だけを記録する
+            if self.duplicate_index is not None:
+                self.duplicate_index.sync(playbook.bullets)
+            counters: list[tuple[str, int, int]] = []
+            upserted: list[Bullet] = []
+            removed: list[str] = []
+            skipped = 0
+
+            def apply(target: Playbook) -> None:
+                nonlocal counters, upserted, removed, skipped
+                counters = self._apply_bullet_evaluations(
+                    reflection_result.bullet_evaluations,
+                    target,
+                )
+                upserted, removed, skipped = self._merge_deltas(deltas, target)
 
-            # 5. Delta Context ItemsをPlaybookにマージ
-            self._merge_deltas(deltas, playbook)
+            playbook = self.playbook_store.update(dataset, apply, playbook)
 
-            # 6. PlaybookStoreで永続化
-            self.playbook_store.save(dataset, playbook)
+            # 6. 保存した試行の変更だけをインデックスに反映
+            self._update_indexes(dataset, playbook, counters, upserted, removed)
+            self._save_embeddings(dataset, playbook)
 
             # 7. CurationResultを生成
             bullets_after = len(playbook.bullets)
-            summary = self._generate_summary(deltas)
+            summary = self._generate_summary(deltas, skipped)
 
             return CurationResult(
                 deltas=deltas,
@@ -306,18 +337,22 @@ class CuratorAgent:
         self,
         bullet_evaluations: list[BulletEvaluation],
         playbook: Playbook,
-    ) -> None:
+    ) -> list[tuple[str, int, int]]:
         """BulletEvaluationに基づいてPlaybook内のBulletカウンターを更新する.
 
         Args:
             bullet_evaluations: BulletEvaluationリスト
             playbook: Playbook
+
+        Returns:
+            (Bullet ID, helpfulの加算値, harmfulの加算値) のリスト
         """
         if not bullet_evaluations:
             logger.info("No bullet evaluations to apply")
-            return
+            return []
 
         bullet_map = {bullet.id: bullet for bullet in playbook.bullets}
+        counters: list[tuple[str, int, int]] = []
 
         for evaluation in bullet_evaluations:
             if evaluation.bullet_id not in bullet_map:
@@ -331,28 +366,52 @@ class CuratorAgent:
 
             if evaluation.tag == "helpful":
                 bullet.helpful += 1
+                counters.append((bullet.id, 1, 0))
             elif evaluation.tag == "harmful":
                 bullet.harmful += 1
+                counters.append((bullet.id, 0, 1))
+
+        return counters
 
     def _merge_deltas(
         self,
         deltas: list[DeltaContextItem],
         playbook: Playbook,
-    ) -> None:
+    ) -> tuple[list[Bullet], list[str], int]:
         """Delta Context ItemsをPlaybookに適用する.
 
+        重複インデックスがある場合、既存のBulletまたはこのマージで追加・更新したBulletに
+        近似重複するADDはスキップする.
+
         Args:
             deltas: DeltaContextItemリスト
             playbook: Playbook
+
+        Returns:
+            (追加・更新したBulletリスト, 削除したBullet IDリスト, 近似重複でスキップしたADDの数)
         """
         if not deltas:
             logger.info("No deltas to merge")
-            return
+            return [], [], 0
 
         bullet_map = {bullet.id: bullet for bullet in playbook.bullets}
+        upserted: list[Bullet] = []
+        removed: list[str] = []
+        skipped = 0
+        pending = self._new_pending_index()
 
         for delta in deltas:
             if delta.type == "ADD":
+                duplicate_id = self._find_duplicate(delta.content, bullet_map, pending)
+                if duplicate_id is not None:
+                    logger.warning(
+                        "Skipped ADD as a near-duplicate of bullet %s: %s",
+                        duplicate_id,
+                        delta.content,
+                    )
+                    skipped += 1
+                    continue
+
                 new_bullet = Bullet(
                     id=self._generate_bullet_id(),
                     section=delta.section,
@@ -364,6 +423,8 @@ class CuratorAgent:
                     source_trajectory="",
                 )
                 playbook.bullets.append(new_bullet)
+                upserted.append(new_bullet)
+                self._track_pending(pending, new_bullet.id, new_bullet.content)
                 logger.info("Added new bullet: %s", new_bullet.id)
 
             elif delta.type == "UPDATE":
@@ -377,6 +438,8 @@ class CuratorAgent:
                 bullet = bullet_map[delta.bullet_id]
                 bullet.content = delta.content
                 bullet.searchable_text = delta.content
+                upserted.append(bullet)
+                self._track_pending(pending, bullet.id, bullet.content)
                 logger.info("Updated bullet: %s", delta.bullet_id)
 
             elif delta.type == "DELETE":
@@ -390,8 +453,140 @@ class CuratorAgent:
                 playbook.bullets = [
                     b for b in playbook.bullets if b.id != delta.bullet_id
                 ]
+                del bullet_map[delta.bullet_id]
+                removed.append(delta.bullet_id)
+                self._track_pending(pending, delta.bullet_id, None)
                 logger.info("Deleted bullet: %s", delta.bullet_id)
 
+        return upserted, removed, skipped
+
+    def _save_embeddings(self, dataset: str, playbook: Playbook) -> None:
+        """検索インデックスのembeddingをPlaybookのサイドカーファイルに保存する.
+
+        サイドカーファイルに無い・古くなった行がsidecar_rewrite_ratio以下の場合は書き直さない.
+        保存に失敗してもPlaybookの更新は有効なため、例外はログ出力のみとする.
+
+        Args:
+            dataset: データセット名
+            playbook: 保存済みのPlaybook
+        """
+        search = self._search_for(dataset)
+        if search is None:
+            return
+
+        try:
+            search.save_embeddings(
+                self.playbook_store.embeddings_path(dataset),
+                playbook,
+                min_stale_ratio=self.sidecar_rewrite_ratio,
+            )
+        except Exception:
+            logger.exception("Failed to save playbook embeddings for dataset '%s'", dataset)
+
+    def _new_pending_index(self) -> NearDuplicateIndex | None:
+        """1回のマージで追加・更新したBulletを登録する、重複インデックスと同じ設定の空のインデックスを返す.
+
+        Returns:
+            空のNearDuplicateIndex. 重複インデックスがない場合はNone.
+        """
+        if self.duplicate_index is None:
+            return None
+        return NearDuplicateIndex(
+            num_perm=self.duplicate_index.num_perm,
+            bands=self.duplicate_index.bands,
+            threshold=self.duplicate_index.threshold,
+            shingle_size=self.duplicate_index.shingle_size,
+        )
+
+    @staticmethod
+    def _track_pending(pending: NearDuplicateIndex | None, bullet_id: str, content: str | None) -> None:
+        """このマージで追加・更新・削除したBulletをpendingに反映する.
+
+        Args:
+            pending: このマージで追加・更新したBulletのインデックス. Noneの場合は何もしない.
+            bullet_id: Bullet ID
+            content: 追加・更新後のBullet本文. 削除した場合はNone.
+        """
+        if pending is None:
+            return
+        if content is None:
+            pending.remove(bullet_id)
+        else:
+            pending.add(bullet_id, content)
+
+    def _find_duplicate(
+        self,
+        content: str,
+        bullet_map: dict[str, Bullet],
+        pending: NearDuplicateIndex | None,
+    ) -> str | None:
+        """追加候補の本文に近似重複する既存のBulletを探す.
+
+        重複インデックスは読み込み時のPlaybookと同期しているため、このマージで追加・更新したBulletは
+        pendingで判定し、重複インデックスの一致はPlaybookに残っていてこのマージで更新していない
+        Bulletだけを採用する. 重複インデックス自体は変更しない.
+
+        Args:
+            content: 追加候補のBullet本文
+            bullet_map: マージ中のPlaybookのBullet IDからBulletへのdict
+            pending: このマージで追加・更新したBulletのインデックス
+
+        Returns:
+            近似重複するBullet ID. 重複がないか重複インデックスがない場合はNone.
+        """
+        if self.duplicate_index is None or pending is None:
+            return None
+        duplicate_id = pending.find_duplicate(content)
+        if duplicate_id is not None:
+            return duplicate_id
+        return next(
+            (i for i, _ in self.duplicate_index.query(content) if i in bullet_map and i not in pending),
+            None,
+        )
+
+    def _search_for(self, dataset: str) -> HybridSearch | None:
+        """データセットの変更を反映する検索インデックスを返す.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            sharded_searchがある場合はデータセットのシャード、無い場合はhybrid_search
+        """
+        if self.sharded_search is not None:
+            return self.sharded_search.shard(dataset)
+        return self.hybrid_search
+
+    def _update_indexes(
+        self,
+        dataset: str,
+        playbook: Playbook,
+        counters: list[tuple[str, int, int]],
+        upserted: list[Bullet],
+        removed: list[str],
+    ) -> None:
+        """保存した変更を検索インデックスと重複インデックスに反映する.
+
+        カウンターを先に加算し、その後に追加・更新したBulletを書き込むため、
+        同じBulletのカウンターが二重に加算されることはない.
+
+        Args:
+            dataset: データセット名
+            playbook: 保存済みのPlaybook
+            counters: (Bullet ID, helpfulの加算値, harmfulの加算値) のリスト
+            upserted: 追加・更新したBulletリスト
+            removed: 削除したBullet IDリスト
+        """
+        search = self._search_for(dataset)
+        if search is not None:
+            for bullet_id, helpful, harmful in counters:
+                search.increment_counters(bullet_id, helpful=helpful, harmful=harmful)
+            current = {bullet.id for bullet in playbook.bullets}
+            search.upsert_bullets(list({b.id: b for b in upserted if b.id in current}.values()))
+            search.remove_bullets([i for i in removed if i not in current])
+        if self.duplicate_index is not None:
+            self.duplicate_index.sync(playbook.bullets)
+
     def _load_sections(self, dataset: str) -> list[dict]:
         """config/sections.yamlからセクション定義を読み込む.
 
@@ -429,11 +624,12 @@ class CuratorAgent:
         """
         return str(uuid.uuid4())
 
-    def _generate_summary(self, deltas: list[DeltaContextItem]) -> str:
+    def _generate_summary(self, deltas: list[DeltaContextItem], skipped: int = 0) -> str:
         """処理サマリーを生成する.
 
         Args:
             deltas: DeltaContextItemリスト
+            skipped: 近似重複でスキップしたADDの数
 
         Returns:
             サマリー文字列
@@ -442,4 +638,7 @@ class CuratorAgent:
         update_count = sum(1 for d in deltas if d.type == "UPDATE")
         delete_count = sum(1 for d in deltas if d.type == "DELETE")
 
-        return f"ADD: {add_count}, UPDATE: {update_count}, DELETE: {delete_count}"
+        summary = f"ADD: {add_count}, UPDATE: {update_count}, DELETE: {delete_count}"
+        if skipped:
+            summary += f", SKIPPED_DUPLICATE_ADD: {skipped}"
+        return summary
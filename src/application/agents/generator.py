@@ -7,8 +7,9 @@ from pathlib import Path
 from pydantic import BaseModel, Field
 
 from src.common.defs.trajectory import Trajectory
-from src.components.hybrid_search.models import SearchQuery
+from src.components.hybrid_search.models import SearchQuery, SearchResult
 from src.components.hybrid_search.search import HybridSearch
+from src.components.hybrid_search.sharded_search import ShardedSearch
 from src.components.llm_client.client import LLMClient
 from src.components.playbook_store.models import Bullet, Playbook
 from src.components.playbook_store.store import PlaybookStore
@@ -122,14 +123,23 @@ class PromptBuilder:
 
 
 class GeneratorAgent:
-    """タスク実行・推論を行うエージェント."""
+    """タスク実行・推論を行うエージェント.
 
-    def __init__(
+    search_datasetsを指定した場合、関連Bulletは実行対象のデータセットのPlaybookではなく、
+    指定した複数データセットのPlaybookからShardedSearchで横断検索する.
+    sharded_searchを指定した場合、実行対象のデータセットの検索にもデータセットごとのシャードを使うため、
+    データセットを切り替えてもインデックスを作り直さず、他のデータセットの更新も混ざらない.
+    """
+
+    def __init__(  # noqa: PLR0913
         self,
         playbook_store: PlaybookStore,
         hybrid_search: HybridSearch,
         llm_client: LLMClient,
         prompt_builder: PromptBuilder,
+        *,
+        sharded_search: ShardedSearch | None = None,
+        search_datasets: list[str] | None = None,
     ) -> None:
         """GeneratorAgentを初期化する.
 
@@ -138,13 +148,30 @@ class GeneratorAgent:
             hybrid_search: ハイブリッド検索エンジン
             llm_client: LLMクライアント
             prompt_builder: プロンプト構築ビルダー
+            sharded_search: データセットごとのシャード検索. search_datasets指定時は必須で、
+                指定した場合は単一データセットの検索にもhybrid_searchの代わりに使う.
+            search_datasets: 横断検索するデータセット名リスト. Noneまたは空の場合は横断検索しない.
+
+        Raises:
+            ValueError: search_datasetsを指定してsharded_searchを指定しなかった場合
         """
+        if search_datasets and sharded_search is None:
+            msg = "sharded_search is required when search_datasets is given"
+            raise ValueError(msg)
+
         self.playbook_store = playbook_store
         self.hybrid_search = hybrid_search
         self.llm_client = llm_client
         self.prompt_builder = prompt_builder
+        self.sharded_search = sharded_search
+        self.search_datasets = search_datasets or None
 
-    def run(self, query: str, dataset: str) -> Trajectory:
+    def run(
+        self,
+        query: str,
+        dataset: str,
+        search_results: list[SearchResult] | None = None,
+    ) -> Trajectory:
         """クエリを実行しTrajectoryを返す.
 
         処理フロー:
@@ -157,6 +184,7 @@ class GeneratorAgent:
         Args:
             query: 入力クエリ
             dataset: データセット名
+            search_results: `search_many` で事前に取得した検索結果. 指定時は1〜2をスキップする.
 
         Returns:
             推論過程を記録したTrajectory
@@ -165,11 +193,17 @@ class GeneratorAgent:
         used_bullet_ids: list[str] = []
 
         try:
-            reasoning_steps.append(f"Playbookを読み込み中: dataset={dataset}")
-            playbook = self.playbook_store.load(dataset)
-
-            reasoning_steps.append("ハイブリッド検索で関連知識を取得中")
-            search_results = self._search_playbook(query, playbook)
+            if search_results is None and self.search_datasets:
+                reasoning_steps.append(f"複数データセットを横断検索中: datasets={','.join(self.search_datasets)}")
+                search_results = self._search_shards([query])[0]
+            elif search_results is None:
+                reasoning_steps.append(f"Playbookを読み込み中: dataset={dataset}")
+                playbook = self.playbook_store.load(dataset)
+
+                reasoning_steps.append("ハイブリッド検索で関連知識を取得中")
+                search_results = self._search_playbook(query, playbook, dataset)
+            else:
+                reasoning_steps.append("事前に検索済みの関連知識を使用")
             used_bullet_ids = [result.bullet.id for result in search_results]
             bullets = [result.bullet for result in search_results]
 
@@ -208,22 +242,69 @@ class GeneratorAgent:
                 error_message=error_message,
             )
 
+    def search_many(self, queries: list[str], dataset: str) -> list[list[SearchResult]]:
+        """複数クエリの関連Bulletをまとめて検索する.
+
+        Args:
+            queries: 入力クエリリスト
+            dataset: データセット名. search_datasets指定時は使わない.
+
+        Returns:
+            queriesと同順の検索結果リスト
+        """
+        if self.search_datasets:
+            return self._search_shards(queries)
+        playbook = self.playbook_store.load(dataset)
+        search_queries = [SearchQuery(query_text=query, top_k=10) for query in queries]
+        return self._search_for(dataset).search_many(search_queries, playbook)
+
+    def _search_for(self, dataset: str) -> HybridSearch:
+        """データセットの検索に使うHybridSearchを返す.
+
+        sharded_searchがある場合はデータセットのシャード、無い場合はhybrid_searchに
+        データセットのサイドカーファイルを読み込ませて返す.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            データセットを検索するHybridSearch
+        """
+        if self.sharded_search is not None:
+            return self.sharded_search.shard(dataset)
+        self.hybrid_search.load_embeddings(self.playbook_store.embeddings_path(dataset))
+        return self.hybrid_search
+
+    def _search_shards(self, queries: list[str]) -> list[list[SearchResult]]:
+        """search_datasetsのPlaybookを横断して関連Bulletを検索する.
+
+        Args:
+            queries: 入力クエリリスト
+
+        Returns:
+            queriesと同順の、全データセットを通した上位の検索結果リスト
+        """
+        search_queries = [SearchQuery(query_text=query, top_k=10) for query in queries]
+        return self.sharded_search.search_many(search_queries, self.search_datasets)
+
     def _search_playbook(
         self,
         query: str,
         playbook: Playbook,
+        dataset: str,
     ) -> list:
         """Playbookから関連Bulletを検索する.
 
         Args:
             query: 検索クエリ
             playbook: Playbook
+            dataset: データセット名
 
         Returns:
             検索結果のリスト
         """
         search_query = SearchQuery(query_text=query, top_k=10)
-        return self.hybrid_search.search(search_query, playbook)
+        return self._search_for(dataset).search(search_query, playbook)
 
     def _invoke_llm(self, prompt: str) -> GenerationResponse:
         """LLMにプロンプトを送信し構造化された応答を取得する.
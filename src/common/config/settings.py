@@ -1,6 +1,7 @@
 """アプリケーション設定の管理."""
 
 import os
+from typing import Literal
 
 from pydantic import BaseModel, Field
 
@@ -18,18 +19,51 @@ class EmbeddingConfig(BaseModel):
 
     model: str = "text-embedding-3-small"
     api_key: str = ""
+    dimension: int = Field(default=256, ge=1)
+    simulated_latency_ms: float = Field(default=0.0, ge=0.0)
+    cache_dir: str = "data/embeddings"
+    query_cache_size: int = Field(default=1024, ge=0)
+    persist_queries: bool = False
+    query_batching: Literal["off", "coalesce"] = "off"
+    query_batch_max_size: int = Field(default=64, ge=1)
+    query_batch_max_wait_ms: float = Field(default=5.0, ge=0.0)
+    bulk_max_chunk_tokens: int = Field(default=8000, ge=1)
+    bulk_max_chunk_size: int = Field(default=256, ge=1)
+    bulk_max_concurrency: int = Field(default=4, ge=1)
+    bulk_max_retries: int = Field(default=3, ge=0)
 
 
 class PlaybookConfig(BaseModel):
     """Playbook永続化設定."""
 
     data_dir: str = "data/playbooks"
+    backend: Literal["json", "log", "sqlite"] = "json"
+    file_format: Literal["json", "arrow"] = "json"
+    cache: Literal["off", "memory"] = "off"
+    log_compact_threshold: int = Field(default=1000, ge=1)
+    sqlite_path: str | None = None
+    dedup_threshold: float | None = Field(default=None, ge=0.0, le=1.0)
+    dedup_num_perm: int = Field(default=128, ge=1)
+    dedup_bands: int = Field(default=16, ge=1)
 
 
 class SearchConfig(BaseModel):
     """検索設定."""
 
     alpha: float = Field(default=0.5, ge=0.0, le=1.0)
+    vector_search: Literal["exact", "approximate"] = "exact"
+    ann_n_lists: int = Field(default=256, ge=1)
+    ann_n_probe: int = Field(default=8, ge=1)
+    ann_min_train_size: int = Field(default=10000, ge=1)
+    embedding_dtype: Literal["float16", "int8"] = "float16"
+    fusion: Literal["linear", "rrf", "zscore"] = "linear"
+    rrf_k: int = Field(default=60, ge=1)
+    reduction: Literal["none", "truncate", "pca"] = "none"
+    reduced_dimension: int = Field(default=256, ge=1)
+    pca_min_fit_size: int = Field(default=1000, ge=1)
+    result_cache_size: int = Field(default=1024, ge=0)
+    shard_max_workers: int = Field(default=4, ge=1)
+    sidecar_rewrite_ratio: float = Field(default=0.1, ge=0.0)
 
 
 class AppConfig(BaseModel):
@@ -56,11 +90,44 @@ def load_config() -> AppConfig:
         embedding=EmbeddingConfig(
             model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
             api_key=os.getenv("OPENAI_API_KEY", ""),
+            dimension=int(os.getenv("EMBEDDING_DIMENSION", "256")),
+            simulated_latency_ms=float(os.getenv("EMBEDDING_SIMULATED_LATENCY_MS", "0")),
+            cache_dir=os.getenv("EMBEDDING_CACHE_DIR", "data/embeddings"),
+            query_cache_size=int(os.getenv("EMBEDDING_QUERY_CACHE_SIZE", "1024")),
+            persist_queries=os.getenv("EMBEDDING_PERSIST_QUERIES", "false").lower() == "true",
+            query_batching=os.getenv("EMBEDDING_QUERY_BATCHING", "off"),
+            query_batch_max_size=int(os.getenv("EMBEDDING_QUERY_BATCH_MAX_SIZE", "64")),
+            query_batch_max_wait_ms=float(os.getenv("EMBEDDING_QUERY_BATCH_MAX_WAIT_MS", "5.0")),
+            bulk_max_chunk_tokens=int(os.getenv("EMBEDDING_BULK_MAX_CHUNK_TOKENS", "8000")),
+            bulk_max_chunk_size=int(os.getenv("EMBEDDING_BULK_MAX_CHUNK_SIZE", "256")),
+            bulk_max_concurrency=int(os.getenv("EMBEDDING_BULK_MAX_CONCURRENCY", "4")),
+            bulk_max_retries=int(os.getenv("EMBEDDING_BULK_MAX_RETRIES", "3")),
         ),
         playbook=PlaybookConfig(
             data_dir=os.getenv("PLAYBOOK_DATA_DIR", "data/playbooks"),
+            backend=os.getenv("PLAYBOOK_BACKEND", "json"),
+            file_format=os.getenv("PLAYBOOK_FILE_FORMAT", "json"),
+            cache=os.getenv("PLAYBOOK_CACHE", "off"),
+            log_compact_threshold=int(os.getenv("PLAYBOOK_LOG_COMPACT_THRESHOLD", "1000")),
+            sqlite_path=os.getenv("PLAYBOOK_SQLITE_PATH"),
+            dedup_threshold=float(threshold) if (threshold := os.getenv("PLAYBOOK_DEDUP_THRESHOLD")) else None,
+            dedup_num_perm=int(os.getenv("PLAYBOOK_DEDUP_NUM_PERM", "128")),
+            dedup_bands=int(os.getenv("PLAYBOOK_DEDUP_BANDS", "16")),
         ),
         search=SearchConfig(
             alpha=float(os.getenv("SEARCH_ALPHA", "0.5")),
+            vector_search=os.getenv("SEARCH_VECTOR_SEARCH", "exact"),
+            ann_n_lists=int(os.getenv("SEARCH_ANN_N_LISTS", "256")),
+            ann_n_probe=int(os.getenv("SEARCH_ANN_N_PROBE", "8")),
+            ann_min_train_size=int(os.getenv("SEARCH_ANN_MIN_TRAIN_SIZE", "10000")),
+            embedding_dtype=os.getenv("SEARCH_EMBEDDING_DTYPE", "float16"),
+            fusion=os.getenv("SEARCH_FUSION", "linear"),
+            rrf_k=int(os.getenv("SEARCH_RRF_K", "60")),
+            reduction=os.getenv("SEARCH_REDUCTION", "none"),
+            reduced_dimension=int(os.getenv("SEARCH_REDUCED_DIMENSION", "256")),
+            pca_min_fit_size=int(os.getenv("SEARCH_PCA_MIN_FIT_SIZE", "1000")),
+            result_cache_size=int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "1024")),
+            shard_max_workers=int(os.getenv("SEARCH_SHARD_MAX_WORKERS", "4")),
+            sidecar_rewrite_ratio=float(os.getenv("SEARCH_SIDECAR_REWRITE_RATIO", "0.1")),
         ),
     )
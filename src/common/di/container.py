@@ -2,7 +2,6 @@
 
 from dependency_injector import containers, providers
 from langchain_core.language_models import BaseChatModel
-from langchain_openai import OpenAIEmbeddings
 
 from src.application.agents.curator import CuratorAgent, CuratorPromptBuilder
 from src.application.agents.generator import GeneratorAgent, PromptBuilder
@@ -14,9 +13,21 @@ from src.common.config.app_config_loader import (
     AppConfigLoader,
     build_chat_model_registry,
 )
+from src.components.hybrid_search.ann_index import IVFIndex
+from src.components.hybrid_search.bulk_embedder import BulkEmbedder
+from src.components.hybrid_search.embedding_batcher import QueryEmbeddingBatcher
+from src.components.hybrid_search.embedding_cache import EmbeddingCache
 from src.components.hybrid_search.embedding_client import EmbeddingClient
+from src.components.hybrid_search.local_embeddings import create_embedding_model
+from src.components.hybrid_search.reduction import PCAReducer, TruncationReducer
+from src.components.hybrid_search.result_cache import SearchResultCache
 from src.components.hybrid_search.search import HybridSearch
+from src.components.hybrid_search.sharded_search import ShardedSearch
 from src.components.llm_client.client import LLMClient, create_chat_model
+from src.components.playbook_store.cached_store import CachedPlaybookStore
+from src.components.playbook_store.dedup import create_duplicate_index
+from src.components.playbook_store.log_store import LoggedPlaybookStore
+from src.components.playbook_store.sqlite_store import SQLitePlaybookStore
 from src.components.playbook_store.store import PlaybookStore
 
 
@@ -46,25 +57,139 @@ class Container(containers.DeclarativeContainer):
     )
 
     embedding_model = providers.Singleton(
-        OpenAIEmbeddings,
+        create_embedding_model,
         model=config.embedding.model,
         api_key=config.embedding.api_key,
+        dimension=config.embedding.dimension,
+        latency_ms=config.embedding.simulated_latency_ms,
     )
 
-    playbook_store = providers.Singleton(
-        PlaybookStore,
-        data_dir=config.playbook.data_dir,
+    playbook_store = providers.Selector(
+        config.playbook.backend,
+        json=providers.Selector(
+            config.playbook.cache,
+            off=providers.Singleton(
+                PlaybookStore,
+                data_dir=config.playbook.data_dir,
+                file_format=config.playbook.file_format,
+            ),
+            memory=providers.Singleton(
+                CachedPlaybookStore,
+                data_dir=config.playbook.data_dir,
+                file_format=config.playbook.file_format,
+            ),
+        ),
+        log=providers.Singleton(
+            LoggedPlaybookStore,
+            data_dir=config.playbook.data_dir,
+            compact_threshold=config.playbook.log_compact_threshold,
+            file_format=config.playbook.file_format,
+        ),
+        sqlite=providers.Singleton(
+            SQLitePlaybookStore,
+            data_dir=config.playbook.data_dir,
+            db_path=config.playbook.sqlite_path,
+        ),
+    )
+
+    # 近似重複の閾値が未設定の場合はNone（CuratorはADDの重複判定を行わない）
+    duplicate_index = providers.Singleton(
+        create_duplicate_index,
+        threshold=config.playbook.dedup_threshold,
+        num_perm=config.playbook.dedup_num_perm,
+        bands=config.playbook.dedup_bands,
+    )
+
+    embedding_cache = providers.Singleton(
+        EmbeddingCache,
+        cache_dir=config.embedding.cache_dir,
+    )
+
+    query_embedding_batcher = providers.Selector(
+        config.embedding.query_batching,
+        off=providers.Object(None),
+        coalesce=providers.Singleton(
+            QueryEmbeddingBatcher,
+            model=embedding_model,
+            max_batch_size=config.embedding.query_batch_max_size,
+            max_wait_ms=config.embedding.query_batch_max_wait_ms,
+        ),
+    )
+
+    bulk_embedder = providers.Singleton(
+        BulkEmbedder,
+        max_chunk_tokens=config.embedding.bulk_max_chunk_tokens,
+        max_chunk_size=config.embedding.bulk_max_chunk_size,
+        max_concurrency=config.embedding.bulk_max_concurrency,
+        max_retries=config.embedding.bulk_max_retries,
     )
 
     embedding_client = providers.Singleton(
         EmbeddingClient,
         model=embedding_model,
+        cache=embedding_cache,
+        query_cache_size=config.embedding.query_cache_size,
+        persist_queries=config.embedding.persist_queries,
+        batcher=query_embedding_batcher,
+        bulk_embedder=bulk_embedder,
+    )
+
+    ann_index = providers.Selector(
+        config.search.vector_search,
+        exact=providers.Object(None),
+        approximate=providers.Factory(
+            IVFIndex,
+            n_lists=config.search.ann_n_lists,
+            n_probe=config.search.ann_n_probe,
+            min_train_size=config.search.ann_min_train_size,
+        ),
+    )
+
+    embedding_reducer = providers.Selector(
+        config.search.reduction,
+        none=providers.Object(None),
+        truncate=providers.Factory(TruncationReducer, dimension=config.search.reduced_dimension),
+        pca=providers.Factory(
+            PCAReducer,
+            dimension=config.search.reduced_dimension,
+            min_fit_size=config.search.pca_min_fit_size,
+        ),
+    )
+
+    search_result_cache = providers.Singleton(
+        SearchResultCache,
+        max_size=config.search.result_cache_size,
     )
 
     hybrid_search = providers.Singleton(
         HybridSearch,
         embedding_client=embedding_client,
         alpha=config.search.alpha,
+        ann_index=ann_index,
+        embedding_dtype=config.search.embedding_dtype,
+        fusion=config.search.fusion,
+        rrf_k=config.search.rrf_k,
+        reducer=embedding_reducer,
+        result_cache=search_result_cache,
+    )
+
+    shard_search = providers.Factory(
+        HybridSearch,
+        embedding_client=embedding_client,
+        alpha=config.search.alpha,
+        ann_index=ann_index,
+        embedding_dtype=config.search.embedding_dtype,
+        fusion=config.search.fusion,
+        rrf_k=config.search.rrf_k,
+        reducer=embedding_reducer,
+        result_cache=search_result_cache,
+    )
+
+    sharded_search = providers.Singleton(
+        ShardedSearch,
+        search_factory=shard_search.provider,
+        playbook_store=playbook_store,
+        max_workers=config.search.shard_max_workers,
     )
 
     llm_client = providers.Singleton(
@@ -83,6 +208,7 @@ class Container(containers.DeclarativeContainer):
         hybrid_search=hybrid_search,
         llm_client=llm_client,
         prompt_builder=prompt_builder,
+        sharded_search=sharded_search,
     )
 
     reflector_prompt_builder = providers.Singleton(
@@ -107,6 +233,10 @@ class Container(containers.DeclarativeContainer):
         llm_client=llm_client,
         prompt_builder=curator_prompt_builder,
         playbook_store=playbook_store,
+        hybrid_search=hybrid_search,
+        duplicate_index=duplicate_index,
+        sharded_search=sharded_search,
+        sidecar_rewrite_ratio=config.search.sidecar_rewrite_ratio,
     )
 
 
@@ -1,12 +1,41 @@
 """Hybrid search component combining vector and BM25 search."""
 
+from src.components.hybrid_search.ann_index import IVFIndex
+from src.components.hybrid_search.bulk_embedder import BulkEmbedder
+from src.components.hybrid_search.embedding_batcher import QueryEmbeddingBatcher
+from src.components.hybrid_search.embedding_cache import EmbeddingCache
 from src.components.hybrid_search.embedding_client import EmbeddingClient
-from src.components.hybrid_search.models import SearchQuery, SearchResult
+from src.components.hybrid_search.embedding_store import EmbeddingStore
+from src.components.hybrid_search.models import (
+    ScoreBreakdown,
+    SearchExplanation,
+    SearchQuery,
+    SearchResult,
+    ShardSearchResult,
+)
+from src.components.hybrid_search.profiling import SEARCH_METRICS, SearchMetrics
+from src.components.hybrid_search.reduction import PCAReducer, TruncationReducer
+from src.components.hybrid_search.result_cache import SearchResultCache
 from src.components.hybrid_search.search import HybridSearch
+from src.components.hybrid_search.sharded_search import ShardedSearch
 
 __all__ = [
+    "SEARCH_METRICS",
+    "BulkEmbedder",
+    "EmbeddingCache",
     "EmbeddingClient",
+    "EmbeddingStore",
     "HybridSearch",
+    "IVFIndex",
+    "PCAReducer",
+    "QueryEmbeddingBatcher",
+    "ScoreBreakdown",
+    "SearchExplanation",
+    "SearchMetrics",
     "SearchQuery",
     "SearchResult",
+    "SearchResultCache",
+    "ShardSearchResult",
+    "ShardedSearch",
+    "TruncationReducer",
 ]
@@ -0,0 +1,141 @@
+"""Numpyのみで実装したIVF-Flat方式の近似最近傍インデックス."""
+
+import logging
+
+import numpy as np
+
+from src.components.hybrid_search.vector_index import l2_normalize
+
+logger = logging.getLogger(__name__)
+
+KMEANS_ITERATIONS = 10
+TRAIN_SAMPLES_PER_LIST = 64
+
+
+class IVFIndex:
+    """転置ファイル（IVF-Flat）方式の近似最近傍インデックスクラス.
+
+    L2正規化済みベクトルを球面k-meansでn_lists個のクラスタに分け、
+    検索時はクエリに近いn_probe個のクラスタに属するBulletだけを候補とする.
+    n_probeを増やすと再現率が上がり、減らすとレイテンシが下がる.
+    """
+
+    def __init__(
+        self,
+        n_lists: int = 256,
+        n_probe: int = 8,
+        min_train_size: int = 10000,
+        retrain_growth: float = 4.0,
+    ) -> None:
+        """IVFIndexを初期化する.
+
+        Args:
+            n_lists: クラスタ（転置リスト）数
+            n_probe: 検索時に走査するクラスタ数
+            min_train_size: 学習を開始する最小Bullet数. これ未満では全件探索を行う.
+            retrain_growth: 学習時からBullet数が何倍に増えたら再学習するか
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.min_train_size = min_train_size
+        self.retrain_growth = retrain_growth
+        self.centroids: np.ndarray | None = None
+        self.lists: list[dict[str, None]] = []
+        self.trained_size = 0
+        self._assignments: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        """登録済みBullet数を返す."""
+        return len(self._assignments)
+
+    @property
+    def is_trained(self) -> bool:
+        """クラスタ中心が学習済みかを返す."""
+        return self.centroids is not None
+
+    def needs_training(self, size: int) -> bool:
+        """現在のBullet数で学習（または再学習）が必要かを返す.
+
+        Args:
+            size: インデックス対象のBullet数
+
+        Returns:
+            学習が必要な場合True
+        """
+        if size < self.min_train_size:
+            return False
+        return not self.is_trained or size > self.trained_size * self.retrain_growth
+
+    def train(self, bullet_ids: list[str], vectors: np.ndarray) -> None:
+        """球面k-meansでクラスタ中心を学習し、全Bulletを割り当て直す.
+
+        Args:
+            bullet_ids: Bullet IDリスト
+            vectors: bullet_idsと同順のL2正規化済みベクトル行列
+        """
+        rng = np.random.default_rng(0)
+        n_lists = min(self.n_lists, len(bullet_ids))
+        sample_size = min(len(bullet_ids), n_lists * TRAIN_SAMPLES_PER_LIST)
+        sample = vectors[rng.choice(len(bullet_ids), size=sample_size, replace=False)]
+
+        centroids = sample[rng.choice(sample_size, size=n_lists, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+            centroids = l2_normalize(sums)
+
+        self.centroids = centroids
+        self.lists = [{} for _ in range(n_lists)]
+        self._assignments = {}
+        self.add(bullet_ids, vectors)
+        self.trained_size = len(bullet_ids)
+        logger.info("Trained IVF index: lists=%d, vectors=%d", n_lists, len(bullet_ids))
+
+    def add(self, bullet_ids: list[str], vectors: np.ndarray, chunk_size: int = 8192) -> None:
+        """Bulletを最も近いクラスタに割り当てる. 既存のBulletは割り当て直す.
+
+        Args:
+            bullet_ids: Bullet IDリスト
+            vectors: bullet_idsと同順のL2正規化済みベクトル行列
+            chunk_size: 割り当て計算1回あたりの行数
+        """
+        if self.centroids is None:
+            return
+
+        self.remove(bullet_ids)
+        for start in range(0, len(bullet_ids), chunk_size):
+            labels = np.argmax(vectors[start : start + chunk_size] @ self.centroids.T, axis=1)
+            for bullet_id, label in zip(bullet_ids[start : start + chunk_size], labels.tolist(), strict=True):
+                self.lists[label][bullet_id] = None
+                self._assignments[bullet_id] = label
+
+    def remove(self, bullet_ids: list[str]) -> None:
+        """Bulletをクラスタから取り除く. 存在しないBullet IDは無視する.
+
+        Args:
+            bullet_ids: 削除するBullet IDリスト
+        """
+        for bullet_id in bullet_ids:
+            label = self._assignments.pop(bullet_id, None)
+            if label is not None:
+                del self.lists[label][bullet_id]
+
+    def probe(self, query_vector: np.ndarray) -> list[str]:
+        """クエリに近いクラスタに属するBullet IDを返す.
+
+        Args:
+            query_vector: L2正規化済みのクエリベクトル
+
+        Returns:
+            候補となるBullet IDリスト
+        """
+        if self.centroids is None:
+            return []
+
+        n_probe = min(self.n_probe, len(self.lists))
+        similarities = self.centroids @ query_vector
+        nearest = np.argpartition(-similarities, n_probe - 1)[:n_probe]
+        return [bullet_id for label in nearest.tolist() for bullet_id in self.lists[label]]
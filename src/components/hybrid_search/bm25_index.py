@@ -0,0 +1,197 @@
+"""インクリメンタルに更新可能なBM25転置インデックス."""
+
+from collections import Counter
+from collections.abc import Sequence
+
+import numpy as np
+
+
+class BM25Index:
+    """Bullet IDをドキュメントキーとするBM25転置インデックスクラス.
+
+    ドキュメントごとの単語ID・出現回数を保持してドキュメント単位の追加・更新・削除に追従し、
+    検索時には単語×ドキュメントの重み行列をCSR形式（indptr / indices / data）のNumpy配列で保持する.
+    重みにはIDFとドキュメント長正規化を適用済みのため、クエリのスコアは
+    クエリ語の行を集めて足し合わせるだけで求まる. 重み行列はインデックスの変更後、
+    最初の検索時にまとめて作り直す.
+
+    Note:
+        - IDFは常に正となる `log(1 + (N - df + 0.5) / (df + 0.5))` を用いる.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        """BM25Indexを初期化する.
+
+        Args:
+            k1: 単語頻度の飽和パラメータ
+            b: ドキュメント長正規化の強さ（0〜1）
+        """
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: dict[str, int] = {}
+        self.doc_lengths: dict[str, int] = {}
+        self._doc_terms: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self._total_length = 0
+        self._doc_ids: list[str] = []
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = np.zeros(0, dtype=np.int64)
+        self._data = np.zeros(0, dtype=np.float32)
+        self._idf = np.zeros(0, dtype=np.float64)
+        self._dirty = False
+
+    def __len__(self) -> int:
+        """登録済みドキュメント数を返す."""
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id: object) -> bool:
+        """ドキュメントが登録済みかを返す."""
+        return doc_id in self.doc_lengths
+
+    @property
+    def avg_doc_length(self) -> float:
+        """平均ドキュメント長を返す."""
+        return self._total_length / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    @property
+    def doc_ids(self) -> list[str]:
+        """重み行列の列順に並んだドキュメントIDを返す."""
+        self.build()
+        return self._doc_ids
+
+    def add(self, doc_id: str, tokens: Sequence[str]) -> None:
+        """ドキュメントを追加する. 既に存在する場合は置き換える.
+
+        Args:
+            doc_id: ドキュメントID
+            tokens: トークン化済みのドキュメント
+        """
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+
+        term_freqs = Counter(tokens)
+        term_ids = np.fromiter(
+            (self.vocabulary.setdefault(term, len(self.vocabulary)) for term in term_freqs),
+            dtype=np.int64,
+            count=len(term_freqs),
+        )
+        self._doc_terms[doc_id] = (term_ids, np.fromiter(term_freqs.values(), dtype=np.float32, count=len(term_freqs)))
+        self.doc_lengths[doc_id] = len(tokens)
+        self._total_length += len(tokens)
+        self._dirty = True
+
+    def remove(self, doc_id: str) -> None:
+        """ドキュメントを削除する. 存在しない場合は何もしない.
+
+        Args:
+            doc_id: ドキュメントID
+        """
+        if self._doc_terms.pop(doc_id, None) is None:
+            return
+
+        self._total_length -= self.doc_lengths.pop(doc_id)
+        self._dirty = True
+
+    def idf(self, term: str) -> float:
+        """単語のIDFを返す.
+
+        Args:
+            term: 単語
+
+        Returns:
+            IDF値. 未知語の場合は0.0.
+        """
+        self.build()
+        term_id = self.vocabulary.get(term)
+        return float(self._idf[term_id]) if term_id is not None else 0.0
+
+    def score(self, tokens: Sequence[str]) -> dict[str, float]:
+        """クエリに対するBM25スコアを計算する.
+
+        Args:
+            tokens: トークン化済みのクエリ
+
+        Returns:
+            ドキュメントIDからスコアへのdict. クエリ語を含まないドキュメントは含まない.
+        """
+        return self.score_many([tokens])[0]
+
+    def score_many(self, queries: Sequence[Sequence[str]]) -> list[dict[str, float]]:
+        """複数クエリのBM25スコアを計算する.
+
+        Args:
+            queries: トークン化済みのクエリリスト
+
+        Returns:
+            queriesと同順の、ドキュメントIDからスコアへのdictのリスト
+        """
+        scores = self.score_matrix(queries)
+        doc_ids = self._doc_ids
+        return [{doc_ids[i]: float(row[i]) for i in np.flatnonzero(row)} for row in scores]
+
+    def score_matrix(self, queries: Sequence[Sequence[str]]) -> np.ndarray:
+        """複数クエリのBM25スコアを、重み行列の列順に並んだ密な行列として計算する.
+
+        クエリ×単語の出現回数行列と単語×ドキュメントの重み行列の積を、
+        クエリ語の行の非ゼロ要素だけを集めて足し合わせることで求める.
+        クエリ内で同じ単語が繰り返される場合はその回数だけ寄与を数える.
+
+        Args:
+            queries: トークン化済みのクエリリスト
+
+        Returns:
+            (クエリ数, ドキュメント数) のスコア行列. 列は `doc_ids` の順.
+        """
+        self.build()
+        num_docs = len(self._doc_ids)
+        pairs = Counter(
+            (q, self.vocabulary[term]) for q, tokens in enumerate(queries) for term in tokens if term in self.vocabulary
+        )
+        if not pairs or not num_docs:
+            return np.zeros((len(queries), num_docs), dtype=np.float32)
+
+        query_rows = np.fromiter((q for q, _ in pairs), dtype=np.int64, count=len(pairs))
+        term_ids = np.fromiter((t for _, t in pairs), dtype=np.int64, count=len(pairs))
+        counts = np.fromiter(pairs.values(), dtype=np.float32, count=len(pairs))
+
+        starts = self._indptr[term_ids]
+        lengths = self._indptr[term_ids + 1] - starts
+        owners = np.repeat(np.arange(len(pairs)), lengths)
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+        flat = query_rows[owners] * num_docs + self._indices[positions]
+        weights = self._data[positions] * counts[owners]
+        scores = np.bincount(flat, weights=weights, minlength=len(queries) * num_docs)
+        return scores.reshape(len(queries), num_docs).astype(np.float32)
+
+    def build(self) -> None:
+        """インデックスが変更されていれば、CSR形式の重み行列を作り直す.
+
+        検索時に自動で呼ばれるため、明示的に呼ぶのは作り直しの時間を分けて計測したい場合のみでよい.
+
+        各要素の重みは `idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))` とする.
+        """
+        if not self._dirty:
+            return
+
+        doc_ids = list(self._doc_terms)
+        entries = [self._doc_terms[doc_id] for doc_id in doc_ids]
+        nnz_per_doc = np.fromiter((len(term_ids) for term_ids, _ in entries), dtype=np.int64, count=len(entries))
+        term_ids = np.concatenate([t for t, _ in entries]) if entries else np.zeros(0, dtype=np.int64)
+        tfs = np.concatenate([f for _, f in entries]) if entries else np.zeros(0, dtype=np.float32)
+        doc_index = np.repeat(np.arange(len(doc_ids)), nnz_per_doc)
+
+        num_docs = len(doc_ids)
+        doc_freqs = np.bincount(term_ids, minlength=len(self.vocabulary))
+        idf = np.where(doc_freqs > 0, np.log1p((num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)), 0.0)
+        lengths = np.fromiter((self.doc_lengths[doc_id] for doc_id in doc_ids), dtype=np.float64, count=num_docs)
+        length_norm = self.k1 * (1 - self.b + self.b * lengths / (self.avg_doc_length or 1.0))
+        data = idf[term_ids] * tfs * (self.k1 + 1) / (tfs + length_norm[doc_index])
+
+        order = np.argsort(term_ids, kind="stable")
+        self._indptr = np.concatenate(([0], np.cumsum(doc_freqs)))
+        self._indices = doc_index[order]
+        self._data = data[order].astype(np.float32)
+        self._idf = idf
+        self._doc_ids = doc_ids
+        self._dirty = False
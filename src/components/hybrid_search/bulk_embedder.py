@@ -0,0 +1,167 @@
+"""大量ドキュメントをチャンク分割して並行にembeddingするバルク処理."""
+
+import logging
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+ChunkCallback = Callable[[list[str], list[list[float]]], None]
+ProgressCallback = Callable[[int, int], None]
+
+
+def estimate_tokens(text: str) -> int:
+    """テキストのトークン数を概算する.
+
+    ASCII文字は4文字で1トークン、それ以外（日本語など）は1文字1トークンとみなす.
+
+    Args:
+        text: テキスト
+
+    Returns:
+        概算トークン数（最小1）
+    """
+    ascii_chars = sum(1 for c in text if c.isascii())
+    return (len(text) - ascii_chars) + ascii_chars // 4 + 1
+
+
+class BulkEmbedder:
+    """ドキュメントをトークン数上限つきのチャンクに分け、並行にembeddingするクラス.
+
+    チャンクは最大max_concurrency個ずつ同時に送信し、失敗したチャンクだけを
+    指数バックオフで再試行する. 完了したチャンクはコールバックで順次通知し、
+    再試行しても失敗したチャンクがあっても残りのチャンクは最後まで処理するため、
+    成功した分の結果をキャッシュに残して次回の実行で続きから再開できる.
+    """
+
+    def __init__(
+        self,
+        max_chunk_tokens: int = 8000,
+        max_chunk_size: int = 256,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+    ) -> None:
+        """BulkEmbedderを初期化する.
+
+        Args:
+            max_chunk_tokens: 1チャンクの概算トークン数の上限
+            max_chunk_size: 1チャンクのドキュメント数の上限
+            max_concurrency: 同時に送信するチャンク数
+            max_retries: 1チャンクあたりの再試行回数
+            retry_backoff: 最初の再試行までの待ち時間（秒）. 再試行ごとに倍になる.
+        """
+        self.max_chunk_tokens = max_chunk_tokens
+        self.max_chunk_size = max_chunk_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+    def chunk(self, texts: list[str]) -> list[list[str]]:
+        """テキストをトークン数とドキュメント数の上限を超えないチャンクに分割する.
+
+        上限を単独で超えるテキストは1件だけのチャンクにする.
+
+        Args:
+            texts: テキストのリスト
+
+        Returns:
+            元の順序を保ったチャンクのリスト
+        """
+        chunks: list[list[str]] = []
+        current: list[str] = []
+        current_tokens = 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if current and (current_tokens + tokens > self.max_chunk_tokens or len(current) >= self.max_chunk_size):
+                chunks.append(current)
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def embed(
+        self,
+        model: Embeddings,
+        texts: list[str],
+        on_chunk: ChunkCallback | None = None,
+        on_progress: ProgressCallback | None = None,
+    ) -> list[list[float]]:
+        """テキストをチャンクごとに並行してembeddingする.
+
+        Args:
+            model: LangChainのEmbeddingsモデル
+            texts: テキストのリスト
+            on_chunk: チャンク完了時に (テキスト, ベクトル) で呼ばれるコールバック
+            on_progress: チャンク完了時に (完了件数, 全件数) で呼ばれるコールバック
+
+        Returns:
+            textsと同順のembeddingベクトルのリスト
+
+        Raises:
+            Exception: 再試行しても失敗したチャンクがある場合、最初の例外
+        """
+        chunks = self.chunk(texts)
+        if len(chunks) <= 1:
+            vectors = self._embed_chunk(model, texts) if texts else []
+            if texts and on_chunk is not None:
+                on_chunk(texts, vectors)
+            if texts and on_progress is not None:
+                on_progress(len(texts), len(texts))
+            return vectors
+
+        results: list[list[list[float]] | None] = [None] * len(chunks)
+        errors: list[Exception] = []
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="bulk-embed") as executor:
+            futures = {executor.submit(self._embed_chunk, model, chunk): i for i, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    logger.exception("Embedding chunk of %d texts failed after retries", len(chunks[i]))
+                    errors.append(e)
+                    continue
+                done += len(chunks[i])
+                if on_chunk is not None:
+                    on_chunk(chunks[i], results[i])
+                if on_progress is not None:
+                    on_progress(done, len(texts))
+                logger.info("Embedded %d/%d documents", done, len(texts))
+
+        if errors:
+            raise errors[0]
+        return [vector for vectors in results for vector in vectors]
+
+    def _embed_chunk(self, model: Embeddings, texts: list[str]) -> list[list[float]]:
+        """1チャンクをembeddingする. 失敗した場合は指数バックオフで再試行する.
+
+        Args:
+            model: LangChainのEmbeddingsモデル
+            texts: チャンクのテキストのリスト
+
+        Returns:
+            textsと同順のembeddingベクトルのリスト
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return model.embed_documents(texts)
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_backoff * 2**attempt
+                logger.warning(
+                    "Embedding chunk of %d texts failed (attempt %d/%d), retrying in %.1fs",
+                    len(texts),
+                    attempt + 1,
+                    self.max_retries + 1,
+                    delay,
+                )
+                time.sleep(delay)
+        return []
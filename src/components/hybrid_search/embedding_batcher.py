@@ -0,0 +1,145 @@
+"""同時に届いたクエリembedding要求を1回のリクエストにまとめるバッチャー."""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryEmbeddingBatcher:
+    """並行するクエリembedding要求を短い待ち時間で集約するクラス.
+
+    最初の要求から max_wait_ms 以内に届いた要求、または max_batch_size 件に達するまでの要求を
+    1回の `aembed_documents` にまとめ、各呼び出し元には自身のベクトルを返す.
+    集約は専用スレッド上のイベントループで行うため、asyncioのコルーチンからも
+    FastAPIのスレッドプールで動く同期ハンドラからも同じバッチに合流できる.
+    """
+
+    def __init__(self, model: Embeddings, max_batch_size: int = 64, max_wait_ms: float = 5.0) -> None:
+        """QueryEmbeddingBatcherを初期化する.
+
+        Args:
+            model: LangChainのEmbeddingsモデル
+            max_batch_size: 1回のリクエストにまとめる最大クエリ数
+            max_wait_ms: 最初の要求からリクエストを送るまでの最大待ち時間（ミリ秒）
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batches = 0
+        self.batched_queries = 0
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_lock = threading.Lock()
+
+    def embed(self, text: str) -> list[float]:
+        """クエリのembeddingを同期的に取得する. 他スレッドからの要求と同じバッチにまとめられる.
+
+        Args:
+            text: クエリテキスト
+
+        Returns:
+            embeddingベクトル
+        """
+        return self._submit(text).result()
+
+    async def aembed(self, text: str) -> list[float]:
+        """クエリのembeddingを非同期に取得する. 並行する要求と同じバッチにまとめられる.
+
+        Args:
+            text: クエリテキスト
+
+        Returns:
+            embeddingベクトル
+        """
+        return await asyncio.wrap_future(self._submit(text))
+
+    def close(self) -> None:
+        """集約用のイベントループを停止する."""
+        with self._loop_lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+
+    def _submit(self, text: str) -> Future:
+        """集約用のイベントループに要求を登録する.
+
+        Args:
+            text: クエリテキスト
+
+        Returns:
+            embeddingベクトルを返すFuture
+        """
+        return asyncio.run_coroutine_threadsafe(self._enqueue(text), self._ensure_loop())
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """集約用のイベントループを返す. 未起動の場合はデーモンスレッドで起動する.
+
+        Returns:
+            集約用のイベントループ
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="query-embedding-batcher", daemon=True).start()
+            return self._loop
+
+    async def _enqueue(self, text: str) -> list[float]:
+        """要求を保留中のバッチに追加し、バッチの完了を待つ.
+
+        Args:
+            text: クエリテキスト
+
+        Returns:
+            embeddingベクトル
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """保留中の要求を1つのバッチとして送信する."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._embed_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _embed_batch(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        """バッチ内のクエリをまとめてembeddingし、各要求のFutureに結果を設定する.
+
+        Args:
+            batch: (クエリテキスト, Future) のリスト
+        """
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        self.batched_queries += len(batch)
+        try:
+            vectors = await self.model.aembed_documents(texts)
+        except Exception as e:
+            logger.exception("Failed to embed a batch of %d queries", len(texts))
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_text = dict(zip(texts, vectors, strict=True))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
@@ -0,0 +1,194 @@
+"""embeddingベクトルをローカルディスクに永続化するキャッシュ."""
+
+import fcntl
+import hashlib
+import logging
+import re
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9._-]")
+
+# SHA-256の16進ダイジェスト（64文字）と改行
+_KEY_LINE_BYTES = 65
+_FLOAT32_BYTES = 4
+
+
+class EmbeddingCache:
+    """モデル名とテキストのハッシュをキーにembeddingを保持するキャッシュクラス.
+
+    モデルごとに `<cache_dir>/<model>/` 配下へ次元数（dim.txt）、キー一覧（keys.txt）、
+    float32のベクトル列（vectors.f32）を追記形式で保存する.
+
+    キーとベクトルは行の位置で対応付けるため、読み込み・追記・修復はスレッド間ではロック、
+    プロセス間では `<model>/lock` へのアドバイザリロックの下で行う. 追記の前に
+    2つのファイルを対応の取れている行数に切り詰めるので、中断された追記の後も行がずれない.
+
+    Note:
+        - ロックにはfcntlを用いるため、POSIX環境でのみ動作する.
+    """
+
+    def __init__(self, cache_dir: str = "data/embeddings") -> None:
+        """EmbeddingCacheを初期化する.
+
+        Args:
+            cache_dir: キャッシュファイルの保存ディレクトリ
+        """
+        self.cache_dir = Path(cache_dir)
+        self._entries: dict[str, dict[str, np.ndarray]] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        """テキストからキャッシュキーを生成する.
+
+        Args:
+            text: embedding対象のテキスト
+
+        Returns:
+            SHA-256の16進ダイジェスト
+        """
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: list[str]) -> list[np.ndarray | None]:
+        """複数テキストのembeddingをキャッシュから取得する.
+
+        Args:
+            model: embeddingモデル名
+            texts: テキストのリスト
+
+        Returns:
+            textsと同順のベクトルリスト. 未キャッシュの要素はNone.
+        """
+        with self._lock:
+            entries = self._load(model)
+            return [entries.get(self.make_key(text)) for text in texts]
+
+    def put_many(self, model: str, texts: list[str], vectors: list[list[float]]) -> None:
+        """複数テキストのembeddingをキャッシュに追加しディスクへ追記する.
+
+        Args:
+            model: embeddingモデル名
+            texts: テキストのリスト
+            vectors: textsと同順のembeddingベクトルリスト
+        """
+        with self._lock:
+            entries = self._load(model)
+            new_keys: list[str] = []
+            new_vectors: list[np.ndarray] = []
+            for text, vector in zip(texts, vectors, strict=True):
+                key = self.make_key(text)
+                if key in entries:
+                    continue
+                array = np.asarray(vector, dtype=np.float32)
+                entries[key] = array
+                new_keys.append(key)
+                new_vectors.append(array)
+
+            if new_keys:
+                self._append(model, new_keys, np.vstack(new_vectors))
+
+    def _model_dir(self, model: str) -> Path:
+        """モデルごとのキャッシュディレクトリを返す.
+
+        Args:
+            model: embeddingモデル名
+
+        Returns:
+            キャッシュディレクトリのパス
+        """
+        return self.cache_dir / _UNSAFE_CHARS.sub("_", model)
+
+    @contextmanager
+    def _file_lock(self, model_dir: Path) -> Iterator[None]:
+        """モデルごとのキャッシュディレクトリの排他ロックを取得し、ブロックの終了時に解放する.
+
+        Args:
+            model_dir: モデルごとのキャッシュディレクトリ
+        """
+        model_dir.mkdir(parents=True, exist_ok=True)
+        with (model_dir / "lock").open("a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _load(self, model: str) -> dict[str, np.ndarray]:
+        """モデルのキャッシュをディスクから読み込む（初回のみ）. 呼び出し側でスレッドロックを保持する.
+
+        Args:
+            model: embeddingモデル名
+
+        Returns:
+            キャッシュキーからベクトルへのdict
+        """
+        if model in self._entries:
+            return self._entries[model]
+
+        entries: dict[str, np.ndarray] = {}
+        model_dir = self._model_dir(model)
+        dim_path = model_dir / "dim.txt"
+        if dim_path.exists():
+            with self._file_lock(model_dir):
+                dim = int(dim_path.read_text(encoding="utf-8"))
+                if self._truncate_to_complete(model_dir, dim):
+                    keys = (model_dir / "keys.txt").read_text(encoding="utf-8").split()
+                    matrix = np.fromfile(model_dir / "vectors.f32", dtype=np.float32).reshape(len(keys), dim)
+                    entries = dict(zip(keys, matrix, strict=True))
+            logger.info("Loaded %d cached embeddings for model %s", len(entries), model)
+
+        self._entries[model] = entries
+        return entries
+
+    def _truncate_to_complete(self, model_dir: Path, dim: int) -> int:
+        """キーとベクトルが揃っている行数までキャッシュファイルを切り詰める. ファイルロックの下で呼び出す.
+
+        キーは固定長のため、ファイルサイズだけから揃っている行数を求められる.
+
+        Args:
+            model_dir: モデルごとのキャッシュディレクトリ
+            dim: ベクトルの次元数
+
+        Returns:
+            キーとベクトルが揃っている行数
+        """
+        keys_path = model_dir / "keys.txt"
+        vectors_path = model_dir / "vectors.f32"
+        keys_size = keys_path.stat().st_size if keys_path.exists() else 0
+        vectors_size = vectors_path.stat().st_size if vectors_path.exists() else 0
+        row_bytes = dim * _FLOAT32_BYTES
+        count = min(keys_size // _KEY_LINE_BYTES, vectors_size // row_bytes)
+        if keys_size != count * _KEY_LINE_BYTES or vectors_size != count * row_bytes:
+            # 書き込み途中で中断された場合に備え、キーとベクトルが揃っている行だけを残す
+            logger.warning("Repairing truncated embedding cache at %s", model_dir)
+            with keys_path.open("ab") as f:
+                f.truncate(count * _KEY_LINE_BYTES)
+            with vectors_path.open("ab") as f:
+                f.truncate(count * row_bytes)
+        return count
+
+    def _append(self, model: str, keys: list[str], matrix: np.ndarray) -> None:
+        """キーとベクトルをディスクに追記する. 呼び出し側でスレッドロックを保持する.
+
+        Args:
+            model: embeddingモデル名
+            keys: キャッシュキーのリスト
+            matrix: keysと同順のベクトル行列
+        """
+        model_dir = self._model_dir(model)
+        with self._file_lock(model_dir):
+            dim_path = model_dir / "dim.txt"
+            if not dim_path.exists():
+                dim_path.write_text(str(matrix.shape[1]), encoding="utf-8")
+            self._truncate_to_complete(model_dir, int(dim_path.read_text(encoding="utf-8")))
+            with (model_dir / "vectors.f32").open("ab") as f:
+                f.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+            with (model_dir / "keys.txt").open("a", encoding="utf-8") as f:
+                f.write("".join(f"{key}\n" for key in keys))
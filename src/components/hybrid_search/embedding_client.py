@@ -1,18 +1,107 @@
 """LangChain Embeddingsモデルのラッパー."""
 
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Callable
+
 from langchain_core.embeddings import Embeddings
 
+from src.components.hybrid_search.bulk_embedder import BulkEmbedder, ProgressCallback
+from src.components.hybrid_search.embedding_batcher import QueryEmbeddingBatcher
+from src.components.hybrid_search.embedding_cache import EmbeddingCache
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """クエリキャッシュのキー用にテキストを正規化する.
+
+    Args:
+        text: クエリテキスト
+
+    Returns:
+        NFKC正規化し、空白を1文字に畳んだテキスト
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def resolve_model_name(model: Embeddings) -> str:
+    """Embeddingsモデルからキャッシュキー用のモデル名を取得する.
+
+    Args:
+        model: LangChainのEmbeddingsモデル
+
+    Returns:
+        モデル名. 取得できない場合はクラス名.
+    """
+    for attr in ("model", "model_name", "model_id"):
+        name = getattr(model, attr, None)
+        if isinstance(name, str) and name:
+            return name
+    return type(model).__name__
+
 
 class EmbeddingClient:
-    """LangChainのEmbeddingsモデルをラップするクライアントクラス."""
+    """LangChainのEmbeddingsモデルをラップするクライアントクラス.
+
+    クエリembeddingは (モデル名, 正規化テキスト) をキーとするLRUキャッシュに保持し、
+    persist_queriesが有効な場合はディスクキャッシュにも保存して実行間で再利用する.
+    batcherを指定すると、キャッシュにないクエリは並行する他の要求と1回のリクエストにまとめる.
+    bulk_embedderを指定すると、キャッシュにないドキュメントはチャンクに分けて並行にembeddingする.
+    """
 
-    def __init__(self, model: Embeddings) -> None:
+    def __init__(  # noqa: PLR0913
+        self,
+        model: Embeddings,
+        cache: EmbeddingCache | None = None,
+        model_name: str | None = None,
+        query_cache_size: int = 1024,
+        persist_queries: bool = False,  # noqa: FBT001, FBT002
+        *,
+        batcher: QueryEmbeddingBatcher | None = None,
+        bulk_embedder: BulkEmbedder | None = None,
+    ) -> None:
         """EmbeddingClientを初期化する.
 
         Args:
             model: LangChainのEmbeddingsモデル
+            cache: ドキュメントembeddingのディスクキャッシュ. Noneの場合はキャッシュしない.
+            model_name: キャッシュキーに使うモデル名. Noneの場合はmodelから解決する.
+            query_cache_size: クエリembeddingのLRUキャッシュの最大件数. 0の場合はキャッシュしない.
+            persist_queries: クエリembeddingもディスクキャッシュに保存するか
+            batcher: 並行するクエリembedding要求を集約するバッチャー. Noneの場合は要求ごとに問い合わせる.
+            bulk_embedder: ドキュメントのバルクembedding処理. Noneの場合は1回のリクエストで問い合わせる.
         """
         self.model = model
+        self.cache = cache
+        self.model_name = model_name or resolve_model_name(model)
+        self.query_cache_size = query_cache_size
+        self.persist_queries = persist_queries
+        self.batcher = batcher
+        self.bulk_embedder = bulk_embedder
+        self.query_cache_hits = 0
+        self.query_cache_misses = 0
+        self._query_cache: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+
+    @property
+    def query_cache_model(self) -> str:
+        """ディスクキャッシュ上でクエリembeddingを保存するモデル名を返す."""
+        return f"{self.model_name}.query"
+
+    def query_cache_stats(self) -> dict[str, int]:
+        """クエリキャッシュのヒット数・ミス数・保持件数を返す.
+
+        Returns:
+            hits / misses / size をキーとするdict
+        """
+        return {
+            "hits": self.query_cache_hits,
+            "misses": self.query_cache_misses,
+            "size": len(self._query_cache),
+        }
 
     def embed_query(self, text: str) -> list[float]:
         """クエリテキストのembeddingを生成する.
@@ -23,15 +112,194 @@ class EmbeddingClient:
         Returns:
             embeddingベクトル
         """
-        return self.model.embed_query(text)
+        embed = self.batcher.embed if self.batcher is not None else self.model.embed_query
+        return self._embed_queries_cached([text], lambda texts: [embed(texts[0])])[0]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """クエリテキストのembeddingを非同期に生成する.
+
+        batcherが設定されている場合、並行する他の呼び出しと1回のリクエストにまとめる.
 
-    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        Args:
+            text: クエリテキスト
+
+        Returns:
+            embeddingベクトル
+        """
+        keys, vectors, missing = self._lookup_queries([text])
+        if missing:
+            if self.batcher is not None:
+                vector = await self.batcher.aembed(text)
+            else:
+                vector = await self.model.aembed_query(text)
+            self._store_queries(keys[:1], [vector])
+            vectors[0] = vector
+        return vectors[0]
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """複数クエリのembeddingを生成する.
+
+        `embed_query` とキャッシュを共有するため、未キャッシュのクエリもドキュメント用ではなく
+        クエリ用のembeddingで1件ずつ生成する.
+
+        Args:
+            texts: クエリテキストのリスト
+
+        Returns:
+            embeddingベクトルのリスト
+        """
+        if not texts:
+            return []
+        return self._embed_queries_cached(texts, lambda missing: [self.model.embed_query(text) for text in missing])
+
+    def embed_documents(self, texts: list[str], on_progress: ProgressCallback | None = None) -> list[list[float]]:
         """複数ドキュメントのembeddingを生成する.
 
+        キャッシュが設定されている場合は未キャッシュのテキストのみモデルに問い合わせ、
+        バルク処理ではチャンクが完了するたびにキャッシュへ保存する.
+
         Args:
             texts: ドキュメントテキストのリスト
+            on_progress: バルク処理でチャンク完了時に (完了件数, 全件数) で呼ばれるコールバック
 
         Returns:
             embeddingベクトルのリスト
         """
-        return self.model.embed_documents(texts)
+        if self.cache is None:
+            return self._embed_uncached(texts, on_progress=on_progress)
+
+        cached = self.cache.get_many(self.model_name, texts)
+        missing_texts = list(dict.fromkeys(text for text, vector in zip(texts, cached, strict=True) if vector is None))
+        if missing_texts:
+            self._embed_uncached(
+                missing_texts,
+                on_chunk=lambda chunk, vectors: self.cache.put_many(self.model_name, chunk, vectors),
+                on_progress=on_progress,
+            )
+            cached = self.cache.get_many(self.model_name, texts)
+
+        return [vector.tolist() for vector in cached]
+
+    def _embed_uncached(
+        self,
+        texts: list[str],
+        on_chunk: Callable[[list[str], list[list[float]]], None] | None = None,
+        on_progress: ProgressCallback | None = None,
+    ) -> list[list[float]]:
+        """ドキュメントをモデルでembeddingする. bulk_embedderがあればチャンクに分けて並行に処理する.
+
+        Args:
+            texts: ドキュメントテキストのリスト
+            on_chunk: チャンク完了時に (テキスト, ベクトル) で呼ばれるコールバック
+            on_progress: チャンク完了時に (完了件数, 全件数) で呼ばれるコールバック
+
+        Returns:
+            textsと同順のembeddingベクトルのリスト
+        """
+        if self.bulk_embedder is not None:
+            return self.bulk_embedder.embed(self.model, texts, on_chunk=on_chunk, on_progress=on_progress)
+
+        vectors = self.model.embed_documents(texts)
+        if on_chunk is not None:
+            on_chunk(texts, vectors)
+        if on_progress is not None:
+            on_progress(len(texts), len(texts))
+        return vectors
+
+    def _embed_queries_cached(
+        self,
+        texts: list[str],
+        embed: Callable[[list[str]], list[list[float]]],
+    ) -> list[list[float]]:
+        """クエリキャッシュを参照し、ミスしたクエリのみembedで生成する.
+
+        Args:
+            texts: クエリテキストのリスト
+            embed: ミスしたクエリテキストのリストからembeddingを生成する関数
+
+        Returns:
+            textsと同順のembeddingベクトルのリスト
+        """
+        keys, vectors, missing = self._lookup_queries(texts)
+        if missing:
+            first_texts: dict[tuple[str, str], str] = {}
+            for i in missing:
+                first_texts.setdefault(keys[i], texts[i])
+            embedded = dict(zip(first_texts, embed(list(first_texts.values())), strict=True))
+            self._store_queries(list(embedded), list(embedded.values()))
+            for i in missing:
+                vectors[i] = embedded[keys[i]]
+
+        return vectors
+
+    def _lookup_queries(
+        self,
+        texts: list[str],
+    ) -> tuple[list[tuple[str, str]], list[list[float] | None], list[int]]:
+        """クエリembeddingをLRUキャッシュ、必要に応じてディスクキャッシュから探す.
+
+        Args:
+            texts: クエリテキストのリスト
+
+        Returns:
+            キャッシュキーのリスト、見つかったembedding（未キャッシュはNone）のリスト、
+            未キャッシュのクエリの位置のリスト
+        """
+        keys = [(self.model_name, normalize_query(text)) for text in texts]
+        vectors: list[list[float] | None] = [self._query_cache_get(key) for key in keys]
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing and self.persist_queries and self.cache is not None:
+            stored = self.cache.get_many(self.query_cache_model, [keys[i][1] for i in missing])
+            for i, vector in zip(missing, stored, strict=True):
+                if vector is not None:
+                    vectors[i] = vector.tolist()
+                    self._query_cache_put(keys[i], vectors[i])
+            missing = [i for i in missing if vectors[i] is None]
+
+        with self._query_cache_lock:
+            self.query_cache_hits += len(texts) - len(missing)
+            self.query_cache_misses += len(missing)
+        return keys, vectors, missing
+
+    def _store_queries(self, keys: list[tuple[str, str]], vectors: list[list[float]]) -> None:
+        """生成したクエリembeddingをLRUキャッシュ、必要に応じてディスクキャッシュに保存する.
+
+        Args:
+            keys: キャッシュキーのリスト
+            vectors: keysと同順のembeddingベクトルのリスト
+        """
+        for key, vector in zip(keys, vectors, strict=True):
+            self._query_cache_put(key, vector)
+        if self.persist_queries and self.cache is not None:
+            self.cache.put_many(self.query_cache_model, [key[1] for key in keys], vectors)
+
+    def _query_cache_get(self, key: tuple[str, str]) -> list[float] | None:
+        """LRUキャッシュからクエリembeddingを取得する.
+
+        Args:
+            key: (モデル名, 正規化テキスト)
+
+        Returns:
+            embeddingベクトル. 未キャッシュの場合はNone.
+        """
+        with self._query_cache_lock:
+            vector = self._query_cache.get(key)
+            if vector is not None:
+                self._query_cache.move_to_end(key)
+            return vector
+
+    def _query_cache_put(self, key: tuple[str, str], vector: list[float]) -> None:
+        """LRUキャッシュにクエリembeddingを追加し、上限を超えた古い要素を捨てる.
+
+        Args:
+            key: (モデル名, 正規化テキスト)
+            vector: embeddingベクトル
+        """
+        if self.query_cache_size <= 0:
+            return
+        with self._query_cache_lock:
+            self._query_cache[key] = vector
+            self._query_cache.move_to_end(key)
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
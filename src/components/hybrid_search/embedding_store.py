@@ -0,0 +1,236 @@
+"""Bullet embeddingを量子化してサイドカーファイルに保存するストア."""
+
+import fcntl
+import json
+import logging
+import os
+import re
+import tempfile
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EmbeddingDType = Literal["float16", "int8"]
+
+_INT8_MAX = 127
+
+
+def quantize(matrix: np.ndarray, dtype: EmbeddingDType) -> tuple[np.ndarray, np.ndarray | None]:
+    """float32行列を指定の型に量子化する.
+
+    Args:
+        matrix: float32のembedding行列
+        dtype: 保存する型（float16 / int8）
+
+    Returns:
+        量子化済み行列と行ごとのスケール. float16の場合スケールはNone.
+    """
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+
+    scales = np.abs(matrix).max(axis=1) / _INT8_MAX
+    scales = np.where(scales == 0, 1, scales).astype(np.float32)
+    quantized = np.clip(np.rint(matrix / scales[:, None]), -_INT8_MAX, _INT8_MAX).astype(np.int8)
+    return quantized, scales
+
+
+class EmbeddingStore:
+    """Bullet embeddingをPlaybookの横のサイドカーファイルに保存・memmap読み込みするクラス.
+
+    `<path>.<世代>.npy` に量子化済み行列、`<path>.<世代>.scales.npy` にint8用の行スケール、
+    `<path>.json` にモデル名・型・Bullet ID・テキストハッシュと参照する世代のファイル名を保存する.
+    読み込みは `np.load(mmap_mode="r")` で行うため、複数プロセスでページを共有でき、
+    必要な行だけを1回の配列演算でfloat32に戻す. 書き込みは `<path>.lock` へのアドバイザリロックの下で行う.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """EmbeddingStoreを初期化する.
+
+        Args:
+            path: サイドカーファイルのパス（拡張子なし）
+        """
+        self.path = Path(path)
+        self.model: str | None = None
+        self._rows: dict[str, tuple[int, str]] = {}
+        self._vectors: np.ndarray | None = None
+        self._scales: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        """読み込み済みのベクトル数を返す."""
+        return len(self._rows)
+
+    @property
+    def meta_path(self) -> Path:
+        """メタデータファイルのパスを返す."""
+        return self.path.with_name(f"{self.path.name}.json")
+
+    def load(self) -> bool:
+        """サイドカーファイルをmemmapで開く.
+
+        Returns:
+            読み込めた場合True. ファイルが存在しないか不整合な場合False.
+        """
+        meta = self._read_meta()
+        if meta is None:
+            return False
+
+        try:
+            vectors = np.load(self.path.with_name(meta["vectors"]), mmap_mode="r")
+            scales = np.load(self.path.with_name(meta["scales"]), mmap_mode="r") if meta["scales"] else None
+        except FileNotFoundError:
+            logger.warning("Embedding sidecar %s was replaced while loading, ignoring", self.path)
+            return False
+        if len(vectors) != len(meta["ids"]) or (scales is not None and len(scales) != len(vectors)):
+            logger.warning("Embedding sidecar %s is inconsistent, ignoring", self.path)
+            return False
+
+        self.model = meta["model"]
+        self._vectors = vectors
+        self._scales = scales
+        self._rows = {
+            bullet_id: (row, text_hash)
+            for row, (bullet_id, text_hash) in enumerate(zip(meta["ids"], meta["text_hashes"], strict=True))
+        }
+        return True
+
+    def has(self, bullet_id: str, text_hash: str) -> bool:
+        """Bulletの現在のテキストのembeddingが保存されているかを返す.
+
+        Args:
+            bullet_id: Bullet ID
+            text_hash: 現在のsearchable_textのハッシュ
+
+        Returns:
+            保存されている場合True
+        """
+        entry = self._rows.get(bullet_id)
+        return entry is not None and entry[1] == text_hash
+
+    def get(self, bullet_id: str, text_hash: str) -> np.ndarray | None:
+        """Bulletのembeddingをfloat32で取得する.
+
+        Args:
+            bullet_id: Bullet ID
+            text_hash: 現在のsearchable_textのハッシュ
+
+        Returns:
+            embeddingベクトル. 未保存またはテキストが変わっている場合はNone.
+        """
+        found, vectors = self.get_many([bullet_id], [text_hash])
+        return vectors[0] if found.size else None
+
+    def get_many(self, bullet_ids: list[str], text_hashes: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """複数のBulletのembeddingをまとめてfloat32で取得する.
+
+        保存済みの行をまとめてmemmapから取り出し、量子化を一括で戻す.
+
+        Args:
+            bullet_ids: Bullet IDリスト
+            text_hashes: bullet_idsと同順の現在のsearchable_textのハッシュ
+
+        Returns:
+            (保存済みでテキストも同じBulletのbullet_ids中の位置, その位置と同順のembedding行列)
+        """
+        positions: list[int] = []
+        rows: list[int] = []
+        for position, (bullet_id, text_hash) in enumerate(zip(bullet_ids, text_hashes, strict=True)):
+            entry = self._rows.get(bullet_id)
+            if entry is not None and entry[1] == text_hash:
+                positions.append(position)
+                rows.append(entry[0])
+
+        found = np.asarray(positions, dtype=np.intp)
+        if self._vectors is None or not rows:
+            return found, np.empty((0, 0 if self._vectors is None else self._vectors.shape[1]), dtype=np.float32)
+
+        row_index = np.asarray(rows, dtype=np.intp)
+        vectors = self._vectors[row_index].astype(np.float32)
+        if self._scales is not None:
+            vectors *= self._scales[row_index][:, None]
+        return found, vectors
+
+    def save(
+        self,
+        model: str,
+        bullet_ids: list[str],
+        text_hashes: list[str],
+        matrix: np.ndarray,
+        dtype: EmbeddingDType = "float16",
+    ) -> None:
+        """embedding行列を量子化してサイドカーファイルに書き出し、読み込み直す.
+
+        行列は新しい世代のファイルに書き、最後にメタデータをアトミックに置き換えるため、
+        読み込み中の他プロセスが書き込み途中のファイルや世代の混在を見ることはない.
+        置き換えた後、メタデータが参照しない世代のファイル（中断された書き込みの残骸を含む）を削除する.
+
+        Args:
+            model: embeddingモデル名
+            bullet_ids: Bullet IDリスト
+            text_hashes: bullet_idsと同順のsearchable_textのハッシュ
+            matrix: bullet_idsと同順のfloat32 embedding行列
+            dtype: 保存する型（float16 / int8）
+        """
+        generation = uuid.uuid4().hex[:12]
+        quantized, scales = quantize(np.asarray(matrix, dtype=np.float32), dtype)
+
+        meta = {
+            "model": model,
+            "dtype": dtype,
+            "vectors": f"{self.path.name}.{generation}.npy",
+            "scales": f"{self.path.name}.{generation}.scales.npy" if scales is not None else None,
+            "ids": bullet_ids,
+            "text_hashes": text_hashes,
+        }
+        with self._lock():
+            np.save(self.path.with_name(meta["vectors"]), quantized)
+            if scales is not None:
+                np.save(self.path.with_name(meta["scales"]), scales)
+            fd, tmp_name = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.meta_path.name}.", suffix=".tmp")
+            tmp_path = Path(tmp_name)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(meta, f)
+                tmp_path.replace(self.meta_path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+            self._remove_unreferenced(meta)
+        self.load()
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        """サイドカーファイルの排他ロックを取得し、ブロックの終了時に解放する."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.with_name(f"{self.path.name}.lock").open("a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _remove_unreferenced(self, meta: dict) -> None:
+        """メタデータが参照しない世代のファイルを削除する. ロックの下で呼び出す.
+
+        Args:
+            meta: 現在のメタデータ
+        """
+        pattern = re.compile(rf"{re.escape(self.path.name)}\.[0-9a-f]{{12}}(\.scales)?\.npy")
+        referenced = {meta["vectors"], meta["scales"]}
+        for path in self.path.parent.iterdir():
+            if pattern.fullmatch(path.name) and path.name not in referenced:
+                path.unlink(missing_ok=True)
+
+    def _read_meta(self) -> dict | None:
+        """メタデータファイルを読み込む.
+
+        Returns:
+            メタデータのdict. 存在しない場合はNone.
+        """
+        if not self.meta_path.exists():
+            return None
+        return json.loads(self.meta_path.read_text(encoding="utf-8"))
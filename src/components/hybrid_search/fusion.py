@@ -0,0 +1,116 @@
+"""ベクトルスコアとBM25スコアを統合するスコア融合戦略."""
+
+from collections.abc import Callable
+from typing import Literal
+
+import numpy as np
+
+FusionStrategy = Literal["linear", "rrf", "zscore"]
+
+
+def min_max_normalize(scores: np.ndarray) -> np.ndarray:
+    """スコアをmin-max正規化する.
+
+    Args:
+        scores: スコア配列
+
+    Returns:
+        0〜1に正規化したスコア. 全て同値の場合は0.5.
+    """
+    min_s, max_s = scores.min(), scores.max()
+    if max_s > min_s:
+        return (scores - min_s) / (max_s - min_s)
+    return np.full_like(scores, 0.5)
+
+
+def z_normalize(scores: np.ndarray) -> np.ndarray:
+    """スコアを平均0・標準偏差1に標準化する.
+
+    Args:
+        scores: スコア配列
+
+    Returns:
+        標準化したスコア. 全て同値の場合は0.
+    """
+    std = scores.std()
+    if std > 0:
+        return (scores - scores.mean()) / std
+    return np.zeros_like(scores)
+
+
+def reciprocal_ranks(scores: np.ndarray, k: int, *, zero_is_missing: bool = False) -> np.ndarray:
+    """スコア降順の順位からRRFの寄与 `1 / (k + rank)` を計算する.
+
+    Args:
+        scores: スコア配列
+        k: 上位の順位差を緩和する定数
+        zero_is_missing: Trueの場合、スコア0の要素はランキングに含まれないものとして寄与を0とする
+
+    Returns:
+        scoresと同順の寄与の配列. 同点は元の順序で順位付けする.
+    """
+    ranks = np.empty(len(scores), dtype=np.float64)
+    ranks[np.argsort(-scores, kind="stable")] = np.arange(1, len(scores) + 1)
+    contributions = 1.0 / (k + ranks)
+    if zero_is_missing:
+        contributions[scores == 0] = 0.0
+    return contributions
+
+
+def linear_fusion(vector_scores: np.ndarray, bm25_scores: np.ndarray, alpha: float, rrf_k: int) -> np.ndarray:  # noqa: ARG001
+    """min-max正規化したスコアをalphaで重み付けして足し合わせる.
+
+    Args:
+        vector_scores: ベクトルスコア
+        bm25_scores: BM25スコア
+        alpha: ベクトルスコアの重み（0〜1）
+        rrf_k: 未使用
+
+    Returns:
+        統合スコアの配列
+    """
+    return alpha * min_max_normalize(vector_scores) + (1 - alpha) * min_max_normalize(bm25_scores)
+
+
+def rrf_fusion(vector_scores: np.ndarray, bm25_scores: np.ndarray, alpha: float, rrf_k: int) -> np.ndarray:
+    """Reciprocal Rank Fusionでスコアを統合する.
+
+    スコアの分布に依存せず順位だけを用いる. BM25スコアが0の要素は
+    BM25のランキングに含まれないものとして扱う.
+
+    Args:
+        vector_scores: ベクトルスコア
+        bm25_scores: BM25スコア
+        alpha: ベクトル側ランキングの重み（0〜1）
+        rrf_k: 上位の順位差を緩和する定数
+
+    Returns:
+        統合スコアの配列
+    """
+    return alpha * reciprocal_ranks(vector_scores, rrf_k) + (1 - alpha) * reciprocal_ranks(
+        bm25_scores, rrf_k, zero_is_missing=True
+    )
+
+
+def zscore_fusion(vector_scores: np.ndarray, bm25_scores: np.ndarray, alpha: float, rrf_k: int) -> np.ndarray:  # noqa: ARG001
+    """標準化したスコアをalphaで重み付けして足し合わせる.
+
+    min-max正規化と異なり、外れ値1件に全体のスケールが引きずられない.
+
+    Args:
+        vector_scores: ベクトルスコア
+        bm25_scores: BM25スコア
+        alpha: ベクトルスコアの重み（0〜1）
+        rrf_k: 未使用
+
+    Returns:
+        統合スコアの配列
+    """
+    return alpha * z_normalize(vector_scores) + (1 - alpha) * z_normalize(bm25_scores)
+
+
+FUSION_STRATEGIES: dict[str, Callable[[np.ndarray, np.ndarray, float, int], np.ndarray]] = {
+    "linear": linear_fusion,
+    "rrf": rrf_fusion,
+    "zscore": zscore_fusion,
+}
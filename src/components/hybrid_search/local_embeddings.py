@@ -0,0 +1,121 @@
+"""ネットワーク不要の決定的なローカルembeddingモデル."""
+
+import asyncio
+import hashlib
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from src.components.hybrid_search.tokenizer import tokenize
+
+LOCAL_HASHING_MODEL = "local-hashing"
+
+
+class HashingEmbeddings(Embeddings):
+    """トークンの特徴ハッシングによる決定的なEmbeddingsクラス.
+
+    BM25と同じトークナイザで分割したトークンをハッシュで次元と符号に割り当てて足し合わせ、
+    L2正規化する. 同じテキストは常に同じベクトルになり、トークンを共有するテキスト同士は
+    類似度が高くなるため、ネットワークのない環境でのベンチマークやテストに使える.
+    """
+
+    def __init__(self, dimension: int = 256, latency_ms: float = 0.0) -> None:
+        """HashingEmbeddingsを初期化する.
+
+        Args:
+            dimension: ベクトルの次元数
+            latency_ms: 1リクエストごとに模擬する待ち時間（ミリ秒）
+        """
+        self.dimension = dimension
+        self.latency_ms = latency_ms
+        self.model = f"{LOCAL_HASHING_MODEL}-{dimension}"
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """複数テキストのembeddingを生成する.
+
+        Args:
+            texts: テキストのリスト
+
+        Returns:
+            embeddingベクトルのリスト
+        """
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        """クエリテキストのembeddingを生成する.
+
+        Args:
+            text: クエリテキスト
+
+        Returns:
+            embeddingベクトル
+        """
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """複数テキストのembeddingを非同期に生成する. 模擬待ち時間はイベントループを止めない.
+
+        Args:
+            texts: テキストのリスト
+
+        Returns:
+            embeddingベクトルのリスト
+        """
+        if self.latency_ms > 0:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """クエリテキストのembeddingを非同期に生成する.
+
+        Args:
+            text: クエリテキスト
+
+        Returns:
+            embeddingベクトル
+        """
+        return (await self.aembed_documents([text]))[0]
+
+    def _embed(self, text: str) -> list[float]:
+        """1テキストのembeddingを計算する.
+
+        Args:
+            text: テキスト
+
+        Returns:
+            L2正規化済みのembeddingベクトル. トークンがない場合はゼロベクトル.
+        """
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in tokenize(text):
+            digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dimension] += 1.0 if digest >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+
+def create_embedding_model(
+    model: str,
+    api_key: str = "",
+    dimension: int = 256,
+    latency_ms: float = 0.0,
+) -> Embeddings:
+    """モデル名からEmbeddingsモデルを生成するファクトリ.
+
+    Args:
+        model: モデル名. `local-hashing` の場合はローカルのHashingEmbeddingsを使う.
+        api_key: OpenAIのAPIキー
+        dimension: ローカルモデルのベクトル次元数
+        latency_ms: ローカルモデルで模擬する待ち時間（ミリ秒）
+
+    Returns:
+        Embeddingsインスタンス
+    """
+    if model == LOCAL_HASHING_MODEL:
+        return HashingEmbeddings(dimension=dimension, latency_ms=latency_ms)
+    return OpenAIEmbeddings(model=model, api_key=api_key)
@@ -15,9 +15,44 @@ class SearchQuery(BaseModel):
 
 
 class SearchResult(BaseModel):
-    """検索結果を表すモデル."""
+    """検索結果を表すモデル.
+
+    vector_score / bm25_score は候補内で正規化したスコア、raw_vector_score / raw_bm25_score は
+    正規化前のコサイン類似度とBM25スコア.
+    """
 
     bullet: Bullet
     vector_score: float
     bm25_score: float
     combined_score: float
+    raw_vector_score: float = 0.0
+    raw_bm25_score: float = 0.0
+
+
+class ShardSearchResult(SearchResult):
+    """シャード検索の結果を表すモデル."""
+
+    dataset: str
+
+
+class ScoreBreakdown(BaseModel):
+    """検索結果1件のスコア内訳を表すモデル."""
+
+    bullet_id: str
+    raw_vector_score: float
+    raw_bm25_score: float
+    vector_score: float
+    bm25_score: float
+    combined_score: float
+
+
+class SearchExplanation(BaseModel):
+    """1回の検索の実行内訳を表すモデル.
+
+    stage_times_msのsync_indexはembed_documentsの時間を含む.
+    """
+
+    results: list[SearchResult]
+    stage_times_ms: dict[str, float]
+    candidate_counts: dict[str, int]
+    score_breakdowns: list[ScoreBreakdown]
@@ -0,0 +1,166 @@
+"""検索のステージ別処理時間・候補数の計測とプロセス全体での集計."""
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from src.components.hybrid_search.models import ScoreBreakdown  # noqa: TC001
+
+
+class SearchTrace:
+    """1回の検索（またはバッチ検索）のステージ別処理時間と候補数を記録するクラス.
+
+    Attributes:
+        queries: 計測対象のクエリ数
+        explain: 検索結果ごとのスコア内訳を記録するか
+        stage_times_ms: ステージ名から処理時間（ミリ秒）へのdict. 同じステージは合算する.
+        candidate_counts: 絞り込み段階名から候補数へのdict. バッチ検索ではクエリ間で合算する.
+        score_breakdowns: explainがTrueの場合の、検索結果ごとのスコア内訳
+    """
+
+    def __init__(self, queries: int = 1, *, explain: bool = False) -> None:
+        """SearchTraceを初期化する.
+
+        Args:
+            queries: 計測対象のクエリ数
+            explain: 検索結果ごとのスコア内訳を記録するか
+        """
+        self.queries = queries
+        self.explain = explain
+        self.stage_times_ms: dict[str, float] = {}
+        self.candidate_counts: dict[str, int] = {}
+        self.score_breakdowns: list[ScoreBreakdown] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """ブロックの処理時間をステージの処理時間に加算する.
+
+        Args:
+            name: ステージ名
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stage_times_ms[name] = self.stage_times_ms.get(name, 0.0) + elapsed
+
+    def count(self, name: str, value: int) -> None:
+        """絞り込み段階の候補数を加算する.
+
+        Args:
+            name: 絞り込み段階名
+            value: 候補数
+        """
+        self.candidate_counts[name] = self.candidate_counts.get(name, 0) + int(value)
+
+
+_current_trace: ContextVar[SearchTrace | None] = ContextVar("search_trace", default=None)
+
+
+@contextmanager
+def tracing(trace: SearchTrace) -> Iterator[SearchTrace]:
+    """ブロック内の検索処理をtraceに記録し、終了時にプロセス全体の集計に加える.
+
+    Args:
+        trace: 記録先のSearchTrace
+
+    Yields:
+        trace
+    """
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        SEARCH_METRICS.record(trace)
+
+
+def current_trace() -> SearchTrace | None:
+    """実行中の検索のSearchTraceを返す. 計測中でない場合はNone."""
+    return _current_trace.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """実行中の検索のSearchTraceにブロックの処理時間を記録する. 計測中でない場合は何もしない.
+
+    Args:
+        name: ステージ名
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.stage(name):
+        yield
+
+
+class SearchMetrics:
+    """プロセス全体の検索のステージ別処理時間と候補数を集計するクラス."""
+
+    def __init__(self) -> None:
+        """SearchMetricsを初期化する."""
+        self.searches = 0
+        self.traces = 0
+        self._stage_totals: dict[str, float] = {}
+        self._stage_calls: dict[str, int] = {}
+        self._stage_max: dict[str, float] = {}
+        self._count_totals: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, trace: SearchTrace) -> None:
+        """1回の検索の計測結果を集計に加える.
+
+        Args:
+            trace: 検索のSearchTrace
+        """
+        with self._lock:
+            self.searches += trace.queries
+            self.traces += 1
+            for name, elapsed in trace.stage_times_ms.items():
+                self._stage_totals[name] = self._stage_totals.get(name, 0.0) + elapsed
+                self._stage_calls[name] = self._stage_calls.get(name, 0) + 1
+                self._stage_max[name] = max(self._stage_max.get(name, 0.0), elapsed)
+            for name, value in trace.candidate_counts.items():
+                self._count_totals[name] = self._count_totals.get(name, 0) + value
+
+    def snapshot(self) -> dict[str, object]:
+        """集計結果を返す.
+
+        Returns:
+            searches（クエリ数）、stages（ステージごとの total_ms / mean_ms / max_ms / calls）、
+            candidates（絞り込み段階ごとの total / mean_per_query）をキーとするdict
+        """
+        with self._lock:
+            return {
+                "searches": self.searches,
+                "stages": {
+                    name: {
+                        "total_ms": total,
+                        "mean_ms": total / self._stage_calls[name],
+                        "max_ms": self._stage_max[name],
+                        "calls": self._stage_calls[name],
+                    }
+                    for name, total in self._stage_totals.items()
+                },
+                "candidates": {
+                    name: {"total": total, "mean_per_query": total / max(self.searches, 1)}
+                    for name, total in self._count_totals.items()
+                },
+            }
+
+    def reset(self) -> None:
+        """集計結果を初期化する."""
+        with self._lock:
+            self.searches = 0
+            self.traces = 0
+            self._stage_totals.clear()
+            self._stage_calls.clear()
+            self._stage_max.clear()
+            self._count_totals.clear()
+
+
+SEARCH_METRICS = SearchMetrics()
@@ -0,0 +1,204 @@
+"""Embeddingの次元削減（Matryoshka切り詰め・PCA射影）."""
+
+import hashlib
+import logging
+from pathlib import Path
+
+import numpy as np
+
+from src.components.hybrid_search.vector_index import l2_normalize
+
+logger = logging.getLogger(__name__)
+
+PCA_MAX_FIT_SAMPLES = 20000
+
+
+class TruncationReducer:
+    """先頭dimension次元に切り詰めて再正規化する次元削減クラス.
+
+    `text-embedding-3-*` のようなMatryoshka表現学習済みのモデルでは、
+    先頭の次元だけでも元のベクトルの類似度をよく保つ.
+    """
+
+    def __init__(self, dimension: int) -> None:
+        """TruncationReducerを初期化する.
+
+        Args:
+            dimension: 削減後の次元数
+        """
+        self.dimension = dimension
+
+    @property
+    def signature(self) -> str:
+        """削減方法を識別する文字列を返す. サイドカーファイルの互換性判定に使う."""
+        return f"truncate{self.dimension}"
+
+    def needs_fitting(self, size: int) -> bool:  # noqa: ARG002
+        """学習が必要かを返す. 切り詰めは学習不要.
+
+        Args:
+            size: インデックス対象のBullet数
+
+        Returns:
+            常にFalse
+        """
+        return False
+
+    def fit(self, matrix: np.ndarray) -> None:
+        """学習は不要のため何もしない.
+
+        Args:
+            matrix: 元の次元のembedding行列
+        """
+
+    def transform(self, vectors: np.ndarray | list[float] | list[list[float]]) -> np.ndarray:
+        """ベクトル（または行列の各行）を先頭dimension次元に切り詰めて再正規化する.
+
+        Args:
+            vectors: 元の次元のベクトルまたは行列
+
+        Returns:
+            L2正規化済みの削減後のベクトルまたは行列
+        """
+        return l2_normalize(np.asarray(vectors, dtype=np.float32)[..., : self.dimension])
+
+    def save(self, path: Path) -> None:
+        """保存する状態がないため何もしない.
+
+        Args:
+            path: 状態ファイルのパス
+        """
+
+    def load(self, path: Path) -> bool:  # noqa: ARG002
+        """読み込む状態がないため何もしない.
+
+        Args:
+            path: 状態ファイルのパス
+
+        Returns:
+            常にTrue
+        """
+        return True
+
+
+class PCAReducer(TruncationReducer):
+    """Playbookのembeddingで学習したPCA射影による次元削減クラス.
+
+    Bullet数がmin_fit_size以上になるまでは切り詰めで代用し、学習後は
+    学習時からBullet数がrefit_growth倍に増えるたびに学習し直す.
+    学習済みの射影は `save` / `load` でembeddingのサイドカーファイルと一緒に保存する.
+    """
+
+    def __init__(self, dimension: int, min_fit_size: int = 1000, refit_growth: float = 4.0) -> None:
+        """PCAReducerを初期化する.
+
+        Args:
+            dimension: 削減後の次元数
+            min_fit_size: 学習を開始する最小Bullet数
+            refit_growth: 学習時からBullet数が何倍に増えたら学習し直すか
+        """
+        super().__init__(dimension)
+        self.min_fit_size = min_fit_size
+        self.refit_growth = refit_growth
+        self.mean: np.ndarray | None = None
+        self.components: np.ndarray | None = None
+        self.fitted_size = 0
+
+    @property
+    def is_fitted(self) -> bool:
+        """射影が学習済みかを返す."""
+        return self.components is not None
+
+    @property
+    def signature(self) -> str:
+        """削減方法と学習済み射影を識別する文字列を返す."""
+        if self.components is None:
+            return super().signature
+        fingerprint = hashlib.sha256(self.components.tobytes() + self.mean.tobytes()).hexdigest()[:12]
+        return f"pca{self.dimension}-{fingerprint}"
+
+    def needs_fitting(self, size: int) -> bool:
+        """現在のBullet数で学習（または再学習）が必要かを返す.
+
+        Args:
+            size: インデックス対象のBullet数
+
+        Returns:
+            学習が必要な場合True
+        """
+        if size < self.min_fit_size:
+            return False
+        return not self.is_fitted or size > self.fitted_size * self.refit_growth
+
+    def fit(self, matrix: np.ndarray) -> None:
+        """中心化したembedding行列の特異値分解から上位dimension個の主成分を求める.
+
+        Args:
+            matrix: 元の次元のembedding行列
+        """
+        matrix = l2_normalize(matrix)
+        sample = matrix
+        if len(matrix) > PCA_MAX_FIT_SAMPLES:
+            rng = np.random.default_rng(0)
+            sample = matrix[rng.choice(len(matrix), size=PCA_MAX_FIT_SAMPLES, replace=False)]
+
+        mean = sample.mean(axis=0)
+        _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+        components = np.zeros((self.dimension, matrix.shape[1]), dtype=np.float32)
+        rank = min(self.dimension, len(vt))
+        components[:rank] = vt[:rank]
+
+        self.mean = mean.astype(np.float32)
+        self.components = components
+        self.fitted_size = len(matrix)
+        logger.info("Fitted PCA projection: %d -> %d dims, vectors=%d", matrix.shape[1], self.dimension, len(matrix))
+
+    def transform(self, vectors: np.ndarray | list[float] | list[list[float]]) -> np.ndarray:
+        """ベクトル（または行列の各行）を主成分に射影して再正規化する. 未学習の場合は切り詰める.
+
+        Args:
+            vectors: 元の次元のベクトルまたは行列
+
+        Returns:
+            L2正規化済みの削減後のベクトルまたは行列
+        """
+        if self.components is None:
+            return super().transform(vectors)
+        return l2_normalize((l2_normalize(vectors) - self.mean) @ self.components.T)
+
+    def save(self, path: Path) -> None:
+        """学習済みの射影をnpzファイルに保存する. 未学習の場合は何もしない.
+
+        Args:
+            path: 状態ファイルのパス
+        """
+        if self.components is None:
+            return
+
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        with tmp_path.open("wb") as f:
+            np.savez(f, mean=self.mean, components=self.components, fitted_size=self.fitted_size)
+        tmp_path.replace(path)
+
+    def load(self, path: Path) -> bool:
+        """保存済みの射影を読み込む.
+
+        Args:
+            path: 状態ファイルのパス
+
+        Returns:
+            読み込めた場合True. ファイルが存在しないか次元数が異なる場合False.
+        """
+        if not path.exists():
+            return False
+
+        with np.load(path) as state:
+            if state["components"].shape[0] != self.dimension:
+                return False
+            self.mean = state["mean"]
+            self.components = state["components"]
+            self.fitted_size = int(state["fitted_size"])
+        return True
+
+
+EmbeddingReducer = TruncationReducer | PCAReducer
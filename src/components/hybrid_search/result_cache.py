@@ -0,0 +1,101 @@
+"""検索対象のインデックスの識別子をキーに含む検索結果キャッシュ."""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+
+from src.components.hybrid_search.models import SearchQuery, SearchResult
+
+
+class SearchResultCache:
+    """検索結果を (検索対象のスコープ, クエリテキスト, top_k, フィルタ) 単位で保持するLRUキャッシュクラス.
+
+    スコープは検索側が決める識別子で、HybridSearchはインスタンスの識別子とインデックスの世代の組を渡す.
+    インデックスが更新されると以前の結果は参照されなくなり、LRUで追い出される.
+    """
+
+    def __init__(self, max_size: int = 1024) -> None:
+        """SearchResultCacheを初期化する.
+
+        Args:
+            max_size: 保持する検索結果の最大件数. 0の場合はキャッシュしない.
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, list[SearchResult]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """保持している検索結果の件数を返す."""
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(query: SearchQuery, scope: Hashable) -> Hashable:
+        """検索クエリと検索対象のスコープからキャッシュキーを作成する.
+
+        Args:
+            query: 検索クエリ
+            scope: 検索対象のインデックスの識別子
+
+        Returns:
+            キャッシュキー
+        """
+        section_filter = tuple(query.section_filter) if query.section_filter is not None else None
+        return (
+            scope,
+            query.query_text,
+            query.top_k,
+            section_filter,
+            query.min_confidence,
+        )
+
+    def get(self, query: SearchQuery, scope: Hashable) -> list[SearchResult] | None:
+        """キャッシュ済みの検索結果を取得する.
+
+        Args:
+            query: 検索クエリ
+            scope: 検索対象のインデックスの識別子
+
+        Returns:
+            検索結果のリスト. 未キャッシュの場合はNone.
+        """
+        key = self.make_key(query, scope)
+        with self._lock:
+            results = self._entries.get(key)
+            if results is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(results)
+
+    def put(self, query: SearchQuery, scope: Hashable, results: list[SearchResult]) -> None:
+        """検索結果を保存し、上限を超えた古い結果を捨てる.
+
+        Args:
+            query: 検索クエリ
+            scope: 検索対象のインデックスの識別子
+            results: 検索結果のリスト
+        """
+        if self.max_size <= 0:
+            return
+        key = self.make_key(query, scope)
+        with self._lock:
+            self._entries[key] = list(results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """全ての検索結果を捨てる."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """ヒット数・ミス数・保持件数を返す.
+
+        Returns:
+            hits / misses / size をキーとするdict
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
@@ -1,28 +1,104 @@
 """Numpyベクトル近傍探索とBM25を組み合わせたハイブリッド検索エンジン."""
 
+import asyncio
+import itertools
+import threading
+from collections.abc import Hashable
+from pathlib import Path
+
 import numpy as np
-from rank_bm25 import BM25Okapi
 
+from src.components.hybrid_search.ann_index import IVFIndex
+from src.components.hybrid_search.bm25_index import BM25Index
+from src.components.hybrid_search.embedding_cache import EmbeddingCache
 from src.components.hybrid_search.embedding_client import EmbeddingClient
-from src.components.hybrid_search.models import SearchQuery, SearchResult
+from src.components.hybrid_search.embedding_store import EmbeddingDType, EmbeddingStore
+from src.components.hybrid_search.fusion import FUSION_STRATEGIES, FusionStrategy, min_max_normalize
+from src.components.hybrid_search.models import ScoreBreakdown, SearchExplanation, SearchQuery, SearchResult
+from src.components.hybrid_search.profiling import SearchTrace, current_trace, stage, tracing
+from src.components.hybrid_search.reduction import EmbeddingReducer
+from src.components.hybrid_search.result_cache import SearchResultCache
+from src.components.hybrid_search.tokenizer import tokenize, tokenize_query
+from src.components.hybrid_search.vector_index import VectorIndex, l2_normalize
 from src.components.playbook_store.models import Bullet, Playbook
 
+_INSTANCE_IDS = itertools.count()
+
+# search_manyで1回にスコア行列を計算するクエリ数の上限（クエリ数×Bullet数の行列の大きさを抑える）
+_MAX_BATCH_QUERIES = 256
+
 
 class HybridSearch:
     """ハイブリッド検索エンジンクラス.
 
     Numpyベクトル近傍探索とBM25全文検索を組み合わせて検索する.
+    BM25用の転置インデックスと正規化済みembedding行列は、検索対象のPlaybookオブジェクト・
+    バージョン・Bullet数のいずれかが前回の検索から変わった場合にPlaybookと差分同期され、
+    Curatorからは `upsert_bullets` / `remove_bullets` / `increment_counters` で直接更新できる.
+    ann_indexを指定した場合、ベクトル検索はIVFで絞り込んだ候補とBM25ヒットのみを対象とする.
+    `load_embeddings` でサイドカーファイルを開くと、保存済みのembeddingはモデルに問い合わせずに再利用する.
+    セクションとhelpful/harmfulカウンターはインデックスの行に揃えた配列で保持し、
+    section_filterとmin_confidenceはスコア配列に対するブールマスクとして適用する.
+    reducerを指定した場合、Bulletとクエリのembeddingは削減後の次元で保持・比較する.
+    result_cacheを指定した場合、インデックスが変化していなければ同じクエリは検索をやり直さない.
+    キャッシュのキーにはインスタンスごとの識別子と、インデックスを変更するたびに増える世代を含めるため、
+    キャッシュを共有する他のインスタンスや、同じメタデータを持つ別のPlaybookの結果は返さない.
+    検索のステージ別処理時間と候補数はプロセス全体で集計され、`explain` で1回の検索の内訳を取得できる.
+
+    Note:
+        - インデックスは1つのPlaybookの内容を保持し、`upsert_bullets` などの差分更新は同期中の
+          Playbookへの変更として扱う. 複数のデータセットを扱う場合は、データセットごとに
+          インスタンスを分ける（ShardedSearchのシャードなど）.
+        - インデックスの同期・更新とスコア計算はロックで直列化するため、複数スレッドから
+          同じインスタンスで検索できる. クエリのembedding取得はロックの外で行う.
     """
 
-    def __init__(self, embedding_client: EmbeddingClient, alpha: float = 0.5) -> None:
+    def __init__(  # noqa: PLR0913
+        self,
+        embedding_client: EmbeddingClient,
+        alpha: float = 0.5,
+        *,
+        ann_index: IVFIndex | None = None,
+        embedding_dtype: EmbeddingDType = "float16",
+        fusion: FusionStrategy = "linear",
+        rrf_k: int = 60,
+        reducer: EmbeddingReducer | None = None,
+        result_cache: SearchResultCache | None = None,
+    ) -> None:
         """HybridSearchを初期化する.
 
         Args:
             embedding_client: embedding生成クライアント
             alpha: ベクトルスコアの重み（0〜1）
+            ann_index: 近似最近傍インデックス. Noneの場合は全件探索を行う.
+            embedding_dtype: サイドカーファイルに保存するembeddingの型（float16 / int8）
+            fusion: スコア融合戦略（linear / rrf / zscore）
+            rrf_k: Reciprocal Rank Fusionの順位緩和定数
+            reducer: embeddingの次元削減. Noneの場合は元の次元のまま扱う.
+            result_cache: 検索結果キャッシュ. Noneの場合はキャッシュしない.
         """
         self.embedding_client = embedding_client
         self.alpha = alpha
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.ann_index = ann_index
+        self.reducer = reducer
+        self.result_cache = result_cache
+        self.embedding_dtype = embedding_dtype
+        self.embedding_store: EmbeddingStore | None = None
+        self.bm25_index = BM25Index()
+        self.vector_index = VectorIndex(
+            columns={"section": np.int32, "helpful": np.int64, "harmful": np.int64, "confidence": np.float64},
+        )
+        self._indexed_texts: dict[str, str] = {}
+        self._bullets: dict[str, Bullet] = {}
+        self._section_codes: dict[str, int] = {}
+        self._bm25_rows: np.ndarray | None = None
+        self._synced_playbook: Playbook | None = None
+        self._synced_token: tuple[int, int] | None = None
+        self._instance_id = next(_INSTANCE_IDS)
+        self._generation = 0
+        self._lock = threading.RLock()
 
     def search(self, query: SearchQuery, playbook: Playbook) -> list[SearchResult]:
         """ハイブリッド検索を実行する.
@@ -37,108 +113,660 @@ class HybridSearch:
         if not playbook.bullets:
             return []
 
-        candidates = self._filter_candidates(query, playbook.bullets)
-        if not candidates:
+        with tracing(SearchTrace()) as trace:
+            scope = self._cache_scope(playbook)
+            cached = self._cached_results(query, scope)
+            if cached is not None:
+                trace.count("cache_hits", 1)
+                return cached
+            return self._cache_results(query, scope, self._search_uncached(query, playbook))
+
+    async def asearch(self, query: SearchQuery, playbook: Playbook) -> list[SearchResult]:
+        """クエリembeddingを非同期に取得してハイブリッド検索を実行する.
+
+        embeddingクライアントにバッチャーが設定されている場合、並行する検索の
+        クエリembeddingは1回のリクエストにまとめられる.
+        インデックスの同期とスコア計算は同期処理のため、イベントループを止めないよう
+        `asyncio.to_thread` でワーカースレッドに移す.
+
+        Args:
+            query: 検索クエリ
+            playbook: 検索対象のPlaybook
+
+        Returns:
+            統合スコア降順のSearchResultリスト
+        """
+        if not playbook.bullets:
             return []
 
-        vector_scores = self._vector_search(query.query_text, candidates)
-        bm25_scores = self._bm25_search(query.query_text, candidates)
-        results = self._combine_scores(candidates, vector_scores, bm25_scores)
+        with tracing(SearchTrace()) as trace:
+            scope = await asyncio.to_thread(self._cache_scope, playbook)
+            cached = self._cached_results(query, scope)
+            if cached is not None:
+                trace.count("cache_hits", 1)
+                return cached
+            with trace.stage("embed_query"):
+                query_embedding = await self.embedding_client.aembed_query(query.query_text)
+            results = await asyncio.to_thread(self._search_uncached, query, playbook, query_embedding)
+            return self._cache_results(query, scope, results)
 
-        results.sort(key=lambda r: r.combined_score, reverse=True)
-        return results[: query.top_k]
+    def explain(self, query: SearchQuery, playbook: Playbook) -> SearchExplanation:
+        """ハイブリッド検索を実行し、ステージ別の処理時間・候補数・スコア内訳を返す.
 
-    def _filter_candidates(self, query: SearchQuery, bullets: list[Bullet]) -> list[Bullet]:
-        """セクションと信頼度スコアでBulletをフィルタリングする.
+        計測のため検索結果キャッシュは参照しない. 計測結果はプロセス全体の集計にも加える.
 
         Args:
             query: 検索クエリ
-            bullets: フィルタリング対象のBulletリスト
+            playbook: 検索対象のPlaybook
 
         Returns:
-            フィルタリング後のBulletリスト
+            検索結果とその実行内訳
         """
-        candidates = bullets
-        if query.section_filter:
-            candidates = [b for b in candidates if b.section in query.section_filter]
-        candidates = [b for b in candidates if b.confidence_score >= query.min_confidence]
-        return candidates  # noqa: RET504
+        trace = SearchTrace(explain=True)
+        with tracing(trace):
+            results = self._search_uncached(query, playbook) if playbook.bullets else []
+        return SearchExplanation(
+            results=results,
+            stage_times_ms=trace.stage_times_ms,
+            candidate_counts=trace.candidate_counts,
+            score_breakdowns=trace.score_breakdowns,
+        )
+
+    def search_many(self, queries: list[SearchQuery], playbook: Playbook) -> list[list[SearchResult]]:
+        """複数クエリのハイブリッド検索をまとめて実行する.
 
-    def _vector_search(self, query_text: str, candidates: list[Bullet]) -> list[float]:
-        """ベクトル近傍探索を実行してスコアを計算する.
+        クエリのembeddingは1回のリクエストで生成し、ベクトルスコアは行列積1回、
+        BM25スコアはクエリ×単語行列と疎な重み行列の積1回で計算する.
+        クエリ数が多い場合は、スコア行列の大きさを抑えるため一定件数ずつに分けて計算する.
+        検索結果キャッシュにあるクエリは計算から除く.
 
         Args:
-            query_text: 検索クエリテキスト
-            candidates: 検索対象のBulletリスト
+            queries: 検索クエリリスト
+            playbook: 検索対象のPlaybook
 
         Returns:
-            正規化されたベクトルスコアのリスト
+            queriesと同順の、統合スコア降順のSearchResultリストのリスト
         """
-        query_embedding = np.array(self.embedding_client.embed_query(query_text))
-        doc_embeddings = np.array(
-            self.embedding_client.embed_documents([b.searchable_text for b in candidates])
-        )
+        if not queries or not playbook.bullets:
+            return [[] for _ in queries]
 
-        norms = np.linalg.norm(doc_embeddings, axis=1) * np.linalg.norm(query_embedding)
-        norms = np.where(norms == 0, 1, norms)
-        scores = np.dot(doc_embeddings, query_embedding) / norms
+        with tracing(SearchTrace(queries=len(queries))) as trace:
+            scope = self._cache_scope(playbook)
+            results = [self._cached_results(query, scope) for query in queries]
+            missing = [i for i, result in enumerate(results) if result is None]
+            trace.count("cache_hits", len(queries) - len(missing))
+            for start in range(0, len(missing), _MAX_BATCH_QUERIES):
+                chunk = missing[start : start + _MAX_BATCH_QUERIES]
+                computed = self._search_many_uncached([queries[i] for i in chunk], playbook)
+                for i, result in zip(chunk, computed, strict=True):
+                    results[i] = self._cache_results(queries[i], scope, result)
+        return results
 
-        min_s, max_s = scores.min(), scores.max()
-        if max_s > min_s:  # noqa: SIM108
-            scores = (scores - min_s) / (max_s - min_s)
-        else:
-            scores = np.ones_like(scores) * 0.5
+    def _search_uncached(
+        self,
+        query: SearchQuery,
+        playbook: Playbook,
+        query_embedding: list[float] | None = None,
+    ) -> list[SearchResult]:
+        """キャッシュを参照せずにハイブリッド検索を実行する.
+
+        Args:
+            query: 検索クエリ
+            playbook: 検索対象のPlaybook
+            query_embedding: 取得済みのクエリembedding. Noneの場合はここで取得する.
 
-        return scores.tolist()
+        Returns:
+            統合スコア降順のSearchResultリスト
+        """
+        if query_embedding is None:
+            with stage("embed_query"):
+                query_embedding = self.embedding_client.embed_query(query.query_text)
+        with self._lock:
+            with stage("sync_index"):
+                self._sync_index(playbook)
+            bm25_scores = self._bm25_scores([query])[0]
+            with stage("vector_score"):
+                vector_scores = self._vector_scores(query_embedding, bm25_scores)
+            return self._rank(query, vector_scores, bm25_scores)
 
-    def _bm25_search(self, query_text: str, candidates: list[Bullet]) -> list[float]:
-        """BM25全文検索を実行してスコアを計算する.
+    def _search_many_uncached(self, queries: list[SearchQuery], playbook: Playbook) -> list[list[SearchResult]]:
+        """キャッシュを参照せずに複数クエリのハイブリッド検索を実行する.
 
         Args:
-            query_text: 検索クエリテキスト
-            candidates: 検索対象のBulletリスト
+            queries: 検索クエリリスト
+            playbook: 検索対象のPlaybook
 
         Returns:
-            正規化されたBM25スコアのリスト
+            queriesと同順の、統合スコア降順のSearchResultリストのリスト
         """
-        corpus = [b.searchable_text.split() for b in candidates]
-        bm25 = BM25Okapi(corpus)
-        tokenized_query = query_text.split()
-        scores = bm25.get_scores(tokenized_query)
+        with stage("embed_query"):
+            query_embeddings = self.embedding_client.embed_queries([q.query_text for q in queries])
+        with self._lock:
+            with stage("sync_index"):
+                self._sync_index(playbook)
+            bm25_scores = self._bm25_scores(queries)
+            with stage("vector_score"):
+                if self._uses_ann():
+                    vector_scores = [
+                        self._vector_scores(embedding, bs)
+                        for embedding, bs in zip(query_embeddings, bm25_scores, strict=True)
+                    ]
+                else:
+                    vector_scores = self.vector_index.score(self._reduce(query_embeddings))
+            return [
+                self._rank(query, vs, bs) for query, vs, bs in zip(queries, vector_scores, bm25_scores, strict=True)
+            ]
 
-        min_s, max_s = scores.min(), scores.max()
-        if max_s > min_s:  # noqa: SIM108
-            scores = (scores - min_s) / (max_s - min_s)
-        else:
-            scores = np.ones_like(scores) * 0.5
+    def _cache_scope(self, playbook: Playbook) -> Hashable | None:
+        """インデックスをPlaybookと同期し、検索結果キャッシュのキーに使うインデックスの識別子を返す.
 
-        return scores.tolist()
+        Args:
+            playbook: 検索対象のPlaybook
+
+        Returns:
+            (インスタンスの識別子, インデックスの世代). キャッシュが無効の場合はNone.
+        """
+        if self.result_cache is None:
+            return None
+        with self._lock:
+            with stage("sync_index"):
+                self._sync_index(playbook)
+            return (self._instance_id, self._generation)
+
+    def _cached_results(self, query: SearchQuery, scope: Hashable | None) -> list[SearchResult] | None:
+        """検索結果キャッシュから結果を取得する.
 
-    def _combine_scores(
+        Args:
+            query: 検索クエリ
+            scope: `_cache_scope` が返したインデックスの識別子
+
+        Returns:
+            キャッシュ済みの検索結果. キャッシュが無効または未キャッシュの場合はNone.
+        """
+        if self.result_cache is None:
+            return None
+        return self.result_cache.get(query, scope)
+
+    def _cache_results(
         self,
-        candidates: list[Bullet],
-        vector_scores: list[float],
-        bm25_scores: list[float],
+        query: SearchQuery,
+        scope: Hashable | None,
+        results: list[SearchResult],
     ) -> list[SearchResult]:
-        """ベクトルスコアとBM25スコアを統合する.
+        """検索結果をキャッシュに保存する.
+
+        検索中に他のスレッドがインデックスを変更した場合、結果がscopeの世代のものとは限らないため保存しない.
 
         Args:
-            candidates: Bulletリスト
-            vector_scores: ベクトルスコアリスト
-            bm25_scores: BM25スコアリスト
+            query: 検索クエリ
+            scope: 検索前に `_cache_scope` が返したインデックスの識別子
+            results: 検索結果
 
         Returns:
-            SearchResultのリスト
+            resultsをそのまま返す
         """
-        results = []
-        for bullet, vs, bs in zip(candidates, vector_scores, bm25_scores, strict=True):
-            combined = self.alpha * vs + (1 - self.alpha) * bs
-            results.append(
-                SearchResult(
-                    bullet=bullet,
-                    vector_score=vs,
-                    bm25_score=bs,
-                    combined_score=combined,
-                )
+        if self.result_cache is not None and scope == (self._instance_id, self._generation):
+            self.result_cache.put(query, scope, results)
+        return results
+
+    def upsert_bullets(self, bullets: list[Bullet]) -> None:
+        """Bulletをインデックスに追加または更新する.
+
+        Args:
+            bullets: 追加・更新するBulletリスト
+        """
+        if not bullets:
+            return
+
+        bullet_ids = [b.id for b in bullets]
+        with self._lock:
+            self.vector_index.upsert(bullet_ids, self._embed_bullets(bullets))
+            if self._uses_ann():
+                self.ann_index.add(bullet_ids, self.vector_index.matrix[self.vector_index.rows(bullet_ids)])
+            for bullet in bullets:
+                self.bm25_index.add(bullet.id, tokenize(bullet.searchable_text))
+                self._indexed_texts[bullet.id] = bullet.searchable_text
+            self._bm25_rows = None
+            self._write_attributes(bullets)
+            self._generation += 1
+
+    def remove_bullets(self, bullet_ids: list[str]) -> None:
+        """Bulletをインデックスから削除する.
+
+        インデックスに無いBullet IDは無視し、削除するものが無ければインデックスの世代を進めない.
+
+        Args:
+            bullet_ids: 削除するBullet IDリスト
+        """
+        with self._lock:
+            bullet_ids = [i for i in dict.fromkeys(bullet_ids) if i in self._indexed_texts]
+            if not bullet_ids:
+                return
+
+            self.vector_index.remove(bullet_ids)
+            if self.ann_index is not None:
+                self.ann_index.remove(bullet_ids)
+            for bullet_id in bullet_ids:
+                self.bm25_index.remove(bullet_id)
+                self._indexed_texts.pop(bullet_id, None)
+                self._bullets.pop(bullet_id, None)
+            self._bm25_rows = None
+            self._generation += 1
+
+    def increment_counters(self, bullet_id: str, helpful: int = 0, harmful: int = 0) -> None:
+        """インデックスが保持するBulletのhelpful/harmfulカウンターを加算する.
+
+        Playbook側のカウンター更新と同時に呼び出すことで、次の検索を待たずに
+        min_confidenceによる絞り込みへ反映する. 未登録のBullet IDは無視する.
+
+        Args:
+            bullet_id: Bullet ID
+            helpful: helpfulカウンターの加算値
+            harmful: harmfulカウンターの加算値
+        """
+        with self._lock:
+            row = self.vector_index.id_to_row.get(bullet_id)
+            if row is None or (not helpful and not harmful):
+                return
+
+            helpful_column = self.vector_index.column("helpful")
+            harmful_column = self.vector_index.column("harmful")
+            helpful_column[row] += helpful
+            harmful_column[row] += harmful
+            total = helpful_column[row] + harmful_column[row]
+            self.vector_index.column("confidence")[row] = helpful_column[row] / total if total else 0.5
+            self._generation += 1
+
+    def load_embeddings(self, path: str | Path) -> None:
+        """サイドカーファイルの保存済みembeddingを利用できるようにする.
+
+        同じパスを読み込み済みの場合は何もしない. embeddingモデルや次元削減が異なる場合は利用しない.
+        PCA射影が未学習の場合は、サイドカーファイルと一緒に保存された射影を読み込む.
+
+        Args:
+            path: サイドカーファイルのパス（拡張子なし）
+        """
+        with self._lock:
+            if self.embedding_store is not None and self.embedding_store.path == Path(path):
+                return
+
+            if self.reducer is not None and not self.vector_index.ids:
+                self.reducer.load(self._reduction_path(path))
+            store = EmbeddingStore(path)
+            if store.load() and store.model == self._embedding_model_key:
+                self.embedding_store = store
+            else:
+                self.embedding_store = None
+
+    def save_embeddings(self, path: str | Path, playbook: Playbook, min_stale_ratio: float | None = None) -> bool:
+        """PlaybookのBullet embeddingを量子化してサイドカーファイルに保存する.
+
+        min_stale_ratioを指定した場合、サイドカーファイルに無い・テキストが変わった・削除された
+        Bulletの数がBullet数に対してこの割合以下であれば書き込まない. 書き込まなかった分のembeddingは
+        embeddingクライアントのディスクキャッシュから補われるため、サイドカーファイルの書き直しは
+        変更がある程度溜まったときだけでよい.
+
+        Args:
+            path: サイドカーファイルのパス（拡張子なし）
+            playbook: 保存対象のPlaybook
+            min_stale_ratio: 書き直す古い行の割合の閾値. Noneの場合は常に書き込む.
+
+        Returns:
+            サイドカーファイルを書き込んだ場合True
+        """
+        with self._lock:
+            self.load_embeddings(path)
+            self._sync_index(playbook)
+            bullet_ids = list(self.vector_index.ids)
+            text_hashes = [EmbeddingCache.make_key(self._indexed_texts[i]) for i in bullet_ids]
+            if min_stale_ratio is not None and self.embedding_store is not None:
+                current = sum(self.embedding_store.has(i, h) for i, h in zip(bullet_ids, text_hashes, strict=True))
+                stale = len(bullet_ids) - current + len(self.embedding_store) - current
+                if stale <= min_stale_ratio * len(bullet_ids):
+                    return False
+            if self.reducer is not None:
+                self.reducer.save(self._reduction_path(path))
+            store = EmbeddingStore(path)
+            store.save(
+                self._embedding_model_key,
+                bullet_ids,
+                text_hashes,
+                self.vector_index.matrix,
+                self.embedding_dtype,
             )
+            self.embedding_store = store
+            return True
+
+    @property
+    def _embedding_model_key(self) -> str:
+        """サイドカーファイルの互換性判定に使う、モデル名と次元削減の組を返す."""
+        if self.reducer is None:
+            return self.embedding_client.model_name
+        return f"{self.embedding_client.model_name}/{self.reducer.signature}"
+
+    @staticmethod
+    def _reduction_path(path: str | Path) -> Path:
+        """次元削減の状態ファイルのパスを返す.
+
+        Args:
+            path: サイドカーファイルのパス（拡張子なし）
+
+        Returns:
+            状態ファイルのパス
+        """
+        path = Path(path)
+        return path.with_name(f"{path.name}.reduction.npz")
+
+    def _reduce(self, vectors: np.ndarray | list[float] | list[list[float]]) -> np.ndarray:
+        """embeddingに次元削減を適用する.
+
+        Args:
+            vectors: 元の次元のベクトルまたは行列
+
+        Returns:
+            削減後のベクトルまたは行列. reducerが無い場合はそのままの配列.
+        """
+        if self.reducer is None:
+            return np.asarray(vectors, dtype=np.float32)
+        return self.reducer.transform(vectors)
+
+    def _fit_reducer(self) -> None:
+        """インデックス中の全Bulletの元の次元のembeddingで次元削減を学習し、全行を射影し直す.
+
+        元の次元のembeddingはembeddingクライアントのディスクキャッシュから取得する.
+        読み込み済みのサイドカーファイルは以前の射影で保存されているため利用をやめる.
+        """
+        bullet_ids = list(self.vector_index.ids)
+        with stage("embed_documents"):
+            full = np.asarray(
+                self.embedding_client.embed_documents([self._indexed_texts[i] for i in bullet_ids]),
+                dtype=np.float32,
+            )
+        self.reducer.fit(full)
+        self.embedding_store = None
+        self.vector_index.upsert(bullet_ids, self.reducer.transform(full))
+        if self._uses_ann():
+            self.ann_index.train(bullet_ids, self.vector_index.matrix)
+
+    def _embed_bullets(self, bullets: list[Bullet]) -> np.ndarray:
+        """Bulletのembedding行列を取得する.
+
+        サイドカーファイルに同じテキストのembeddingがあればそれを使い、
+        無いものだけをembeddingクライアントで生成して次元削減を適用する.
+
+        Args:
+            bullets: Bulletリスト
+
+        Returns:
+            bulletsと同順のembedding行列
+        """
+        found = np.empty(0, dtype=np.intp)
+        stored = None
+        if self.embedding_store is not None:
+            found, stored = self.embedding_store.get_many(
+                [b.id for b in bullets],
+                [EmbeddingCache.make_key(b.searchable_text) for b in bullets],
+            )
+        if found.size == len(bullets):
+            return stored
+
+        is_missing = np.ones(len(bullets), dtype=bool)
+        is_missing[found] = False
+        missing = np.flatnonzero(is_missing)
+        with stage("embed_documents"):
+            embedded = self._reduce(
+                self.embedding_client.embed_documents([bullets[i].searchable_text for i in missing])
+            )
+        if not found.size:
+            return embedded
+        vectors = np.empty((len(bullets), embedded.shape[1]), dtype=np.float32)
+        vectors[found] = stored
+        vectors[missing] = embedded
+        return vectors
+
+    def _sync_index(self, playbook: Playbook) -> None:
+        """インデックスをPlaybookのBulletと差分同期する.
+
+        前回同期したものと同じPlaybookオブジェクトで、バージョンとBullet数も変わっていなければ何もしない.
+        それ以外の場合は、searchable_textが変化したBulletのみ再インデックスし、
+        Playbookに存在しないBulletはインデックスから削除し、インデックスが保持していない
+        Bulletオブジェクト（読み込み直したPlaybookのBulletなど）の行だけ属性列を書き直す.
+        同じIDのBulletが複数ある場合は後のものをインデックスに保持する.
+        インデックスの世代は、行の追加・削除・内容の変化があった場合だけ進める.
+        同じBulletオブジェクトのカウンターやセクションをその場で変更した場合は、
+        `increment_counters` / `upsert_bullets` で反映する.
+
+        Args:
+            playbook: 検索対象のPlaybook
+        """
+        token = (playbook.metadata.version, len(playbook.bullets))
+        if playbook is self._synced_playbook and token == self._synced_token:
+            return
+
+        bullets = list({b.id: b for b in playbook.bullets}.values())
+        changed = [b for b in bullets if self._indexed_texts.get(b.id) != b.searchable_text]
+        if changed:
+            self.upsert_bullets(changed)
+        if len(self._indexed_texts) != len(bullets):
+            current_ids = {b.id for b in bullets}
+            self.remove_bullets([i for i in self._indexed_texts if i not in current_ids])
+        replaced = [b for b in bullets if self._bullets.get(b.id) is not b]
+        if replaced:
+            if any(self._bullets[b.id] != b for b in replaced):
+                self._generation += 1
+            self._write_attributes(replaced)
+        if self.reducer is not None and self.reducer.needs_fitting(len(self.vector_index)):
+            self._fit_reducer()
+            self._generation += 1
+        if self.ann_index is not None and self.ann_index.needs_training(len(self.vector_index)):
+            self.ann_index.train(list(self.vector_index.ids), self.vector_index.matrix)
+            self._generation += 1
+        self._synced_playbook = playbook
+        self._synced_token = token
+
+    def _uses_ann(self) -> bool:
+        """近似最近傍インデックスが利用可能かを返す."""
+        return self.ann_index is not None and self.ann_index.is_trained
+
+    def _vector_scores(self, query_embedding: list[float], bm25_scores: np.ndarray) -> np.ndarray:
+        """クエリと各行のコサイン類似度を計算する.
+
+        近似最近傍インデックスが利用可能な場合は、IVFで絞り込んだ行と
+        BM25でヒットした行のみを計算し、それ以外の行はNaNとする.
+
+        Args:
+            query_embedding: クエリのembeddingベクトル
+            bm25_scores: 行順に並んだBM25スコア
+
+        Returns:
+            行順に並んだコサイン類似度
+        """
+        query_vector = l2_normalize(self._reduce(query_embedding))
+        if not self._uses_ann():
+            return self.vector_index.score(query_vector)
+
+        rows = np.union1d(self.vector_index.rows(self.ann_index.probe(query_vector)), np.flatnonzero(bm25_scores))
+        scores = np.full(len(self.vector_index), np.nan, dtype=np.float32)
+        scores[rows] = self.vector_index.matrix[rows] @ query_vector
+        return scores
+
+    def _write_attributes(self, bullets: list[Bullet]) -> None:
+        """Bulletのセクションとカウンターをインデックスの属性列に書き込む.
+
+        Args:
+            bullets: インデックス登録済みのBulletリスト
+        """
+        for bullet in bullets:
+            self._bullets[bullet.id] = bullet
+        rows = self.vector_index.rows([b.id for b in bullets])
+        helpful = np.fromiter((b.helpful for b in bullets), dtype=np.int64, count=len(bullets))
+        harmful = np.fromiter((b.harmful for b in bullets), dtype=np.int64, count=len(bullets))
+        total = helpful + harmful
+        self.vector_index.column("section")[rows] = [self._section_code(b.section) for b in bullets]
+        self.vector_index.column("helpful")[rows] = helpful
+        self.vector_index.column("harmful")[rows] = harmful
+        self.vector_index.column("confidence")[rows] = np.where(total == 0, 0.5, helpful / np.maximum(total, 1))
+
+    def _section_code(self, section: str) -> int:
+        """セクション名を属性列に保持する整数コードに変換する.
+
+        Args:
+            section: セクション名
+
+        Returns:
+            セクションの整数コード. 未登録のセクションには新しいコードを割り当てる.
+        """
+        return self._section_codes.setdefault(section, len(self._section_codes))
+
+    def _candidate_mask(self, query: SearchQuery, trace: SearchTrace | None = None) -> np.ndarray:
+        """セクションと信頼度スコアの条件を満たす行のマスクを返す.
+
+        Args:
+            query: 検索クエリ
+            trace: 条件ごとの候補数を記録するSearchTrace
+
+        Returns:
+            行順に並んだブール配列
+        """
+        mask = self.vector_index.column("confidence") >= query.min_confidence
+        if trace is not None:
+            trace.count("indexed", len(mask))
+            trace.count("after_confidence", np.count_nonzero(mask))
+        if query.section_filter:
+            codes = [self._section_codes[s] for s in query.section_filter if s in self._section_codes]
+            mask &= np.isin(self.vector_index.column("section"), codes)
+            if trace is not None:
+                trace.count("after_section", np.count_nonzero(mask))
+        return mask
+
+    def _rank(
+        self,
+        query: SearchQuery,
+        vector_scores: np.ndarray,
+        bm25_scores: np.ndarray,
+    ) -> list[SearchResult]:
+        """行順のスコアから候補を絞り込み、統合スコア上位のSearchResultを返す.
+
+        Args:
+            query: 検索クエリ
+            vector_scores: インデックスの行順に並んだコサイン類似度
+            bm25_scores: インデックスの行順に並んだBM25スコア
+
+        Returns:
+            統合スコア降順のSearchResultリスト
+        """
+        if query.top_k <= 0:
+            return []
+
+        trace = current_trace()
+        with stage("fusion"):
+            scored = ~np.isnan(vector_scores)
+            rows = np.flatnonzero(self._candidate_mask(query, trace) & scored)
+            if trace is not None:
+                trace.count("vector_scored", np.count_nonzero(scored))
+                trace.count("bm25_hits", np.count_nonzero(bm25_scores))
+                trace.count("candidates", rows.size)
+            if not rows.size:
+                return []
+            normalized_vector = min_max_normalize(vector_scores[rows])
+            normalized_bm25 = min_max_normalize(bm25_scores[rows])
+            combined = self._combine_scores(vector_scores[rows], bm25_scores[rows])
+            top = self._top_k(combined, query.top_k)
+
+        ids = self.vector_index.ids
+        with stage("construct_results"):
+            results = [
+                SearchResult.model_construct(
+                    bullet=self._bullets[ids[rows[i]]],
+                    vector_score=float(normalized_vector[i]),
+                    bm25_score=float(normalized_bm25[i]),
+                    combined_score=float(combined[i]),
+                    raw_vector_score=float(vector_scores[rows[i]]),
+                    raw_bm25_score=float(bm25_scores[rows[i]]),
+                )
+                for i in top
+            ]
+        if trace is not None:
+            trace.count("returned", len(results))
+            if trace.explain:
+                trace.score_breakdowns.extend(
+                    ScoreBreakdown(
+                        bullet_id=ids[rows[i]],
+                        raw_vector_score=float(vector_scores[rows[i]]),
+                        raw_bm25_score=float(bm25_scores[rows[i]]),
+                        vector_score=float(normalized_vector[i]),
+                        bm25_score=float(normalized_bm25[i]),
+                        combined_score=float(combined[i]),
+                    )
+                    for i in top
+                )
         return results
+
+    def _bm25_scores(self, queries: list[SearchQuery]) -> np.ndarray:
+        """クエリごとのBM25スコアをインデックスの行順に計算する.
+
+        Args:
+            queries: 検索クエリリスト
+
+        Returns:
+            (クエリ数, Bullet数) の、インデックスの行順に並んだスコア行列
+        """
+        with stage("bm25_build"):
+            self.bm25_index.build()
+        with stage("bm25_score"):
+            return self._bm25_row_scores(
+                self.bm25_index.score_matrix([tokenize_query(q.query_text) for q in queries]),
+            )
+
+    def _bm25_row_scores(self, doc_scores: np.ndarray) -> np.ndarray:
+        """BM25の重み行列の列順に並んだスコアをインデックスの行順に並べ替える.
+
+        Args:
+            doc_scores: (クエリ数, Bullet数) の、BM25Indexの列順に並んだスコア行列
+
+        Returns:
+            (クエリ数, Bullet数) の、インデックスの行順に並んだスコア行列. クエリ語を含まない行は0.
+        """
+        if self._bm25_rows is None:
+            self._bm25_rows = self.vector_index.rows(self.bm25_index.doc_ids)
+        scores = np.zeros((len(doc_scores), len(self.vector_index)), dtype=np.float32)
+        scores[:, self._bm25_rows] = doc_scores
+        return scores
+
+    def _combine_scores(self, vector_scores: np.ndarray, bm25_scores: np.ndarray) -> np.ndarray:
+        """設定されたスコア融合戦略でベクトルスコアとBM25スコアを統合する.
+
+        Args:
+            vector_scores: 候補のコサイン類似度
+            bm25_scores: 候補のBM25スコア
+
+        Returns:
+            統合スコアの配列
+        """
+        return FUSION_STRATEGIES[self.fusion](vector_scores, bm25_scores, self.alpha, self.rrf_k)
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """スコア上位k件のインデックスを降順で返す.
+
+        argpartitionで上位k件だけを選び、その中だけをソートする.
+        同点の場合は元の順序を保ち、k件目と同点の要素は先頭に近いものから不足分だけを選ぶ.
+
+        Args:
+            scores: スコア配列
+            k: 取得件数
+
+        Returns:
+            スコア降順に並んだインデックス配列
+        """
+        if k < len(scores):
+            partitioned = np.argpartition(-scores, k - 1)[:k]
+            threshold = scores[partitioned].min()
+            # 閾値より高い要素は必ず選ばれる. 閾値と同点の要素は位置の小さい順に不足分だけ補う
+            above = partitioned[scores[partitioned] > threshold]
+            ties = np.flatnonzero(scores == threshold)[: k - len(above)]
+            selected = np.concatenate([above, ties])
+        else:
+            selected = np.arange(len(scores))
+        order = np.lexsort((selected, -scores[selected]))
+        return selected[order][:k]
@@ -0,0 +1,156 @@
+"""複数データセットのPlaybookをシャードとして並列に検索するシャード検索."""
+
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.components.hybrid_search.fusion import FUSION_STRATEGIES, min_max_normalize
+from src.components.hybrid_search.models import SearchQuery, SearchResult, ShardSearchResult
+from src.components.hybrid_search.search import HybridSearch
+from src.components.playbook_store.store import PlaybookStore
+
+
+class ShardedSearch:
+    """データセットごとのHybridSearchをシャードとして並列に検索し、上位k件を統合するクラス.
+
+    シャードはデータセットごとに独立したインデックスを持つため、Bulletを1つのPlaybookに
+    結合せずに複数データセットの知識を横断して検索できる. 各シャードの統合スコアは
+    シャード内で正規化されておりシャード間で比較できないため、各シャードの上位k件を集めた候補の
+    正規化前のスコアをシャードと同じ融合戦略で統合し直して全体の上位k件を求める.
+    GeneratorAgentとCuratorAgentも `shard` で単一データセットの検索と更新に同じシャードを使うため、
+    あるデータセットへの更新が別のデータセットのインデックスに混ざることはない.
+
+    Note:
+        - BM25スコアはシャードごとの文書頻度で計算されるため、シャード間の比較は近似となる.
+        - 各シャードのHybridSearchはインデックスの同期とスコア計算を自身のロックで直列化するため、
+          同じシャードを複数のスレッドから同時に検索できる.
+    """
+
+    def __init__(
+        self,
+        search_factory: Callable[[], HybridSearch],
+        playbook_store: PlaybookStore,
+        max_workers: int = 4,
+    ) -> None:
+        """ShardedSearchを初期化する.
+
+        Args:
+            search_factory: シャードごとのHybridSearchを生成する関数
+            playbook_store: Playbook永続化ストア
+            max_workers: 同時に検索するシャード数
+        """
+        self.search_factory = search_factory
+        self.playbook_store = playbook_store
+        self.max_workers = max_workers
+        self._shards: dict[str, HybridSearch] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search-shard")
+
+    def shard(self, dataset: str) -> HybridSearch:
+        """データセットのシャードを返す. 未作成の場合は作成して保存済みembeddingを読み込む.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            シャードのHybridSearch
+        """
+        with self._lock:
+            if dataset not in self._shards:
+                search = self.search_factory()
+                search.load_embeddings(self.playbook_store.embeddings_path(dataset))
+                self._shards[dataset] = search
+            return self._shards[dataset]
+
+    def search(self, query: SearchQuery, datasets: list[str]) -> list[ShardSearchResult]:
+        """複数データセットのPlaybookを並列に検索する.
+
+        Args:
+            query: 検索クエリ
+            datasets: 検索対象のデータセット名リスト
+
+        Returns:
+            統合スコア降順の、全シャードを通した上位top_k件の検索結果
+        """
+        return self.search_many([query], datasets)[0]
+
+    def search_many(self, queries: list[SearchQuery], datasets: list[str]) -> list[list[ShardSearchResult]]:
+        """複数クエリで複数データセットのPlaybookを並列に検索する.
+
+        シャードごとに1タスクとしてPlaybookの読み込みと `HybridSearch.search_many` を実行する.
+
+        Args:
+            queries: 検索クエリリスト
+            datasets: 検索対象のデータセット名リスト
+
+        Returns:
+            queriesと同順の、統合スコア降順の上位top_k件の検索結果リストのリスト
+        """
+        datasets = list(dict.fromkeys(datasets))
+        if not queries or not datasets:
+            return [[] for _ in queries]
+
+        futures = [self._executor.submit(self._search_shard, dataset, queries) for dataset in datasets]
+        shard_results = [future.result() for future in futures]
+        return [
+            self._merge(
+                query, [(dataset, results[i]) for dataset, results in zip(datasets, shard_results, strict=True)]
+            )
+            for i, query in enumerate(queries)
+        ]
+
+    def close(self) -> None:
+        """スレッドプールを停止する."""
+        self._executor.shutdown(wait=True)
+
+    def _search_shard(self, dataset: str, queries: list[SearchQuery]) -> list[list[SearchResult]]:
+        """1つのシャードでPlaybookを読み込み、全クエリを検索する.
+
+        Args:
+            dataset: データセット名
+            queries: 検索クエリリスト
+
+        Returns:
+            queriesと同順の、シャード内の統合スコア降順の検索結果リストのリスト
+        """
+        playbook = self.playbook_store.load(dataset)
+        return self.shard(dataset).search_many(queries, playbook)
+
+    def _merge(
+        self, query: SearchQuery, shard_results: list[tuple[str, list[SearchResult]]]
+    ) -> list[ShardSearchResult]:
+        """シャードごとの上位k件を集め、正規化前のスコアで統合し直して全体の上位k件を返す.
+
+        同点の場合はdatasetsで先に指定したシャードの、シャード内で上位の結果を優先する.
+
+        Args:
+            query: 検索クエリ
+            shard_results: (データセット名, 統合スコア降順の検索結果) のリスト
+
+        Returns:
+            統合スコア降順の上位top_k件の検索結果. スコアは全シャードの候補の中で正規化し直した値.
+        """
+        candidates = [(dataset, result) for dataset, results in shard_results for result in results]
+        if not candidates or query.top_k <= 0:
+            return []
+
+        search = self.shard(shard_results[0][0])
+        raw_vector = np.array([result.raw_vector_score for _, result in candidates], dtype=np.float64)
+        raw_bm25 = np.array([result.raw_bm25_score for _, result in candidates], dtype=np.float64)
+        combined = FUSION_STRATEGIES[search.fusion](raw_vector, raw_bm25, search.alpha, search.rrf_k)
+        normalized_vector = min_max_normalize(raw_vector)
+        normalized_bm25 = min_max_normalize(raw_bm25)
+        return [
+            ShardSearchResult.model_construct(
+                dataset=candidates[i][0],
+                bullet=candidates[i][1].bullet,
+                vector_score=float(normalized_vector[i]),
+                bm25_score=float(normalized_bm25[i]),
+                combined_score=float(combined[i]),
+                raw_vector_score=float(raw_vector[i]),
+                raw_bm25_score=float(raw_bm25[i]),
+            )
+            for i in np.argsort(-combined, kind="stable")[: query.top_k]
+        ]
@@ -0,0 +1,73 @@
+"""BM25用の依存ライブラリ不要な日本語対応トークナイザ."""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+_TOKEN_PATTERN = re.compile(
+    r"(?P<latin>[a-z0-9\u00c0-\u024f]+)"
+    r"|(?P<kanji>[㐀-䶿一-鿿豈-﫿々〆ヶ]+)"
+    r"|(?P<hiragana>[ぁ-ゟ]+)"
+    r"|(?P<katakana>[゠-ヿ]+)"
+    r"|(?P<other>[^\W\d_]+)"
+)
+
+_NGRAM_SIZES = {
+    "kanji": 2,
+    "hiragana": 2,
+    "katakana": 3,
+}
+
+
+def _ngrams(run: str, n: int) -> list[str]:
+    """文字列を文字n-gramに分割する.
+
+    Args:
+        run: 同一文字種の連続した文字列
+        n: n-gramの長さ
+
+    Returns:
+        n-gramのリスト. runがnより短い場合はrun自体のみ.
+    """
+    if len(run) <= n:
+        return [run]
+    return [run[i : i + n] for i in range(len(run) - n + 1)]
+
+
+def tokenize(text: str) -> list[str]:
+    """テキストをBM25用のトークン列に分割する.
+
+    NFKC正規化と小文字化の後、文字種ごとの連続部分に分割する.
+    英数字はそのまま単語とし、漢字・ひらがなは文字bigram、
+    カタカナは文字trigramに分割する.
+
+    Args:
+        text: 入力テキスト
+
+    Returns:
+        トークンのリスト
+    """
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    tokens: list[str] = []
+    for match in _TOKEN_PATTERN.finditer(normalized):
+        script = match.lastgroup
+        run = match.group()
+        n = _NGRAM_SIZES.get(script)
+        if n is None:
+            tokens.append(run)
+        else:
+            tokens.extend(_ngrams(run, n))
+    return tokens
+
+
+@lru_cache(maxsize=4096)
+def tokenize_query(text: str) -> tuple[str, ...]:
+    """クエリテキストをトークン化する. 同一クエリの結果はメモ化する.
+
+    Args:
+        text: クエリテキスト
+
+    Returns:
+        トークンのタプル
+    """
+    return tuple(tokenize(text))
@@ -0,0 +1,177 @@
+"""L2正規化済みembeddingを保持するベクトルインデックス."""
+
+import numpy as np
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    """ベクトル（または行列の各行）をL2正規化する.
+
+    Args:
+        vectors: 1次元ベクトルまたは2次元行列
+
+    Returns:
+        float32に変換して正規化した配列. ノルムが0の行はそのまま返す.
+    """
+    array = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(array, axis=-1, keepdims=True)
+    return array / np.where(norms == 0, 1, norms)
+
+
+class VectorIndex:
+    """Bullet IDと行を対応付けた連続float32行列を保持するインデックスクラス.
+
+    各行は追加時にL2正規化されるため、コサイン類似度は行列とクエリベクトルの
+    内積1回で計算できる. 行の追加は容量を倍々に確保した配列への書き込み、
+    更新は該当行の上書き、削除は末尾行との入れ替えで行う.
+    columnsを指定すると、行に揃った属性値の1次元配列も同じ規則で保持する.
+    """
+
+    def __init__(
+        self,
+        initial_capacity: int = 64,
+        columns: dict[str, type[np.generic]] | None = None,
+    ) -> None:
+        """VectorIndexを初期化する.
+
+        Args:
+            initial_capacity: 最初に確保する行数
+            columns: 行に揃えて保持する属性列の名前と型
+        """
+        self.initial_capacity = initial_capacity
+        self.ids: list[str] = []
+        self.id_to_row: dict[str, int] = {}
+        self._buffer: np.ndarray | None = None
+        self._column_types = columns or {}
+        self._columns: dict[str, np.ndarray] = {
+            name: np.zeros(0, dtype=dtype) for name, dtype in self._column_types.items()
+        }
+
+    def __len__(self) -> int:
+        """登録済みベクトル数を返す."""
+        return len(self.ids)
+
+    def __contains__(self, bullet_id: object) -> bool:
+        """Bulletが登録済みかを返す."""
+        return bullet_id in self.id_to_row
+
+    @property
+    def dim(self) -> int | None:
+        """ベクトルの次元数を返す. 未登録の場合はNone."""
+        return None if self._buffer is None else self._buffer.shape[1]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """登録済みの行だけを切り出した正規化済み行列を返す."""
+        if self._buffer is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._buffer[: len(self.ids)]
+
+    def column(self, name: str) -> np.ndarray:
+        """登録済みの行だけを切り出した属性列を返す.
+
+        返り値はビューのため、書き込むとインデックスの値が更新される.
+
+        Args:
+            name: 属性列の名前
+
+        Returns:
+            行順に並んだ属性値の配列
+        """
+        return self._columns[name][: len(self.ids)]
+
+    def upsert(self, bullet_ids: list[str], vectors: np.ndarray | list[list[float]]) -> None:
+        """ベクトルを追加する. 既存のBullet IDの場合は行を上書きする.
+
+        Args:
+            bullet_ids: Bullet IDリスト
+            vectors: bullet_idsと同順のembedding行列
+
+        Raises:
+            ValueError: 既存の行列と次元数が異なる場合
+        """
+        if not bullet_ids:
+            return
+
+        normalized = l2_normalize(vectors)
+        if self.dim is not None and normalized.shape[1] != self.dim:
+            msg = f"Embedding dimension mismatch: index={self.dim}, given={normalized.shape[1]}"
+            raise ValueError(msg)
+
+        new_count = sum(1 for i in dict.fromkeys(bullet_ids) if i not in self.id_to_row)
+        self._reserve(len(self.ids) + new_count, normalized.shape[1])
+
+        for bullet_id, vector in zip(bullet_ids, normalized, strict=True):
+            row = self.id_to_row.get(bullet_id)
+            if row is None:
+                row = len(self.ids)
+                self.ids.append(bullet_id)
+                self.id_to_row[bullet_id] = row
+            self._buffer[row] = vector
+
+    def remove(self, bullet_ids: list[str]) -> None:
+        """ベクトルを削除する. 存在しないBullet IDは無視する.
+
+        Args:
+            bullet_ids: 削除するBullet IDリスト
+        """
+        for bullet_id in bullet_ids:
+            row = self.id_to_row.pop(bullet_id, None)
+            if row is None:
+                continue
+            last = len(self.ids) - 1
+            last_id = self.ids.pop()
+            if row != last:
+                self._buffer[row] = self._buffer[last]
+                for values in self._columns.values():
+                    values[row] = values[last]
+                self.ids[row] = last_id
+                self.id_to_row[last_id] = row
+
+    def rows(self, bullet_ids: list[str]) -> np.ndarray:
+        """Bullet IDリストに対応する行番号配列を返す.
+
+        Args:
+            bullet_ids: Bullet IDリスト
+
+        Returns:
+            行番号のint配列
+        """
+        return np.fromiter((self.id_to_row[i] for i in bullet_ids), dtype=np.intp, count=len(bullet_ids))
+
+    def score(self, query_vectors: np.ndarray | list[float] | list[list[float]]) -> np.ndarray:
+        """全行とクエリベクトルのコサイン類似度を計算する.
+
+        Args:
+            query_vectors: クエリのembeddingベクトル、または複数クエリの行列
+
+        Returns:
+            行順に並んだコサイン類似度の配列. 行列を渡した場合は（クエリ数, 行数）の行列.
+        """
+        return l2_normalize(query_vectors) @ self.matrix.T
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        """指定行数を格納できるようにバッファを確保する.
+
+        Args:
+            rows: 必要な行数
+            dim: ベクトルの次元数
+        """
+        if self._buffer is None:
+            capacity = max(rows, self.initial_capacity)
+            self._buffer = np.zeros((capacity, dim), dtype=np.float32)
+            self._columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self._column_types.items()}
+            return
+        if rows <= self._buffer.shape[0]:
+            return
+
+        capacity = self._buffer.shape[0]
+        while capacity < rows:
+            capacity *= 2
+        size = len(self.ids)
+        buffer = np.zeros((capacity, dim), dtype=np.float32)
+        buffer[:size] = self._buffer[:size]
+        self._buffer = buffer
+        for name, values in self._columns.items():
+            grown = np.zeros(capacity, dtype=values.dtype)
+            grown[:size] = values[:size]
+            self._columns[name] = grown
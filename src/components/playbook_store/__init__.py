@@ -1,17 +1,30 @@
 """Playbook store component for JSON persistence."""
 
+from src.components.playbook_store.cached_store import CachedPlaybookStore
+from src.components.playbook_store.columnar import BulletColumns
+from src.components.playbook_store.dedup import NearDuplicateIndex
+from src.components.playbook_store.log_store import LoggedPlaybookStore
 from src.components.playbook_store.models import (
     Bullet,
     DeltaContextItem,
     Playbook,
+    PlaybookLogRecord,
     PlaybookMetadata,
 )
-from src.components.playbook_store.store import PlaybookStore
+from src.components.playbook_store.sqlite_store import SQLitePlaybookStore
+from src.components.playbook_store.store import PlaybookStore, PlaybookVersionConflictError
 
 __all__ = [
     "Bullet",
+    "BulletColumns",
+    "CachedPlaybookStore",
     "DeltaContextItem",
+    "LoggedPlaybookStore",
+    "NearDuplicateIndex",
     "Playbook",
+    "PlaybookLogRecord",
     "PlaybookMetadata",
     "PlaybookStore",
+    "PlaybookVersionConflictError",
+    "SQLitePlaybookStore",
 ]
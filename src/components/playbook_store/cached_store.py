@@ -0,0 +1,128 @@
+"""読み込んだPlaybookをメモリに保持するキャッシュ付きストア."""
+
+import threading
+from pathlib import Path
+
+from src.components.playbook_store.models import Playbook
+from src.components.playbook_store.store import PlaybookFileFormat, PlaybookStore
+
+Fingerprint = tuple[int, int, int | None]
+
+
+class CachedPlaybookStore(PlaybookStore):
+    """パース・検証済みのPlaybookをデータセットごとにメモリに保持するストアクラス.
+
+    `load` はファイルのmtime・サイズと、ファイル先頭に埋め込まれたバージョンが
+    前回の読み込み時と同じであればキャッシュしたPlaybookを返し、いずれかが
+    変化した場合（他プロセスによる更新など）のみファイルを読み直す.
+    `save` は保存したPlaybookでキャッシュを置き換える.
+
+    Note:
+        - `load` が返すPlaybookはキャッシュと同じオブジェクトのため、変更した場合は
+          `save` するか、変更を破棄するために `invalidate` を呼ぶ.
+    """
+
+    def __init__(self, data_dir: str = "data/playbooks", file_format: PlaybookFileFormat = "json") -> None:
+        """CachedPlaybookStoreを初期化する.
+
+        Args:
+            data_dir: Playbookファイルの保存ディレクトリ
+            file_format: Playbookファイルの形式
+        """
+        super().__init__(data_dir, file_format)
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self._entries: dict[str, tuple[Fingerprint, Playbook]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, dataset: str) -> Playbook:
+        """指定データセットのPlaybookを読み込む. ファイルが変化していなければキャッシュを返す.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            Playbookオブジェクト. ファイルが存在しない場合は空のPlaybook（キャッシュしない）.
+        """
+        path = self.playbook_path(dataset)
+        fingerprint = self._fingerprint(path)
+        with self._lock:
+            entry = self._entries.get(dataset)
+            if fingerprint is not None and entry is not None and entry[0] == fingerprint:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            if entry is not None:
+                self.reloads += 1
+                del self._entries[dataset]
+
+        playbook = super().load(dataset)
+        if fingerprint is not None:
+            with self._lock:
+                self._entries[dataset] = (fingerprint, playbook)
+        return playbook
+
+    def save(self, dataset: str, playbook: Playbook) -> None:
+        """Playbookをファイルに保存し、キャッシュを保存したPlaybookで置き換える.
+
+        Args:
+            dataset: データセット名
+            playbook: 保存するPlaybook
+
+        Raises:
+            PlaybookVersionConflictError: 読み込み後に他の書き込みでバージョンが進んでいた場合
+        """
+        with self._lock:
+            self._entries.pop(dataset, None)
+        super().save(dataset, playbook)
+
+    def invalidate(self, dataset: str | None = None) -> None:
+        """キャッシュを破棄する.
+
+        Args:
+            dataset: 破棄するデータセット名. Noneの場合は全データセット.
+        """
+        with self._lock:
+            if dataset is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(dataset, None)
+
+    def stats(self) -> dict[str, int]:
+        """ヒット数・ミス数・ファイル変化による読み直し数・保持データセット数を返す.
+
+        Returns:
+            hits / misses / reloads / size をキーとするdict
+        """
+        return {"hits": self.hits, "misses": self.misses, "reloads": self.reloads, "size": len(self._entries)}
+
+    def _write(self, dataset: str, playbook: Playbook) -> None:
+        """Playbookをファイルに書き込み、書き込んだファイルの状態でキャッシュする.
+
+        書き込みと同じロックの下でファイルの状態を取得するため、直後の他の書き込みと取り違えない.
+
+        Args:
+            dataset: データセット名
+            playbook: 書き込むPlaybook
+        """
+        super()._write(dataset, playbook)
+        fingerprint = self._fingerprint(self.playbook_path(dataset))
+        if fingerprint is not None:
+            with self._lock:
+                self._entries[dataset] = (fingerprint, playbook)
+
+    def _fingerprint(self, path: Path) -> Fingerprint | None:
+        """ファイルの変化を検出するためのmtime・サイズ・埋め込みバージョンを返す.
+
+        Args:
+            path: Playbookファイルのパス
+
+        Returns:
+            (mtime_ns, サイズ, バージョン). ファイルが存在しない場合はNone.
+        """
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, self._peek_version(path))
@@ -0,0 +1,132 @@
+"""PlaybookのArrow IPC形式での列指向シリアライズ."""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pyarrow as pa
+from pydantic import TypeAdapter
+
+from src.components.playbook_store.models import Bullet, PlaybookMetadata
+
+_METADATA_KEY = b"playbook_metadata"
+
+_BULLET_LIST = TypeAdapter(list[Bullet])
+
+BULLET_SCHEMA = pa.schema(
+    [
+        pa.field("id", pa.string(), nullable=False),
+        pa.field("section", pa.string(), nullable=False),
+        pa.field("content", pa.string(), nullable=False),
+        pa.field("searchable_text", pa.string(), nullable=False),
+        pa.field("keywords", pa.list_(pa.string()), nullable=False),
+        pa.field("helpful", pa.int64(), nullable=False),
+        pa.field("harmful", pa.int64(), nullable=False),
+        pa.field("source_trajectory", pa.string(), nullable=False),
+    ]
+)
+
+
+class BulletColumns:
+    """Bulletのフィールドを列ごとに保持するArrowテーブルのラッパークラス.
+
+    ファイルから読み込んだ列をそのまま保持し、Bulletオブジェクトへの変換は
+    要素へのアクセス時または `to_bullets` の呼び出し時にのみ行う.
+    IDや検索用テキストだけが必要な処理は `column` で列を直接取り出せる.
+    """
+
+    def __init__(self, table: pa.Table) -> None:
+        """BulletColumnsを初期化する.
+
+        Args:
+            table: `BULLET_SCHEMA` に従うArrowテーブル
+        """
+        self.table = table
+
+    @classmethod
+    def from_bullets(cls, bullets: list[Bullet]) -> "BulletColumns":
+        """BulletリストからBulletColumnsを作成する.
+
+        Args:
+            bullets: Bulletリスト
+
+        Returns:
+            BulletColumns
+        """
+        columns = {name: [getattr(bullet, name) for bullet in bullets] for name in BULLET_SCHEMA.names}
+        return cls(pa.Table.from_pydict(columns, schema=BULLET_SCHEMA))
+
+    def __len__(self) -> int:
+        """Bullet数を返す."""
+        return self.table.num_rows
+
+    def __getitem__(self, index: int) -> Bullet:
+        """指定位置のBulletを返す.
+
+        Args:
+            index: Bulletの位置
+
+        Returns:
+            Bullet
+
+        Raises:
+            IndexError: 位置が範囲外の場合
+        """
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+        return Bullet.model_validate(self.table.slice(index % len(self), 1).to_pylist()[0])
+
+    def __iter__(self) -> Iterator[Bullet]:
+        """Bulletを順に返す."""
+        return iter(self.to_bullets())
+
+    def column(self, name: str) -> list:
+        """1つのフィールドの値をPythonのリストとして返す.
+
+        Args:
+            name: フィールド名（例: "id", "searchable_text"）
+
+        Returns:
+            Bulletの順に並んだフィールド値のリスト
+        """
+        return self.table.column(name).to_pylist()
+
+    def to_bullets(self) -> list[Bullet]:
+        """全BulletをBulletオブジェクトに変換する.
+
+        Bulletごとに `model_construct` を呼ぶよりも、行のリストをまとめて検証する方が速い.
+
+        Returns:
+            Bulletリスト
+        """
+        return _BULLET_LIST.validate_python(self.table.to_pylist())
+
+
+def write_arrow(path: Path, metadata: PlaybookMetadata, columns: BulletColumns) -> None:
+    """PlaybookをArrow IPCファイルに書き込む.
+
+    メタデータはJSON文字列としてスキーマのメタデータに埋め込むため、ファイル先頭に配置される.
+
+    Args:
+        path: 書き込み先のパス
+        metadata: Playbookのメタデータ
+        columns: Bulletの列
+    """
+    schema = BULLET_SCHEMA.with_metadata({_METADATA_KEY: metadata.model_dump_json().encode()})
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        writer.write_table(columns.table.replace_schema_metadata(schema.metadata))
+
+
+def read_arrow(path: Path) -> tuple[PlaybookMetadata, BulletColumns]:
+    """Arrow IPCファイルからPlaybookを読み込む.
+
+    ファイル全体をメモリに読み込んでから開くため、読み込み後にファイルが書き換えられても影響を受けない.
+
+    Args:
+        path: 読み込むファイルのパス
+
+    Returns:
+        (Playbookのメタデータ, Bulletの列)
+    """
+    table = pa.ipc.open_file(pa.py_buffer(path.read_bytes())).read_all()
+    metadata = PlaybookMetadata.model_validate_json(table.schema.metadata[_METADATA_KEY])
+    return metadata, BulletColumns(table.replace_schema_metadata(None))
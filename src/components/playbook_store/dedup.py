@@ -0,0 +1,262 @@
+"""MinHashとLSHによるBullet本文の近似重複インデックス."""
+
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+
+from src.components.playbook_store.models import Bullet
+
+_WHITESPACE = re.compile(r"\s+")
+_MERSENNE_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint64(2**32)
+
+
+def shingles(text: str, size: int = 3) -> set[str]:
+    """テキストを文字n-gramの集合に分割する.
+
+    NFKC正規化・小文字化・空白の圧縮を行った後の文字n-gramを用いるため、
+    分かち書きのない日本語にもそのまま適用できる.
+
+    Args:
+        text: テキスト
+        size: n-gramの長さ
+
+    Returns:
+        文字n-gramの集合. テキストがsizeより短い場合はテキスト自体のみ.
+    """
+    normalized = _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text).lower()).strip()
+    if len(normalized) <= size:
+        return {normalized} if normalized else set()
+    return {normalized[i : i + size] for i in range(len(normalized) - size + 1)}
+
+
+class NearDuplicateIndex:
+    """Bullet本文のMinHash署名をLSHバケットに登録する近似重複インデックスクラス.
+
+    署名をbands個の帯に分け、いずれかの帯が一致するBulletだけを候補として
+    署名の一致率（Jaccard係数の推定値）を計算するため、1件の重複判定は
+    Bullet数によらずほぼ定数時間で済む.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, threshold: float = 0.8, shingle_size: int = 3) -> None:
+        """NearDuplicateIndexを初期化する.
+
+        Args:
+            num_perm: MinHash署名の長さ（ハッシュ関数の数）
+            bands: LSHの帯の数. num_permを割り切れる必要がある.
+            threshold: 重複とみなすJaccard係数の推定値の下限
+            shingle_size: 文字n-gramの長さ
+
+        Raises:
+            ValueError: num_permがbandsで割り切れない場合
+        """
+        if num_perm % bands:
+            msg = f"num_perm ({num_perm}) must be divisible by bands ({bands})"
+            raise ValueError(msg)
+
+        rng = np.random.default_rng(0)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._signatures: dict[str, np.ndarray] = {}
+        self._texts: dict[str, str] = {}
+        self._buckets: list[dict[bytes, set[str]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        """登録済みBullet数を返す."""
+        return len(self._signatures)
+
+    def __contains__(self, bullet_id: object) -> bool:
+        """Bulletが登録済みかを返す."""
+        return bullet_id in self._signatures
+
+    def signature(self, text: str) -> np.ndarray:
+        """テキストのMinHash署名を計算する.
+
+        Args:
+            text: テキスト
+
+        Returns:
+            長さnum_permのuint64配列. n-gramがない場合は全要素が最大値.
+        """
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles(text, self.shingle_size)),
+            dtype=np.uint64,
+        )
+        if not hashes.size:
+            return np.full(self.num_perm, _MERSENNE_PRIME, dtype=np.uint64)
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+    def add(self, bullet_id: str, text: str) -> None:
+        """Bulletを登録する. 既に存在する場合は置き換える.
+
+        Args:
+            bullet_id: Bullet ID
+            text: Bullet本文
+        """
+        self.remove(bullet_id)
+        signature = self.signature(text)
+        self._signatures[bullet_id] = signature
+        self._texts[bullet_id] = text
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, set()).add(bullet_id)
+
+    def remove(self, bullet_id: str) -> None:
+        """Bulletを削除する. 存在しない場合は何もしない.
+
+        Args:
+            bullet_id: Bullet ID
+        """
+        signature = self._signatures.pop(bullet_id, None)
+        if signature is None:
+            return
+
+        del self._texts[bullet_id]
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band][key]
+            bucket.discard(bullet_id)
+            if not bucket:
+                del self._buckets[band][key]
+
+    def sync(self, bullets: list[Bullet]) -> None:
+        """インデックスをPlaybookのBulletと差分同期する.
+
+        本文が変化したBulletのみ署名を計算し直し、存在しないBulletは削除する.
+
+        Args:
+            bullets: PlaybookのBulletリスト
+        """
+        for bullet in bullets:
+            if self._texts.get(bullet.id) != bullet.content:
+                self.add(bullet.id, bullet.content)
+        if len(self._texts) != len(bullets):
+            current_ids = {b.id for b in bullets}
+            for bullet_id in [i for i in self._texts if i not in current_ids]:
+                self.remove(bullet_id)
+
+    def query(self, text: str, threshold: float | None = None) -> list[tuple[str, float]]:
+        """テキストに近似重複する登録済みBulletを探す.
+
+        Args:
+            text: テキスト
+            threshold: 重複とみなす類似度の下限. Noneの場合は初期化時の値.
+
+        Returns:
+            (Bullet ID, 推定Jaccard係数) のリスト. 類似度の降順.
+        """
+        signature = self.signature(text)
+        candidates: set[str] = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+        return self._verify(signature, candidates, threshold)
+
+    def find_duplicate(self, text: str) -> str | None:
+        """テキストに最も近い近似重複のBullet IDを返す.
+
+        Args:
+            text: テキスト
+
+        Returns:
+            Bullet ID. 近似重複がない場合はNone.
+        """
+        matches = self.query(text)
+        return matches[0][0] if matches else None
+
+    def duplicate_clusters(self, threshold: float | None = None) -> list[list[str]]:
+        """登録済みBulletを近似重複のクラスタにまとめる.
+
+        同じLSHバケットに入ったBulletの組だけを検証し、類似度が閾値以上の組を
+        Union-Findで連結する.
+
+        Args:
+            threshold: 重複とみなす類似度の下限. Noneの場合は初期化時の値.
+
+        Returns:
+            2件以上のBulletを含むクラスタのリスト. 各クラスタは登録順のBullet IDリスト.
+        """
+        order = {bullet_id: i for i, bullet_id in enumerate(self._signatures)}
+        parent = {bullet_id: bullet_id for bullet_id in self._signatures}
+
+        def find(bullet_id: str) -> str:
+            while parent[bullet_id] != bullet_id:
+                parent[bullet_id] = parent[parent[bullet_id]]
+                bullet_id = parent[bullet_id]
+            return bullet_id
+
+        checked: set[tuple[str, str]] = set()
+        for buckets in self._buckets:
+            for members in buckets.values():
+                if len(members) < 2:  # noqa: PLR2004
+                    continue
+                ordered = sorted(members, key=order.__getitem__)
+                for i, first in enumerate(ordered):
+                    others = [o for o in ordered[i + 1 :] if (first, o) not in checked and find(first) != find(o)]
+                    checked.update((first, o) for o in others)
+                    for other, _ in self._verify(self._signatures[first], others, threshold):
+                        parent[find(other)] = find(first)
+
+        clusters: dict[str, list[str]] = {}
+        for bullet_id in self._signatures:
+            clusters.setdefault(find(bullet_id), []).append(bullet_id)
+        return [members for members in clusters.values() if len(members) > 1]
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        """署名を帯ごとのバケットキーに分割する.
+
+        Args:
+            signature: MinHash署名
+
+        Returns:
+            帯ごとのバケットキーのリスト
+        """
+        return [band.tobytes() for band in np.split(signature, self.bands)]
+
+    def _verify(
+        self,
+        signature: np.ndarray,
+        candidates: set[str] | list[str],
+        threshold: float | None,
+    ) -> list[tuple[str, float]]:
+        """候補の署名一致率を計算し、閾値以上のものを返す.
+
+        Args:
+            signature: 比較元のMinHash署名
+            candidates: 候補のBullet ID
+            threshold: 類似度の下限. Noneの場合は初期化時の値.
+
+        Returns:
+            (Bullet ID, 推定Jaccard係数) のリスト. 類似度の降順.
+        """
+        if not candidates:
+            return []
+
+        threshold = self.threshold if threshold is None else threshold
+        candidate_ids = list(candidates)
+        similarities = (np.vstack([self._signatures[i] for i in candidate_ids]) == signature).mean(axis=1)
+        matches = [(i, float(s)) for i, s in zip(candidate_ids, similarities.tolist(), strict=True) if s >= threshold]
+        return sorted(matches, key=lambda match: -match[1])
+
+
+def create_duplicate_index(
+    threshold: float | None,
+    num_perm: int = 128,
+    bands: int = 16,
+) -> NearDuplicateIndex | None:
+    """閾値が指定されている場合だけ近似重複インデックスを生成する.
+
+    Args:
+        threshold: 重複とみなすJaccard係数の推定値の下限. Noneの場合は近似重複を判定しない.
+        num_perm: MinHash署名の長さ（ハッシュ関数の数）
+        bands: LSHの帯の数
+
+    Returns:
+        NearDuplicateIndex. thresholdがNoneの場合はNone.
+    """
+    if threshold is None:
+        return None
+    return NearDuplicateIndex(num_perm=num_perm, bands=bands, threshold=threshold)
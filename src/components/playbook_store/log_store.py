@@ -0,0 +1,316 @@
+"""スナップショットと追記ログでPlaybookを永続化するストア."""
+
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from src.components.playbook_store.models import Playbook, PlaybookLogRecord
+from src.components.playbook_store.store import JST, PlaybookFileFormat, PlaybookStore
+
+logger = logging.getLogger(__name__)
+
+BulletState = tuple[str, str, str, tuple[str, ...], str, int, int]
+
+_COMMIT_PREFIX = b'{"type":"COMMIT"'
+
+
+class LoggedPlaybookStore(PlaybookStore):
+    """PlaybookをJSONスナップショットと追記専用の変更ログで永続化するストアクラス.
+
+    `save` は前回の読み込み・保存時からの差分（Bulletの追加・更新・削除と
+    helpful/harmfulカウンターの加算）だけを `<dataset>.log.jsonl` に追記するため、
+    1回の保存のI/OはPlaybook全体ではなく変更量に比例する.
+    ログがcompact_thresholdレコードに達するとスナップショット（`playbook_path`）に
+    畳み込んでログを空にする. `load` はスナップショットにログを再生して復元する.
+
+    Note:
+        - 1回の保存のレコードはCOMMITレコードで締めくくり、COMMITのない末尾
+          （書き込み途中で中断した保存）は再生せず、次の保存の前に切り詰める.
+        - スナップショットのバージョン以下のCOMMITは畳み込み済みとして再生しない.
+        - 保存時のバージョン確認には、スナップショットとログの最後のCOMMITのバージョンを用いる.
+    """
+
+    def __init__(
+        self,
+        data_dir: str = "data/playbooks",
+        compact_threshold: int = 1000,
+        file_format: PlaybookFileFormat = "json",
+    ) -> None:
+        """LoggedPlaybookStoreを初期化する.
+
+        Args:
+            data_dir: Playbookファイルの保存ディレクトリ
+            compact_threshold: スナップショットに畳み込むログのレコード数
+            file_format: スナップショットファイルの形式
+        """
+        super().__init__(data_dir, file_format)
+        self.compact_threshold = compact_threshold
+        self._states: dict[str, dict[str, BulletState]] = {}
+        self._log_records: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def log_path(self, dataset: str) -> Path:
+        """指定データセットの変更ログのパスを返す.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            変更ログのJSON Linesファイルのパス
+        """
+        return self.data_dir / f"{dataset}.log.jsonl"
+
+    def save(self, dataset: str, playbook: Playbook) -> None:
+        """前回の読み込み・保存時からの差分を変更ログに追記する. 保存のたびにバージョンを1増やす.
+
+        ログがcompact_thresholdレコードに達した場合はスナップショットに畳み込む.
+
+        Args:
+            dataset: データセット名
+            playbook: 保存するPlaybook
+
+        Raises:
+            PlaybookVersionConflictError: 読み込み後に他の書き込みでバージョンが進んでいた場合
+        """
+        with self.lock(dataset):
+            if dataset not in self._states:
+                self._read(dataset)
+            self._check_version(dataset, playbook)
+
+            playbook.metadata.updated_at = datetime.now(tz=JST)
+            playbook.metadata.version += 1
+            states = self._bullet_states(playbook)
+            with self._lock:
+                records = self._diff(self._states[dataset], states, playbook)
+                records.append(
+                    PlaybookLogRecord(
+                        type="COMMIT",
+                        version=playbook.metadata.version,
+                        updated_at=playbook.metadata.updated_at,
+                    )
+                )
+                self._append(dataset, records)
+                self._states[dataset] = states
+                self._log_records[dataset] = self._log_records.get(dataset, 0) + len(records)
+                should_compact = self._log_records[dataset] >= self.compact_threshold
+
+            if should_compact:
+                self._compact(dataset, playbook)
+
+    def compact(self, dataset: str, playbook: Playbook | None = None) -> None:
+        """変更ログをスナップショットに畳み込み、ログを空にする.
+
+        Args:
+            dataset: データセット名
+            playbook: 最新のPlaybook. Noneの場合はスナップショットとログから復元する.
+        """
+        with self.lock(dataset):
+            self._compact(dataset, self._read(dataset) if playbook is None else playbook)
+
+    def _read(self, dataset: str) -> Playbook:
+        """ロックを取得せずにスナップショットを読み込み、変更ログを再生してPlaybookを復元する.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            Playbookオブジェクト. ファイルが存在しない場合は空のPlaybook.
+        """
+        playbook = super()._read(dataset)
+        records = self._read_log(dataset)
+        self._replay(playbook, records)
+        with self._lock:
+            self._states[dataset] = self._bullet_states(playbook)
+            self._log_records[dataset] = len(records)
+        return playbook
+
+    def _stored_version(self, dataset: str) -> int:
+        """スナップショットと変更ログのCOMMITレコードから保存済みのバージョンを返す.
+
+        Bulletを含むレコードはパースせず、書き込みが完了したCOMMITレコードの行だけを読む.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            バージョン. ファイルが存在しない場合は0.
+        """
+        return max(super()._stored_version(dataset), self._scan_log(dataset)[0])
+
+    def _scan_log(self, dataset: str) -> tuple[int, int]:
+        """変更ログの最後の完全なCOMMITレコードを探す.
+
+        Bulletを含むレコードはパースせず、改行まで書き込みが完了したCOMMITレコードの行だけを読む.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            (最後のCOMMITのバージョン, その直後のバイトオフセット). COMMITがない場合は (0, 0).
+        """
+        try:
+            data = self.log_path(dataset).read_bytes()
+        except FileNotFoundError:
+            return 0, 0
+
+        version = committed = offset = 0
+        for line in data.split(b"\n")[:-1]:
+            offset += len(line) + 1
+            if line.startswith(_COMMIT_PREFIX):
+                version = PlaybookLogRecord.model_validate_json(line).version or 0
+                committed = offset
+        return version, committed
+
+    def _append(self, dataset: str, records: list[PlaybookLogRecord]) -> None:
+        """ロックを取得せずにレコードを変更ログに追記し、ディスクに書き出す.
+
+        クラッシュした保存が残したCOMMITのない末尾（書き込み途中の行や未確定のレコード）は
+        追記前に切り詰め、後続の保存のCOMMITで適用されないようにする.
+
+        Args:
+            dataset: データセット名
+            records: 追記するレコード. 最後はCOMMITレコード.
+        """
+        path = self.log_path(dataset)
+        committed = self._scan_log(dataset)[1]
+        with path.open("ab") as f:
+            if f.tell() > committed:
+                logger.warning("Discarding %d uncommitted bytes at the end of %s", f.tell() - committed, path)
+                f.truncate(committed)
+            f.write("".join(f"{record.model_dump_json(exclude_none=True)}\n" for record in records).encode())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self, dataset: str, playbook: Playbook) -> None:
+        """ロックを取得せずに変更ログをスナップショットに畳み込み、ログを空にする.
+
+        Args:
+            dataset: データセット名
+            playbook: 最新のPlaybook
+        """
+        with self._lock:
+            self._write(dataset, playbook)
+            self.log_path(dataset).unlink(missing_ok=True)
+            self._log_records[dataset] = 0
+        logger.info("Compacted playbook log for dataset '%s' (%d bullets)", dataset, len(playbook.bullets))
+
+    def _read_log(self, dataset: str) -> list[PlaybookLogRecord]:
+        """変更ログの最後の完全なCOMMITまでのレコードを読み込む.
+
+        COMMITのない末尾（書き込み途中の行やクラッシュした保存の未確定のレコード）は読み込まない.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            ログレコードのリスト
+        """
+        path = self.log_path(dataset)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return []
+
+        records: list[PlaybookLogRecord] = []
+        pending: list[bytes] = []
+        committed = offset = 0
+        for line in data.split(b"\n")[:-1]:
+            offset += len(line) + 1
+            pending.append(line)
+            if line.startswith(_COMMIT_PREFIX):
+                records.extend(PlaybookLogRecord.model_validate_json(record) for record in pending)
+                pending = []
+                committed = offset
+        if len(data) > committed:
+            logger.warning("Ignoring %d uncommitted bytes at the end of %s", len(data) - committed, path)
+        return records
+
+    @staticmethod
+    def _replay(playbook: Playbook, records: list[PlaybookLogRecord]) -> None:
+        """スナップショットより新しいCOMMITまでのレコードをPlaybookに適用する.
+
+        Args:
+            playbook: スナップショットから読み込んだPlaybook
+            records: ログレコードのリスト
+        """
+        bullets = {bullet.id: bullet for bullet in playbook.bullets}
+        pending: list[PlaybookLogRecord] = []
+        for record in records:
+            if record.type != "COMMIT":
+                pending.append(record)
+                continue
+            if record.version > playbook.metadata.version:
+                for change in pending:
+                    if change.type in {"ADD", "UPDATE"}:
+                        bullets[change.bullet.id] = change.bullet
+                    elif change.type == "DELETE":
+                        bullets.pop(change.bullet_id, None)
+                    elif change.bullet_id in bullets:
+                        bullets[change.bullet_id].helpful += change.helpful
+                        bullets[change.bullet_id].harmful += change.harmful
+                playbook.metadata.version = record.version
+                playbook.metadata.updated_at = record.updated_at
+            pending = []
+        playbook.bullets = list(bullets.values())
+
+    @staticmethod
+    def _bullet_states(playbook: Playbook) -> dict[str, BulletState]:
+        """差分検出用に各Bulletのフィールド値を取り出す.
+
+        Args:
+            playbook: Playbook
+
+        Returns:
+            Bullet IDから (内容フィールド..., helpful, harmful) へのdict
+        """
+        return {
+            b.id: (
+                b.section,
+                b.content,
+                b.searchable_text,
+                tuple(b.keywords),
+                b.source_trajectory,
+                b.helpful,
+                b.harmful,
+            )
+            for b in playbook.bullets
+        }
+
+    @staticmethod
+    def _diff(
+        previous: dict[str, BulletState],
+        current: dict[str, BulletState],
+        playbook: Playbook,
+    ) -> list[PlaybookLogRecord]:
+        """2つの状態の差分をログレコードに変換する.
+
+        カウンターだけが変化したBulletはCOUNTERレコード（加算値）、
+        それ以外のフィールドが変化したBulletはUPDATEレコード（Bullet全体）とする.
+
+        Args:
+            previous: 前回の読み込み・保存時の状態
+            current: 保存するPlaybookの状態
+            playbook: 保存するPlaybook
+
+        Returns:
+            ログレコードのリスト
+        """
+        records: list[PlaybookLogRecord] = []
+        for bullet in playbook.bullets:
+            old, new = previous.get(bullet.id), current[bullet.id]
+            if old is None:
+                records.append(PlaybookLogRecord(type="ADD", bullet=bullet))
+            elif old[:5] != new[:5]:
+                records.append(PlaybookLogRecord(type="UPDATE", bullet=bullet))
+            elif old != new:
+                records.append(
+                    PlaybookLogRecord(
+                        type="COUNTER", bullet_id=bullet.id, helpful=new[5] - old[5], harmful=new[6] - old[6]
+                    )
+                )
+        records.extend(
+            PlaybookLogRecord(type="DELETE", bullet_id=bullet_id) for bullet_id in previous if bullet_id not in current
+        )
+        return records
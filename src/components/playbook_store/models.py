@@ -40,6 +40,7 @@ class PlaybookMetadata(BaseModel):
 
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
+    version: int = 0
 
 
 class Playbook(BaseModel):
@@ -52,6 +53,22 @@ class Playbook(BaseModel):
     bullets: list[Bullet] = Field(default_factory=list)
 
 
+class PlaybookLogRecord(BaseModel):
+    """Playbookの追記ログの1レコードを表すモデル.
+
+    ADD / UPDATE は変更後のBullet全体、DELETE はBullet ID、COUNTER はカウンターの加算値を持つ.
+    COMMIT は1回の保存の区切りで、保存後のバージョンと更新日時を持つ.
+    """
+
+    type: Literal["ADD", "UPDATE", "DELETE", "COUNTER", "COMMIT"]
+    bullet: Bullet | None = None
+    bullet_id: str | None = None
+    helpful: int = 0
+    harmful: int = 0
+    version: int | None = None
+    updated_at: datetime | None = None
+
+
 class DeltaContextItem(BaseModel):
     """Curatorが生成するPlaybookへの更新差分を表すモデル."""
 
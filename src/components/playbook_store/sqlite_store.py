@@ -0,0 +1,451 @@
+"""SQLiteでPlaybookを永続化するストア."""
+
+import json
+import sqlite3
+from collections.abc import Iterable, Iterator
+from contextlib import closing, contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from src.components.playbook_store.columnar import BulletColumns
+from src.components.playbook_store.models import Bullet, Playbook, PlaybookMetadata
+from src.components.playbook_store.store import JST, PlaybookStore, PlaybookVersionConflictError
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS playbooks (
+    dataset TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bullets (
+    dataset TEXT NOT NULL,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    content TEXT NOT NULL,
+    searchable_text TEXT NOT NULL,
+    keywords TEXT NOT NULL,
+    helpful INTEGER NOT NULL,
+    harmful INTEGER NOT NULL,
+    source_trajectory TEXT NOT NULL,
+    PRIMARY KEY (dataset, id)
+);
+CREATE INDEX IF NOT EXISTS bullets_dataset_position ON bullets (dataset, position);
+CREATE INDEX IF NOT EXISTS bullets_dataset_section ON bullets (dataset, section);
+CREATE INDEX IF NOT EXISTS bullets_id ON bullets (id);
+"""
+
+_BULLET_COLUMNS = "id, section, content, searchable_text, keywords, helpful, harmful, source_trajectory"
+
+_CONFIDENCE = "CASE WHEN helpful + harmful = 0 THEN 0.5 ELSE CAST(helpful AS REAL) / (helpful + harmful) END"
+
+_UPSERT = f"""
+INSERT INTO bullets (dataset, position, {_BULLET_COLUMNS})
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (dataset, id) DO UPDATE SET
+    position = excluded.position,
+    section = excluded.section,
+    content = excluded.content,
+    keywords = excluded.keywords,
+    helpful = excluded.helpful,
+    harmful = excluded.harmful,
+    source_trajectory = excluded.source_trajectory,
+    searchable_text = excluded.searchable_text
+"""  # noqa: S608
+
+
+class SQLitePlaybookStore(PlaybookStore):
+    """全データセットのPlaybookを1つのSQLiteデータベースで永続化するストアクラス.
+
+    `load` / `save` に加えて、Playbook全体を読み書きせずに1件単位で扱う
+    `get` / `find` / `upsert` / `delete` / `increment_counters` を提供する.
+    データベースはWALモードで開き、読み込みと書き込みを並行できる.
+    Bullet embeddingは他のストアと同じく `embeddings_path` のサイドカーファイルに保存する.
+
+    Note:
+        - 1件単位の更新もPlaybookのバージョンを1増やす.
+        - `save` はバージョンの確認と書き込みを1つの書き込みトランザクションで行うため、
+          ファイルロックは用いない. Playbookファイルのパスとロックを扱うメソッドは
+          NotImplementedErrorを送出する.
+    """
+
+    def __init__(self, data_dir: str = "data/playbooks", db_path: str | None = None) -> None:
+        """SQLitePlaybookStoreを初期化し、テーブルとインデックスを作成する.
+
+        Args:
+            data_dir: embeddingサイドカーファイルなどの保存ディレクトリ
+            db_path: データベースファイルのパス. Noneの場合は `<data_dir>/playbooks.sqlite3`.
+        """
+        super().__init__(data_dir)
+        self.db_path = Path(db_path) if db_path else self.data_dir / "playbooks.sqlite3"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def load(self, dataset: str) -> Playbook:
+        """指定データセットのPlaybookを読み込む.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            Playbookオブジェクト. データセットが存在しない場合は空のPlaybook.
+        """
+        return self._read(dataset)
+
+    def load_columns(self, dataset: str) -> BulletColumns:
+        """指定データセットのBulletを列ごとに読み込む.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            データベースから読み込んだPlaybookのBulletColumns
+        """
+        return BulletColumns.from_bullets(self.load(dataset).bullets)
+
+    def copy_from(self, source: PlaybookStore, dataset: str) -> Playbook:
+        """別のストアのPlaybookを、バージョンを変えずにメタデータごとデータベースに書き込む.
+
+        Args:
+            source: コピー元のストア
+            dataset: データセット名
+
+        Returns:
+            コピーしたPlaybook
+        """
+        playbook = source.load(dataset)
+        self._write(dataset, playbook)
+        return playbook
+
+    def playbook_path(self, dataset: str) -> Path:
+        """Playbookはファイルに保存しないため、常にNotImplementedErrorを送出する.
+
+        Args:
+            dataset: データセット名
+
+        Raises:
+            NotImplementedError: 常に送出する
+        """
+        msg = f"SQLitePlaybookStore keeps playbook '{dataset}' in {self.db_path}, not in a playbook file"
+        raise NotImplementedError(msg)
+
+    def lock_path(self, dataset: str) -> Path:
+        """ファイルロックを用いないため、常にNotImplementedErrorを送出する.
+
+        Args:
+            dataset: データセット名
+
+        Raises:
+            NotImplementedError: 常に送出する
+        """
+        msg = f"SQLitePlaybookStore serializes writes to '{dataset}' with transactions, not file locks"
+        raise NotImplementedError(msg)
+
+    @contextmanager
+    def lock(self, dataset: str, *, shared: bool = False) -> Iterator[None]:  # noqa: ARG002
+        """ファイルロックを用いないため、常にNotImplementedErrorを送出する.
+
+        Args:
+            dataset: データセット名
+            shared: 未使用
+
+        Raises:
+            NotImplementedError: 常に送出する
+        """
+        self.lock_path(dataset)
+        yield
+
+    def _read(self, dataset: str) -> Playbook:
+        """データベースからPlaybookを読み込む.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            Playbookオブジェクト. データセットが存在しない場合は空のPlaybook.
+        """
+        with self._connect() as conn:
+            metadata = self._metadata(conn, dataset)
+            if metadata is None:
+                return Playbook()
+            rows = conn.execute(
+                f"SELECT {_BULLET_COLUMNS} FROM bullets WHERE dataset = ? ORDER BY position",  # noqa: S608
+                (dataset,),
+            ).fetchall()
+        return Playbook(metadata=metadata, bullets=[self._to_bullet(row) for row in rows])
+
+    def save(self, dataset: str, playbook: Playbook) -> None:
+        """Playbookを保存する. 保存のたびにバージョンを1増やす.
+
+        Playbookに存在しないBulletは削除する.
+
+        Args:
+            dataset: データセット名
+            playbook: 保存するPlaybook
+
+        Raises:
+            PlaybookVersionConflictError: 読み込み後に他の書き込みでバージョンが進んでいた場合
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            metadata = self._metadata(conn, dataset)
+            stored = metadata.version if metadata is not None else 0
+            if stored != playbook.metadata.version:
+                raise PlaybookVersionConflictError(dataset, playbook.metadata.version, stored)
+
+            playbook.metadata.updated_at = datetime.now(tz=JST)
+            playbook.metadata.version += 1
+            self._write_rows(conn, dataset, playbook)
+
+    def get(self, dataset: str, bullet_id: str) -> Bullet | None:
+        """Bulletを1件取得する.
+
+        Args:
+            dataset: データセット名
+            bullet_id: Bullet ID
+
+        Returns:
+            Bullet. 存在しない場合はNone.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {_BULLET_COLUMNS} FROM bullets WHERE dataset = ? AND id = ?",  # noqa: S608
+                (dataset, bullet_id),
+            ).fetchone()
+        return self._to_bullet(row) if row else None
+
+    def find(self, dataset: str, section: str | None = None, min_confidence: float = 0.0) -> list[Bullet]:
+        """セクションと信頼度スコアの条件を満たすBulletを取得する.
+
+        Args:
+            dataset: データセット名
+            section: セクション名. Noneの場合は全セクション.
+            min_confidence: 信頼度スコアの下限
+
+        Returns:
+            Playbook内の順序に並んだBulletリスト
+        """
+        query = f"SELECT {_BULLET_COLUMNS} FROM bullets WHERE dataset = ? AND {_CONFIDENCE} >= ?"  # noqa: S608
+        params: list[object] = [dataset, min_confidence]
+        if section is not None:
+            query += " AND section = ?"
+            params.append(section)
+        with self._connect() as conn:
+            rows = conn.execute(f"{query} ORDER BY position", params).fetchall()
+        return [self._to_bullet(row) for row in rows]
+
+    def upsert(self, dataset: str, bullets: list[Bullet]) -> None:
+        """Bulletを追加または更新する. 新しいBulletは末尾に追加する.
+
+        Args:
+            dataset: データセット名
+            bullets: 追加・更新するBulletリスト
+        """
+        if not bullets:
+            return
+
+        with self._connect() as conn:
+            self._touch(conn, dataset)
+            self._fill_id_table(conn, (b.id for b in bullets))
+            positions = dict(
+                conn.execute(
+                    "SELECT id, position FROM bullets WHERE dataset = ? AND id IN (SELECT id FROM id_list)",
+                    (dataset,),
+                ).fetchall()
+            )
+            (next_position,) = conn.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM bullets WHERE dataset = ?",
+                (dataset,),
+            ).fetchone()
+            rows = []
+            for bullet in bullets:
+                if bullet.id not in positions:
+                    positions[bullet.id] = next_position
+                    next_position += 1
+                rows.append(self._to_row(dataset, positions[bullet.id], bullet))
+            conn.executemany(_UPSERT, rows)
+
+    def delete(self, dataset: str, bullet_ids: list[str]) -> None:
+        """Bulletを削除する. 存在しないIDは無視する.
+
+        Args:
+            dataset: データセット名
+            bullet_ids: 削除するBullet IDリスト
+        """
+        with self._connect() as conn:
+            self._touch(conn, dataset)
+            conn.executemany("DELETE FROM bullets WHERE dataset = ? AND id = ?", ((dataset, i) for i in bullet_ids))
+
+    def increment_counters(self, dataset: str, bullet_id: str, helpful: int = 0, harmful: int = 0) -> None:
+        """Bulletのhelpful/harmfulカウンターを加算する. 存在しないIDは無視する.
+
+        Args:
+            dataset: データセット名
+            bullet_id: Bullet ID
+            helpful: helpfulカウンターの加算値
+            harmful: harmfulカウンターの加算値
+        """
+        with self._connect() as conn:
+            self._touch(conn, dataset)
+            conn.execute(
+                "UPDATE bullets SET helpful = helpful + ?, harmful = harmful + ? WHERE dataset = ? AND id = ?",
+                (helpful, harmful, dataset, bullet_id),
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """データベースに接続し、ブロックを1トランザクションとして実行する.
+
+        Yields:
+            SQLiteコネクション
+        """
+        with closing(sqlite3.connect(self.db_path, timeout=30.0)) as conn, conn:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+
+    def _write(self, dataset: str, playbook: Playbook) -> None:
+        """Playbookをメタデータごとそのままデータベースに書き込む.
+
+        Args:
+            dataset: データセット名
+            playbook: 書き込むPlaybook
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._write_rows(conn, dataset, playbook)
+
+    def _stored_version(self, dataset: str) -> int:
+        """保存済みのPlaybookのバージョンを返す.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            バージョン. データセットが存在しない場合は0.
+        """
+        with self._connect() as conn:
+            metadata = self._metadata(conn, dataset)
+        return metadata.version if metadata is not None else 0
+
+    def _write_rows(self, conn: sqlite3.Connection, dataset: str, playbook: Playbook) -> None:
+        """Playbookのメタデータと全Bulletを書き込み、Playbookに存在しないBulletを削除する.
+
+        Args:
+            conn: 書き込みトランザクション中のSQLiteコネクション
+            dataset: データセット名
+            playbook: 書き込むPlaybook
+        """
+        conn.execute(
+            "INSERT OR REPLACE INTO playbooks (dataset, created_at, updated_at, version) VALUES (?, ?, ?, ?)",
+            (
+                dataset,
+                playbook.metadata.created_at.isoformat(),
+                playbook.metadata.updated_at.isoformat(),
+                playbook.metadata.version,
+            ),
+        )
+        self._fill_id_table(conn, (b.id for b in playbook.bullets))
+        conn.execute("DELETE FROM bullets WHERE dataset = ? AND id NOT IN (SELECT id FROM id_list)", (dataset,))
+        conn.executemany(_UPSERT, (self._to_row(dataset, i, b) for i, b in enumerate(playbook.bullets)))
+
+    @staticmethod
+    def _metadata(conn: sqlite3.Connection, dataset: str) -> PlaybookMetadata | None:
+        """データセットのメタデータを取得する.
+
+        Args:
+            conn: SQLiteコネクション
+            dataset: データセット名
+
+        Returns:
+            PlaybookMetadata. データセットが存在しない場合はNone.
+        """
+        row = conn.execute(
+            "SELECT created_at, updated_at, version FROM playbooks WHERE dataset = ?",
+            (dataset,),
+        ).fetchone()
+        if row is None:
+            return None
+        return PlaybookMetadata(
+            created_at=datetime.fromisoformat(row[0]),
+            updated_at=datetime.fromisoformat(row[1]),
+            version=row[2],
+        )
+
+    @staticmethod
+    def _fill_id_table(conn: sqlite3.Connection, bullet_ids: Iterable[str]) -> None:
+        """一時テーブル `id_list` の内容をBullet IDで置き換える.
+
+        IDごとにIN句のパラメーターを並べるとSQLiteのホストパラメーター数の上限を超えうるため、
+        多数のIDで絞り込む場合は一時テーブルとの副問い合わせを使う.
+
+        Args:
+            conn: SQLiteコネクション
+            bullet_ids: Bullet IDの列
+        """
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS id_list (id TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM id_list")
+        conn.executemany("INSERT OR IGNORE INTO id_list VALUES (?)", ((i,) for i in bullet_ids))
+
+    @staticmethod
+    def _touch(conn: sqlite3.Connection, dataset: str) -> None:
+        """データセットの更新日時を現在時刻にしてバージョンを1増やす. 未登録の場合は登録する.
+
+        Args:
+            conn: SQLiteコネクション
+            dataset: データセット名
+        """
+        now = datetime.now(tz=JST).isoformat()
+        conn.execute(
+            "INSERT INTO playbooks (dataset, created_at, updated_at, version) VALUES (?, ?, ?, 1) "
+            "ON CONFLICT (dataset) DO UPDATE SET updated_at = excluded.updated_at, version = version + 1",
+            (dataset, now, now),
+        )
+
+    @staticmethod
+    def _to_row(dataset: str, position: int, bullet: Bullet) -> tuple[object, ...]:
+        """Bulletをbulletsテーブルの行に変換する.
+
+        Args:
+            dataset: データセット名
+            position: Playbook内の位置
+            bullet: Bullet
+
+        Returns:
+            INSERT文のパラメータ
+        """
+        return (
+            dataset,
+            position,
+            bullet.id,
+            bullet.section,
+            bullet.content,
+            bullet.searchable_text,
+            json.dumps(bullet.keywords, ensure_ascii=False),
+            bullet.helpful,
+            bullet.harmful,
+            bullet.source_trajectory,
+        )
+
+    @staticmethod
+    def _to_bullet(row: tuple) -> Bullet:
+        """bulletsテーブルの行をBulletに変換する.
+
+        Args:
+            row: `_BULLET_COLUMNS` の順の列値
+
+        Returns:
+            Bullet
+        """
+        return Bullet(
+            id=row[0],
+            section=row[1],
+            content=row[2],
+            searchable_text=row[3],
+            keywords=json.loads(row[4]),
+            helpful=row[5],
+            harmful=row[6],
+            source_trajectory=row[7],
+        )
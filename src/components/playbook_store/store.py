@@ -1,25 +1,130 @@
 """Playbookの永続化を担当するストア."""
 
-import json
+import fcntl
+import logging
+import os
+import re
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
+from typing import Literal
 from zoneinfo import ZoneInfo
 
+from src.components.playbook_store.columnar import BulletColumns, read_arrow, write_arrow
 from src.components.playbook_store.models import Playbook
 
+logger = logging.getLogger(__name__)
+
 JST = ZoneInfo("Asia/Tokyo")
 
+PlaybookFileFormat = Literal["json", "arrow"]
+
+_VERSION_PATTERN = re.compile(rb'"version"\s*:\s*(\d+)')
+_VERSION_PEEK_BYTES = 4096
+
+
+class PlaybookVersionConflictError(RuntimeError):
+    """保存しようとしたPlaybookの読み込み時のバージョンが、保存済みのバージョンと異なる場合の例外.
+
+    Attributes:
+        dataset: データセット名
+        expected: 保存しようとしたPlaybookのバージョン（読み込み時のバージョン）
+        actual: 保存済みのバージョン
+    """
+
+    def __init__(self, dataset: str, expected: int, actual: int) -> None:
+        """PlaybookVersionConflictErrorを初期化する.
+
+        Args:
+            dataset: データセット名
+            expected: 保存しようとしたPlaybookのバージョン
+            actual: 保存済みのバージョン
+        """
+        super().__init__(
+            f"Playbook '{dataset}' was updated by another writer (loaded version {expected}, stored version {actual})"
+        )
+        self.dataset = dataset
+        self.expected = expected
+        self.actual = actual
+
 
 class PlaybookStore:
-    """PlaybookをJSON形式で永続化するストアクラス."""
+    """PlaybookをJSON形式またはArrow IPC形式で永続化するストアクラス.
+
+    Arrow IPC形式（`<dataset>.arrow`）はBulletを列ごとに保持するため、
+    `load_columns` ではBulletオブジェクトを生成せずに読み込める.
+
+    複数のプロセス・スレッドから同じデータセットを更新できるよう、
+    `<dataset>.lock` へのアドバイザリロックの下で読み書きし、ファイルは一時ファイルへの
+    書き込みとリネームで置き換える. `save` は保存済みのバージョンが読み込み時のバージョンと
+    一致する場合のみ保存し（楽観的排他制御）、一致しない場合は
+    PlaybookVersionConflictErrorを送出する. `update` は競合時に読み込みからやり直す.
 
-    def __init__(self, data_dir: str = "data/playbooks") -> None:
+    Note:
+        - ロックは再入できないため、ロック中に `load` / `save` を呼ばない.
+        - ロックにはfcntlを用いるため、POSIX環境でのみ動作する.
+    """
+
+    def __init__(self, data_dir: str = "data/playbooks", file_format: PlaybookFileFormat = "json") -> None:
         """PlaybookStoreを初期化する.
 
         Args:
             data_dir: Playbookファイルの保存ディレクトリ
+            file_format: Playbookファイルの形式
         """
         self.data_dir = Path(data_dir)
+        self.file_format = file_format
+
+    def playbook_path(self, dataset: str) -> Path:
+        """指定データセットのPlaybookファイルのパスを返す.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            Playbookファイルのパス. 拡張子はfile_formatに応じて `.json` または `.arrow`.
+        """
+        return self.data_dir / f"{dataset}.{self.file_format}"
+
+    def embeddings_path(self, dataset: str) -> Path:
+        """指定データセットのembeddingサイドカーファイルのパスを返す.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            拡張子を除いたサイドカーファイルのパス
+        """
+        return self.data_dir / f"{dataset}.embeddings"
+
+    def lock_path(self, dataset: str) -> Path:
+        """指定データセットのロックファイルのパスを返す.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            ロックファイルのパス
+        """
+        return self.data_dir / f"{dataset}.lock"
+
+    @contextmanager
+    def lock(self, dataset: str, *, shared: bool = False) -> Iterator[None]:
+        """指定データセットのアドバイザリロックを取得し、ブロックの終了時に解放する.
+
+        Args:
+            dataset: データセット名
+            shared: Trueの場合は読み込み用の共有ロック、Falseの場合は書き込み用の排他ロック
+        """
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        with self.lock_path(dataset).open("a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
 
     def load(self, dataset: str) -> Playbook:
         """指定データセットのPlaybookを読み込む.
@@ -30,20 +135,178 @@ class PlaybookStore:
         Returns:
             Playbookオブジェクト. ファイルが存在しない場合は空のPlaybook.
         """
-        path = self.data_dir / f"{dataset}.json"
-        if not path.exists():
-            return Playbook()
-        data = json.loads(path.read_text())
-        return Playbook.model_validate(data)
+        with self.lock(dataset, shared=True):
+            return self._read(dataset)
+
+    def load_columns(self, dataset: str) -> BulletColumns:
+        """指定データセットのBulletを、Bulletオブジェクトに変換せずに列ごとに読み込む.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            BulletColumns. JSON形式の場合は読み込んだPlaybookから作成する.
+        """
+        if self.file_format != "arrow":
+            return BulletColumns.from_bullets(self.load(dataset).bullets)
+        with self.lock(dataset, shared=True):
+            path = self.playbook_path(dataset)
+            return read_arrow(path)[1] if path.exists() else BulletColumns.from_bullets([])
 
     def save(self, dataset: str, playbook: Playbook) -> None:
-        """PlaybookをJSONファイルに保存する.
+        """Playbookをファイルに保存する. 保存のたびにバージョンを1増やす.
 
         Args:
             dataset: データセット名
             playbook: 保存するPlaybook
+
+        Raises:
+            PlaybookVersionConflictError: 読み込み後に他の書き込みでバージョンが進んでいた場合
+        """
+        with self.lock(dataset):
+            self._check_version(dataset, playbook)
+            playbook.metadata.updated_at = datetime.now(tz=JST)
+            playbook.metadata.version += 1
+            self._write(dataset, playbook)
+
+    def update(
+        self,
+        dataset: str,
+        mutate: Callable[[Playbook], None],
+        playbook: Playbook | None = None,
+        max_retries: int = 3,
+    ) -> Playbook:
+        """Playbookをmutateで変更して保存する. バージョンが競合した場合は読み込みからやり直す.
+
+        mutateは競合のたびに最新のPlaybookに対して再実行されるため、
+        LLM呼び出しなどの重い処理は事前に済ませ、mutateではPlaybookへの反映のみを行う.
+
+        Args:
+            dataset: データセット名
+            mutate: Playbookをその場で変更する関数
+            playbook: 1回目に変更するPlaybook. Noneの場合は読み込む.
+            max_retries: 競合時に読み込みからやり直す最大回数
+
+        Returns:
+            保存したPlaybook
+
+        Raises:
+            PlaybookVersionConflictError: max_retries回やり直しても競合した場合
+        """
+        attempt = 0
+        while True:
+            if playbook is None:
+                playbook = self.load(dataset)
+            mutate(playbook)
+            try:
+                self.save(dataset, playbook)
+            except PlaybookVersionConflictError as e:
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                logger.warning("%s; retrying (%d/%d)", e, attempt, max_retries)
+                playbook = None
+            else:
+                return playbook
+
+    def copy_from(self, source: "PlaybookStore", dataset: str) -> Playbook:
+        """別のストアのPlaybookを、バージョンを変えずにメタデータごとこのストアの形式で書き込む.
+
+        Args:
+            source: コピー元のストア
+            dataset: データセット名
+
+        Returns:
+            コピーしたPlaybook
+        """
+        playbook = source.load(dataset)
+        with self.lock(dataset):
+            self._write(dataset, playbook)
+        return playbook
+
+    def _read(self, dataset: str) -> Playbook:
+        """ロックを取得せずにPlaybookファイルを読み込む.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            Playbookオブジェクト. ファイルが存在しない場合は空のPlaybook.
+        """
+        path = self.playbook_path(dataset)
+        if not path.exists():
+            return Playbook()
+        if self.file_format == "arrow":
+            metadata, columns = read_arrow(path)
+            return Playbook.model_construct(metadata=metadata, bullets=columns.to_bullets())
+        return Playbook.model_validate_json(path.read_bytes())
+
+    def _check_version(self, dataset: str, playbook: Playbook) -> None:
+        """保存済みのバージョンが保存しようとしたPlaybookのバージョンと一致することを確認する.
+
+        Args:
+            dataset: データセット名
+            playbook: 保存しようとしたPlaybook
+
+        Raises:
+            PlaybookVersionConflictError: バージョンが一致しない場合
+        """
+        stored = self._stored_version(dataset)
+        if stored != playbook.metadata.version:
+            raise PlaybookVersionConflictError(dataset, playbook.metadata.version, stored)
+
+    def _stored_version(self, dataset: str) -> int:
+        """保存済みのPlaybookのバージョンを返す.
+
+        Args:
+            dataset: データセット名
+
+        Returns:
+            バージョン. ファイルが存在しない場合は0.
+        """
+        return self._peek_version(self.playbook_path(dataset)) or 0
+
+    @staticmethod
+    def _peek_version(path: Path) -> int | None:
+        """Playbookファイル全体をパースせずに、先頭に埋め込まれたバージョンを読み取る.
+
+        JSON形式・Arrow IPC形式のいずれもメタデータをファイル先頭に書き込むため、
+        先頭の数KBだけを読めばよい.
+
+        Args:
+            path: Playbookファイルのパス
+
+        Returns:
+            バージョン. ファイルが存在しないかバージョンが見つからない場合はNone.
+        """
+        try:
+            with path.open("rb") as f:
+                head = f.read(_VERSION_PEEK_BYTES)
+        except FileNotFoundError:
+            return None
+        match = _VERSION_PATTERN.search(head)
+        return int(match.group(1)) if match else None
+
+    def _write(self, dataset: str, playbook: Playbook) -> None:
+        """Playbookをメタデータごとそのままファイルに書き込む.
+
+        同じディレクトリの一時ファイルに書き込んでからリネームで置き換えるため、
+        書き込み途中のファイルが読み込まれることはない.
+
+        Args:
+            dataset: データセット名
+            playbook: 書き込むPlaybook
         """
         self.data_dir.mkdir(parents=True, exist_ok=True)
-        path = self.data_dir / f"{dataset}.json"
-        playbook.metadata.updated_at = datetime.now(tz=JST)
-        path.write_text(playbook.model_dump_json(indent=2))
+        path = self.playbook_path(dataset)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            if self.file_format == "arrow":
+                write_arrow(tmp_path, playbook.metadata, BulletColumns.from_bullets(playbook.bullets))
+            else:
+                tmp_path.write_text(playbook.model_dump_json(indent=2))
+            with tmp_path.open("rb") as f:
+                os.fsync(f.fileno())
+            tmp_path.replace(path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
@@ -8,6 +8,7 @@ from src.application.workflows.reflection_workflow import ReflectionWorkflow
 from src.common.config.settings import load_config
 from src.common.di.container import Container
 from src.common.schema.api import WorkflowRequest, WorkflowResponse
+from src.components.hybrid_search.profiling import SEARCH_METRICS
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +50,16 @@ def health() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/metrics/search")
+def search_metrics() -> dict[str, object]:
+    """検索のステージ別処理時間と候補数の集計を返すエンドポイント.
+
+    Returns:
+        プロセス起動以降の検索の集計
+    """
+    return SEARCH_METRICS.snapshot()
+
+
 @app.post("/workflow/run", response_model=WorkflowResponse)
 def run_workflow(request: WorkflowRequest) -> WorkflowResponse:
     """ワークフロー実行エンドポイント.
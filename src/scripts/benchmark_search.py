@@ -0,0 +1,203 @@
+"""ネットワーク不要のHybridSearchベンチマークスクリプト.
+
+ローカルのHashingEmbeddingsで合成Playbookを生成し、インデックス構築時間と
+search / search_many のレイテンシ・スループットを計測する.
+融合戦略やANN、次元削減などの検索設定は環境変数（SEARCH_*）から読み込む.
+次元削減が有効な場合は、元の次元での検索結果に対するrecall@kも算出する.
+
+Usage:
+    python src/scripts/benchmark_search.py --bullets 50000 --queries 200
+    python src/scripts/benchmark_search.py --dimension 1536 --latency-ms 20
+    SEARCH_REDUCTION=pca SEARCH_REDUCED_DIMENSION=128 python src/scripts/benchmark_search.py --dimension 1536
+"""
+
+import argparse
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from src.common.config.settings import SearchConfig, load_config
+from src.common.lib.logging import getLogger
+from src.components.hybrid_search.ann_index import IVFIndex
+from src.components.hybrid_search.embedding_client import EmbeddingClient
+from src.components.hybrid_search.local_embeddings import HashingEmbeddings
+from src.components.hybrid_search.models import SearchQuery, SearchResult
+from src.components.hybrid_search.profiling import SEARCH_METRICS
+from src.components.hybrid_search.reduction import EmbeddingReducer, PCAReducer, TruncationReducer
+from src.components.hybrid_search.search import HybridSearch
+from src.components.playbook_store.models import Bullet, Playbook
+
+logger = getLogger(__name__)
+
+VOCABULARY_SIZE = 5000
+SECTIONS = ["strategies", "mistakes", "tips", "formulas"]
+
+
+def parse_args() -> argparse.Namespace:
+    """コマンドライン引数をパースする."""
+    parser = argparse.ArgumentParser(description="HybridSearchベンチマーク")
+    parser.add_argument("--bullets", type=int, default=10000, help="合成Bullet数 (default: 10000)")
+    parser.add_argument("--queries", type=int, default=100, help="計測するクエリ数 (default: 100)")
+    parser.add_argument("--dimension", type=int, default=256, help="embedding次元数 (default: 256)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="embeddingの模擬待ち時間 (default: 0)")
+    parser.add_argument("--top-k", type=int, default=10, help="取得件数 (default: 10)")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード (default: 0)")
+    return parser.parse_args()
+
+
+def synthetic_texts(rng: np.random.Generator, count: int, min_words: int, max_words: int) -> list[str]:
+    """Zipf分布に従う語彙から合成テキストを生成する.
+
+    Args:
+        rng: 乱数生成器
+        count: 生成するテキスト数
+        min_words: 1テキストの最小語数
+        max_words: 1テキストの最大語数
+
+    Returns:
+        合成テキストのリスト
+    """
+    texts = []
+    for _ in range(count):
+        n_words = int(rng.integers(min_words, max_words + 1))
+        word_ids = np.minimum(rng.zipf(1.3, size=n_words), VOCABULARY_SIZE)
+        texts.append(" ".join(f"w{i}" for i in word_ids.tolist()))
+    return texts
+
+
+def build_reducer(config: SearchConfig) -> EmbeddingReducer | None:
+    """設定に従い次元削減を生成する.
+
+    Args:
+        config: 検索設定
+
+    Returns:
+        次元削減. 無効な場合はNone.
+    """
+    if config.reduction == "truncate":
+        return TruncationReducer(config.reduced_dimension)
+    if config.reduction == "pca":
+        return PCAReducer(config.reduced_dimension, min_fit_size=config.pca_min_fit_size)
+    return None
+
+
+def build_search(
+    config: SearchConfig,
+    dimension: int,
+    latency_ms: float,
+    reducer: EmbeddingReducer | None = None,
+) -> HybridSearch:
+    """設定に従いローカルembeddingを使うHybridSearchを生成する.
+
+    Args:
+        config: 検索設定
+        dimension: embedding次元数
+        latency_ms: embedding 1リクエストの模擬待ち時間（ミリ秒）
+        reducer: embeddingの次元削減
+
+    Returns:
+        HybridSearchインスタンス
+    """
+    ann_index = None
+    if config.vector_search == "approximate":
+        ann_index = IVFIndex(
+            n_lists=config.ann_n_lists,
+            n_probe=config.ann_n_probe,
+            min_train_size=config.ann_min_train_size,
+        )
+    return HybridSearch(
+        EmbeddingClient(HashingEmbeddings(dimension=dimension, latency_ms=latency_ms)),
+        alpha=config.alpha,
+        ann_index=ann_index,
+        fusion=config.fusion,
+        rrf_k=config.rrf_k,
+        reducer=reducer,
+    )
+
+
+def recall_at_k(results: list[list[SearchResult]], baseline: list[list[SearchResult]]) -> float:
+    """ベースラインの検索結果に対する平均recall@kを計算する.
+
+    Args:
+        results: 評価対象の検索結果
+        baseline: resultsと同順のベースラインの検索結果
+
+    Returns:
+        平均recall@k. ベースラインが空のクエリは除く.
+    """
+    recalls = [
+        len({r.bullet.id for r in result} & {r.bullet.id for r in expected}) / len(expected)
+        for result, expected in zip(results, baseline, strict=True)
+        if expected
+    ]
+    return float(np.mean(recalls)) if recalls else 1.0
+
+
+def main() -> None:
+    """HybridSearchのベンチマークを実行する."""
+    load_dotenv()
+    args = parse_args()
+    config = load_config().search
+    rng = np.random.default_rng(args.seed)
+
+    playbook = Playbook(
+        bullets=[
+            Bullet(
+                id=f"b{i:07d}",
+                section=SECTIONS[i % len(SECTIONS)],
+                content=text,
+                searchable_text=text,
+                helpful=int(rng.integers(0, 5)),
+                harmful=int(rng.integers(0, 3)),
+            )
+            for i, text in enumerate(synthetic_texts(rng, args.bullets, 8, 40))
+        ]
+    )
+    queries = [SearchQuery(query_text=text, top_k=args.top_k) for text in synthetic_texts(rng, args.queries, 3, 12)]
+    search = build_search(config, args.dimension, args.latency_ms, build_reducer(config))
+
+    start = time.perf_counter()
+    search.search(queries[0], playbook)
+    build_seconds = time.perf_counter() - start
+
+    SEARCH_METRICS.reset()
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search.search(query, playbook)
+        latencies.append(time.perf_counter() - start)
+    stages = SEARCH_METRICS.snapshot()["stages"]
+
+    start = time.perf_counter()
+    results = search.search_many(queries, playbook)
+    batch_seconds = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    logger.info("=" * 60)
+    logger.info("Bullets: %d, Queries: %d, Dimension: %d", args.bullets, args.queries, args.dimension)
+    logger.info("Vector search: %s, Fusion: %s", config.vector_search, config.fusion)
+    logger.info("Index build (first search): %.2f s", build_seconds)
+    logger.info(
+        "search: p50 %.2f ms, p95 %.2f ms, %.1f QPS",
+        np.percentile(latencies_ms, 50),
+        np.percentile(latencies_ms, 95),
+        len(queries) / sum(latencies),
+    )
+    for name, stats in stages.items():
+        logger.info("  %-18s mean %.3f ms", name, stats["mean_ms"])
+    logger.info("search_many: %.2f s total, %.1f QPS", batch_seconds, len(queries) / batch_seconds)
+    if search.reducer is not None:
+        baseline = build_search(config, args.dimension, 0.0).search_many(queries, playbook)
+        logger.info(
+            "Reduction: %s, recall@%d vs %d dims: %.3f",
+            search.reducer.signature,
+            args.top_k,
+            args.dimension,
+            recall_at_k(results, baseline),
+        )
+    logger.info("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Playbookファイルの形式（JSON / Arrow IPC）を変換するスクリプト.
+
+変換元の形式で読み込んだPlaybookを、メタデータ（バージョン・更新日時）を保ったまま
+変換先の形式で書き込む. --datasetを省略した場合はデータディレクトリ内の
+変換元形式の全Playbookを変換する. 変換元のファイルは削除しない.
+
+Usage:
+    python src/scripts/convert_playbooks.py --to arrow
+    python src/scripts/convert_playbooks.py --to json --dataset jcommonsenseqa
+"""
+
+import argparse
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from src.common.config.settings import load_config
+from src.common.lib.logging import getLogger
+from src.components.playbook_store.store import PlaybookStore
+
+logger = getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    """コマンドライン引数をパースする."""
+    parser = argparse.ArgumentParser(description="Playbookファイルの形式変換")
+    parser.add_argument("--to", required=True, choices=["json", "arrow"], help="変換先の形式")
+    parser.add_argument("--dataset", action="append", help="データセット名（複数指定可）. 省略時は全データセット")
+    parser.add_argument("--data-dir", default=None, help="Playbookの保存ディレクトリ")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """指定したデータセットのPlaybookを変換先の形式で書き込む."""
+    load_dotenv()
+    args = parse_args()
+    data_dir = args.data_dir or load_config().playbook.data_dir
+    source = PlaybookStore(data_dir, file_format="json" if args.to == "arrow" else "arrow")
+    target = PlaybookStore(data_dir, file_format=args.to)
+
+    try:
+        datasets = args.dataset or sorted(
+            path.stem for path in source.data_dir.glob(f"*.{source.file_format}") if "." not in path.stem
+        )
+        for dataset in datasets:
+            start = time.perf_counter()
+            playbook = target.copy_from(source, dataset)
+            logger.info(
+                "Converted '%s' (%d bullets) to %s in %.1f ms",
+                target.playbook_path(dataset),
+                len(playbook.bullets),
+                args.to,
+                (time.perf_counter() - start) * 1000,
+            )
+    except Exception:
+        logger.exception("Failed to convert playbooks")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Playbook内の近似重複Bulletを検出・統合するスクリプト.
+
+MinHash/LSHで近似重複のクラスタを求めて一覧を出力する.
+--applyを指定した場合は、各クラスタで信頼度の最も高いBulletを残し、
+残りのBulletのhelpful/harmfulカウンターを合算して削除した上で保存する.
+
+Usage:
+    python src/scripts/find_duplicates.py --dataset jcommonsenseqa
+    python src/scripts/find_duplicates.py --dataset appworld --threshold 0.7 --apply
+"""
+
+import argparse
+import sys
+
+from dotenv import load_dotenv
+
+from src.common.config.settings import load_config
+from src.common.di.container import Container
+from src.common.lib.logging import getLogger
+from src.components.playbook_store.dedup import NearDuplicateIndex
+from src.components.playbook_store.models import Bullet, Playbook
+
+logger = getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    """コマンドライン引数をパースする."""
+    parser = argparse.ArgumentParser(description="Playbookの近似重複Bulletの検出・統合")
+    parser.add_argument("--dataset", required=True, help="データセット名")
+    parser.add_argument("--threshold", type=float, default=None, help="重複とみなす類似度の下限")
+    parser.add_argument("--apply", action="store_true", help="重複を統合してPlaybookを保存する")
+    return parser.parse_args()
+
+
+def merge_clusters(playbook: Playbook, clusters: list[list[str]]) -> int:
+    """各クラスタを信頼度の最も高いBullet1件に統合する.
+
+    Args:
+        playbook: 統合対象のPlaybook
+        clusters: 近似重複のBullet IDクラスタのリスト
+
+    Returns:
+        削除したBullet数
+    """
+    bullets = {bullet.id: bullet for bullet in playbook.bullets}
+    removed: set[str] = set()
+    for cluster in clusters:
+        members = [bullets[bullet_id] for bullet_id in cluster]
+        keeper = max(members, key=lambda b: (b.helpful - b.harmful, b.confidence_score))
+        for bullet in members:
+            if bullet is keeper:
+                continue
+            keeper.helpful += bullet.helpful
+            keeper.harmful += bullet.harmful
+            removed.add(bullet.id)
+    playbook.bullets = [bullet for bullet in playbook.bullets if bullet.id not in removed]
+    return len(removed)
+
+
+def _preview(bullet: Bullet) -> str:
+    """ログ出力用にBullet本文を短縮する."""
+    return bullet.content if len(bullet.content) <= 80 else f"{bullet.content[:77]}..."  # noqa: PLR2004
+
+
+def main() -> None:
+    """近似重複のクラスタを出力し、指定があれば統合して保存する."""
+    load_dotenv()
+    args = parse_args()
+    config = load_config()
+    container = Container()
+    container.config.from_dict(config.model_dump())
+
+    try:
+        playbook_store = container.playbook_store()
+        playbook = playbook_store.load(args.dataset)
+        # CuratorのADD重複判定が無効（閾値未設定）でも、検出にはインデックスの既定の閾値を使う
+        duplicate_index = container.duplicate_index() or NearDuplicateIndex(
+            num_perm=config.playbook.dedup_num_perm,
+            bands=config.playbook.dedup_bands,
+        )
+        duplicate_index.sync(playbook.bullets)
+        clusters = duplicate_index.duplicate_clusters(args.threshold)
+
+        bullets = {bullet.id: bullet for bullet in playbook.bullets}
+        for cluster in clusters:
+            logger.info("Cluster of %d bullets:", len(cluster))
+            for bullet_id in cluster:
+                logger.info("  [%s] %s", bullet_id, _preview(bullets[bullet_id]))
+        logger.info("Found %d clusters among %d bullets", len(clusters), len(playbook.bullets))
+
+        if args.apply and clusters:
+            removed = merge_clusters(playbook, clusters)
+            playbook_store.save(args.dataset, playbook)
+            logger.info("Merged %d duplicate bullets, %d bullets remain", removed, len(playbook.bullets))
+    except Exception:
+        logger.exception("Failed to find duplicates")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
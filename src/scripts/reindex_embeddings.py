@@ -0,0 +1,50 @@
+"""PlaybookのBullet embeddingを一括で再生成するスクリプト.
+
+embeddingモデルの変更やPlaybookの取り込み後に、全Bulletのembeddingを
+チャンク分割・並行実行で生成してサイドカーファイルに保存する.
+生成済みのembeddingはディスクキャッシュに残るため、途中で失敗しても再実行で続きから再開する.
+
+Usage:
+    python src/scripts/reindex_embeddings.py --dataset jcommonsenseqa
+    EMBEDDING_BULK_MAX_CONCURRENCY=8 python src/scripts/reindex_embeddings.py --dataset appworld
+"""
+
+import argparse
+import sys
+
+from dotenv import load_dotenv
+
+from src.common.config.settings import load_config
+from src.common.di.container import Container
+from src.common.lib.logging import getLogger
+
+logger = getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    """コマンドライン引数をパースする."""
+    parser = argparse.ArgumentParser(description="Playbook embeddingの一括再生成")
+    parser.add_argument("--dataset", required=True, help="データセット名")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """PlaybookのBullet embeddingを再生成してサイドカーファイルに保存する."""
+    load_dotenv()
+    args = parse_args()
+    container = Container()
+    container.config.from_dict(load_config().model_dump())
+
+    try:
+        playbook_store = container.playbook_store()
+        playbook = playbook_store.load(args.dataset)
+        logger.info("Reindexing %d bullets for dataset '%s'", len(playbook.bullets), args.dataset)
+        container.hybrid_search().save_embeddings(playbook_store.embeddings_path(args.dataset), playbook)
+        logger.info("Saved embeddings to %s", playbook_store.embeddings_path(args.dataset))
+    except Exception:
+        logger.exception("Failed to reindex embeddings")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
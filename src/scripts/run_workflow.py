@@ -12,6 +12,9 @@ Usage:
     # 件数指定
     python src/scripts/run_workflow.py --mode infer --limit 10
 
+    # 複数データセットのPlaybookを横断検索して推論
+    python src/scripts/run_workflow.py --mode infer --datasets jcommonsenseqa appworld
+
     # ステージ別バッチ実行 (中間結果をファイルに保存)
     python src/scripts/run_workflow.py --mode batch-infer          # 全件推論 → infer.jsonl
     python src/scripts/run_workflow.py --mode batch-reflect        # infer.jsonl → reflect.jsonl
@@ -35,12 +38,16 @@ from src.common.defs.trajectory import Trajectory
 from src.common.di.container import Container
 from src.common.lib.logging import getLogger
 from src.components.dataset_loader.models import QuestionRecord
+from src.components.hybrid_search.models import SearchResult
+from src.components.hybrid_search.profiling import SEARCH_METRICS
+from src.components.playbook_store.cached_store import CachedPlaybookStore
 
 logger = getLogger(__name__)
 
 DATASET = "jcommonsenseqa"
 DATA_PATH = Path("data/datasets/jcommonsenseqa/train.jsonl")
 DEFAULT_LIMIT = 5
+SEARCH_CHUNK_SIZE = 256
 
 RESULTS_DIR = Path("data/results/jcommonsenseqa")
 INFER_OUTPUT = RESULTS_DIR / "infer.jsonl"
@@ -67,6 +74,12 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help=f"処理する問題数 (infer/fullのdefault: {DEFAULT_LIMIT}, batch系: 全件)",
     )
+    parser.add_argument(
+        "--datasets",
+        nargs="+",
+        default=None,
+        help=f"関連知識を横断検索するPlaybookのデータセット名 (複数指定可, default: {DATASET}のみ)",
+    )
     return parser.parse_args()
 
 
@@ -90,10 +103,14 @@ def load_questions(path: Path, limit: int | None = None) -> list[QuestionRecord]
     return records
 
 
-def generate(generator: GeneratorAgent, record: QuestionRecord) -> Trajectory:
-    """GeneratorAgentでクエリから回答を生成する."""
+def generate(
+    generator: GeneratorAgent,
+    record: QuestionRecord,
+    search_results: list[SearchResult] | None = None,
+) -> Trajectory:
+    """GeneratorAgentでクエリから回答を生成する. search_results指定時は検索をスキップする."""
     query = record.to_query()
-    return generator.run(query, DATASET)
+    return generator.run(query, DATASET, search_results=search_results)
 
 
 def judge_answer(trajectory: Trajectory, record: QuestionRecord) -> bool:
@@ -245,14 +262,36 @@ def run_full(
     return is_correct
 
 
+def search_chunk(
+    generator: GeneratorAgent,
+    records: list[QuestionRecord],
+) -> list[list[SearchResult] | None]:
+    """複数の質問の関連Bulletをまとめて検索する. 失敗した場合は質問ごとの検索に任せる."""
+    try:
+        return generator.search_many([r.to_query() for r in records], DATASET)
+    except Exception:
+        logger.exception("Batch search failed; falling back to per-question search")
+        return [None] * len(records)
+
+
 def run_batch_infer(
     questions: list[QuestionRecord],
     generator: GeneratorAgent,
 ) -> None:
-    """全件推論してinfer.jsonlに保存する."""
+    """全件推論してinfer.jsonlに保存する. 検索はSEARCH_CHUNK_SIZE件ずつまとめて先に実行する."""
     results: list[dict] = []
     correct_count = 0
+    chunk_results: list[list[SearchResult] | None] = []
     for i, record in enumerate(questions, 1):
+        offset = (i - 1) % SEARCH_CHUNK_SIZE
+        if offset == 0:
+            chunk_results = search_chunk(generator, questions[i - 1 : i - 1 + SEARCH_CHUNK_SIZE])
+            logger.info(
+                "Retrieved playbook context for %d / %d questions",
+                i - 1 + len(chunk_results),
+                len(questions),
+            )
+        search_results = chunk_results[offset]
         logger.info(
             "=== [%d/%d] q_id=%s: %s ===",
             i,
@@ -260,7 +299,7 @@ def run_batch_infer(
             record.q_id,
             record.question[:50],
         )
-        trajectory = generate(generator, record)
+        trajectory = generate(generator, record, search_results)
         if trajectory.status == "failure":
             logger.error("  Generation failed: %s", trajectory.error_message)
             is_correct = False
@@ -359,6 +398,32 @@ def print_summary(results: list[bool]) -> None:
     logger.info("=" * 60)
     logger.info("Results: %d / %d correct (%.1f%%)", correct, total, accuracy)
     logger.info("=" * 60)
+    log_search_metrics()
+
+
+def log_store_metrics(container: Container) -> None:
+    """Playbookキャッシュのヒット数・ミス数をログ出力する."""
+    playbook_store = container.playbook_store()
+    if isinstance(playbook_store, CachedPlaybookStore):
+        logger.info("Playbook cache: %s", playbook_store.stats())
+
+
+def log_search_metrics() -> None:
+    """検索のステージ別処理時間と候補数の集計をログ出力する."""
+    metrics = SEARCH_METRICS.snapshot()
+    if not metrics["searches"]:
+        return
+    logger.info("Search metrics: %d searches", metrics["searches"])
+    for name, stats in metrics["stages"].items():
+        logger.info(
+            "  %-18s mean %8.2f ms  max %8.2f ms  total %10.1f ms",
+            name,
+            stats["mean_ms"],
+            stats["max_ms"],
+            stats["total_ms"],
+        )
+    for name, stats in metrics["candidates"].items():
+        logger.info("  %-18s %10.1f per query", name, stats["mean_per_query"])
 
 
 def main() -> None:
@@ -374,7 +439,7 @@ def main() -> None:
             questions = load_questions(DATA_PATH, limit)
             logger.info("Loaded %d questions from %s", len(questions), DATA_PATH)
 
-            generator = container.generator_agent()
+            generator = container.generator_agent(search_datasets=args.datasets)
             reflector = container.reflector_agent() if args.mode == "full" else None
             curator = container.curator_agent() if args.mode == "full" else None
 
@@ -396,6 +461,7 @@ def main() -> None:
                 results.append(is_correct)
 
             print_summary(results)
+            log_store_metrics(container)
 
         elif args.mode == "batch-infer":
             questions = load_questions(DATA_PATH, args.limit)
@@ -403,8 +469,9 @@ def main() -> None:
                 "Mode: batch-infer, Questions: %d",
                 len(questions),
             )
-            generator = container.generator_agent()
+            generator = container.generator_agent(search_datasets=args.datasets)
             run_batch_infer(questions, generator)
+            log_search_metrics()
 
         elif args.mode == "batch-reflect":
             logger.info("Mode: batch-reflect")
@@ -49,6 +49,8 @@ def _verify_playbook_store(playbook_store: PlaybookStore) -> Playbook:
     """PlaybookStoreの保存・読み込みを検証する."""
     logger.info("3. サンプルPlaybookの作成と保存...")
     sample_playbook = _create_sample_playbook()
+    # 前回の検証で保存したPlaybookを上書きするため、保存済みのバージョンを引き継ぐ
+    sample_playbook.metadata.version = playbook_store.load(TEST_DATASET).metadata.version
     playbook_store.save(TEST_DATASET, sample_playbook)
     logger.info("   サンプルPlaybookを保存しました ✓")
 
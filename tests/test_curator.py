@@ -0,0 +1,150 @@
+"""CuratorAgentのテスト."""
+
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.application.agents.curator import CuratorAgent
+from src.application.agents.generator import GenerationResponse, GeneratorAgent
+from src.common.defs.curation import DeltasResponse
+from src.common.defs.insight import BulletEvaluation, Insight, ReflectionResult
+from src.components.hybrid_search.embedding_client import EmbeddingClient
+from src.components.hybrid_search.search import HybridSearch
+from src.components.hybrid_search.sharded_search import ShardedSearch
+from src.components.playbook_store.cached_store import CachedPlaybookStore
+from src.components.playbook_store.dedup import NearDuplicateIndex
+from src.components.playbook_store.models import Bullet, DeltaContextItem, Playbook
+from src.components.playbook_store.store import PlaybookStore
+
+
+class ConflictingStore(PlaybookStore):
+    """最初の保存の直前に、他の書き込みがBulletを追加したことにするテスト用ストア."""
+
+    conflicts = 0
+
+    def save(self, dataset: str, playbook: Playbook) -> None:
+        if self.conflicts:
+            self.conflicts -= 1
+            other = self.load(dataset)
+            other.bullets.append(_bullet(f"other{self.conflicts}", f"written by another curator {self.conflicts}"))
+            super().save(dataset, other)
+        super().save(dataset, playbook)
+
+
+def _bullet(bullet_id: str, text: str) -> Bullet:
+    return Bullet(id=bullet_id, section="general", content=text, searchable_text=text)
+
+
+def _reflection(evaluations: list[tuple[str, str]]) -> ReflectionResult:
+    insight = Insight(
+        reasoning="r",
+        error_identification="e",
+        root_cause_analysis="c",
+        correct_approach="a",
+        key_insight="k",
+    )
+    return ReflectionResult(
+        insights=[insight],
+        bullet_evaluations=[BulletEvaluation(bullet_id=i, tag=tag, reason="") for i, tag in evaluations],
+        trajectory_query="q",
+        trajectory_dataset="ds",
+    )
+
+
+@pytest.mark.parametrize("conflicts", [0, 1, 2])
+def test_retried_update_applies_indexes_once(tmp_path: Path, conflicts: int) -> None:
+    """競合で更新をやり直しても、検索インデックスと重複インデックスには保存した試行の変更だけが反映される."""
+    store = ConflictingStore(str(tmp_path))
+    store.save("ds", Playbook(bullets=[_bullet("a", "apple pie recipe"), _bullet("b", "banana bread recipe")]))
+    store.conflicts = conflicts
+    deltas = [
+        DeltaContextItem(type="ADD", section="general", content="cherry tart with fresh cream", reasoning=""),
+        DeltaContextItem(type="ADD", section="general", content="cherry tart with fresh cream!", reasoning=""),
+        DeltaContextItem(type="UPDATE", section="general", bullet_id="b", content="banana split", reasoning=""),
+    ]
+    llm_client = MagicMock()
+    llm_client.invoke_structured_with_template.return_value = DeltasResponse(deltas=deltas)
+    search = HybridSearch(EmbeddingClient(DeterministicFakeEmbedding(size=16)))
+    duplicate_index = NearDuplicateIndex()
+    curator = CuratorAgent(llm_client, MagicMock(), store, hybrid_search=search, duplicate_index=duplicate_index)
+    search.upsert_bullets(store.load("ds").bullets)
+    # サイドカー保存時の全体同期を除き、Curatorによるインデックスの差分更新だけを検証する
+    search.save_embeddings = MagicMock()
+
+    result = curator.run(_reflection([("a", "helpful"), ("b", "harmful")]), "ds")
+
+    playbook = store.load("ds")
+    assert result.bullets_after == len(playbook.bullets) == 3 + conflicts
+    added = [b.id for b in playbook.bullets if b.content.startswith("cherry")]
+    assert len(added) == 1
+    assert set(search.vector_index.ids) == {"a", "b", *added}
+    assert set(duplicate_index._signatures) == {b.id for b in playbook.bullets}  # noqa: SLF001
+    columns = {name: search.vector_index.column(name) for name in ("helpful", "harmful")}
+    rows = search.vector_index.id_to_row
+    assert (columns["helpful"][rows["a"]], columns["harmful"][rows["b"]]) == (1, 1)
+
+
+def test_update_does_not_leak_into_other_dataset_index(tmp_path: Path) -> None:
+    """あるデータセットの更新は、同じShardedSearchで検索中の別のデータセットのインデックスに混ざらない."""
+    store = CachedPlaybookStore(str(tmp_path))
+    store.save("a", Playbook(bullets=[_bullet("a1", "apple pie recipe")]))
+    store.save("b", Playbook(bullets=[_bullet("b1", "banana bread recipe")]))
+    client = EmbeddingClient(DeterministicFakeEmbedding(size=16))
+    sharded = ShardedSearch(lambda: HybridSearch(client), store, max_workers=1)
+    llm_client = MagicMock()
+    llm_client.invoke_structured_with_template.side_effect = [
+        GenerationResponse(reasoning="r", answer="x"),
+        DeltasResponse(deltas=[DeltaContextItem(type="ADD", section="general", content="apple pie", reasoning="")]),
+        GenerationResponse(reasoning="r", answer="x"),
+    ]
+    generator = GeneratorAgent(store, HybridSearch(client), llm_client, MagicMock(), sharded_search=sharded)
+    curator = CuratorAgent(llm_client, MagicMock(), store, sharded_search=sharded)
+
+    before = generator.run("apple pie", "a")
+    generation = sharded.shard("a")._generation  # noqa: SLF001
+    curator.run(_reflection([]), "b")
+    after = generator.run("apple pie", "a")
+    sharded.close()
+
+    assert before.used_bullet_ids == after.used_bullet_ids == ["a1"]
+    assert sharded.shard("a")._generation == generation  # noqa: SLF001
+    assert len(sharded.shard("b").vector_index) == len(store.load("b").bullets) == 2  # noqa: PLR2004
+
+
+@pytest.mark.parametrize(
+    ("duplicate_index", "expected_added", "expected_summary"),
+    [
+        (None, 3, "ADD: 3, UPDATE: 0, DELETE: 0"),
+        (NearDuplicateIndex(), 1, "ADD: 3, UPDATE: 0, DELETE: 0, SKIPPED_DUPLICATE_ADD: 2"),
+    ],
+)
+def test_near_duplicate_adds_are_skipped_only_when_enabled(
+    tmp_path: Path,
+    caplog: pytest.LogCaptureFixture,
+    duplicate_index: NearDuplicateIndex | None,
+    expected_added: int,
+    expected_summary: str,
+) -> None:
+    """近似重複の判定は重複インデックスを指定した場合だけ行い、スキップしたADDはログとサマリーに残す."""
+    store = PlaybookStore(str(tmp_path))
+    store.save("ds", Playbook(bullets=[_bullet("a", "apple pie recipe")]))
+    deltas = [
+        DeltaContextItem(type="ADD", section="general", content="cherry tart with fresh cream", reasoning=""),
+        DeltaContextItem(type="ADD", section="general", content="cherry tart with fresh cream!", reasoning=""),
+        DeltaContextItem(type="ADD", section="general", content="apple pie recipe.", reasoning=""),
+    ]
+    llm_client = MagicMock()
+    llm_client.invoke_structured_with_template.return_value = DeltasResponse(deltas=deltas)
+    curator = CuratorAgent(llm_client, MagicMock(), store, duplicate_index=duplicate_index)
+    new_pending_index = MagicMock(wraps=curator._new_pending_index)  # noqa: SLF001
+    curator._new_pending_index = new_pending_index  # noqa: SLF001
+
+    result = curator.run(_reflection([]), "ds")
+
+    assert result.bullets_after == 1 + expected_added
+    assert result.summary == expected_summary
+    assert new_pending_index.call_count == 1
+    skipped = [r for r in caplog.records if r.getMessage().startswith("Skipped ADD")]
+    assert len(skipped) == 3 - expected_added
@@ -0,0 +1,241 @@
+"""EmbeddingClientとEmbeddingCacheのテスト."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from src.components.hybrid_search.bulk_embedder import BulkEmbedder
+from src.components.hybrid_search.embedding_batcher import QueryEmbeddingBatcher
+from src.components.hybrid_search.embedding_cache import EmbeddingCache
+from src.components.hybrid_search.embedding_client import EmbeddingClient
+from src.components.hybrid_search.local_embeddings import LOCAL_HASHING_MODEL, HashingEmbeddings, create_embedding_model
+
+
+class CountingEmbeddings(Embeddings):
+    """呼び出されたテキストを記録するテスト用Embeddings."""
+
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+@pytest.mark.parametrize(
+    ("first", "second", "expected_second_call"),
+    [
+        (["a", "bb"], ["a", "bb"], None),
+        (["a", "bb"], ["bb", "ccc", "ccc"], ["ccc"]),
+    ],
+)
+def test_embed_documents_uses_disk_cache(
+    tmp_path: Path,
+    first: list[str],
+    second: list[str],
+    expected_second_call: list[str] | None,
+) -> None:
+    """キャッシュ済みのテキストはモデルに問い合わせず、プロセスを跨いでも再利用される."""
+    model = CountingEmbeddings()
+    client = EmbeddingClient(model, cache=EmbeddingCache(str(tmp_path)), model_name="m")
+    client.embed_documents(first)
+
+    reloaded = EmbeddingClient(model, cache=EmbeddingCache(str(tmp_path)), model_name="m")
+    vectors = reloaded.embed_documents(second)
+
+    assert vectors == [[float(len(t)), 1.0, 0.0] for t in second]
+    assert model.calls[1:] == ([expected_second_call] if expected_second_call else [])
+
+
+def test_cache_is_keyed_by_model(tmp_path: Path) -> None:
+    """モデル名が異なる場合はキャッシュを共有しない."""
+    model = CountingEmbeddings()
+    cache = EmbeddingCache(str(tmp_path))
+    EmbeddingClient(model, cache=cache, model_name="m1").embed_documents(["a"])
+    EmbeddingClient(model, cache=cache, model_name="m2").embed_documents(["a"])
+
+    assert model.calls == [["a"], ["a"]]
+
+
+@pytest.mark.parametrize("shared", [True, False])
+def test_cache_concurrent_put_many_keeps_keys_aligned(tmp_path: Path, shared: bool) -> None:  # noqa: FBT001
+    """複数スレッド・複数インスタンスから同時に追記しても、読み込み直したキーとベクトルが対応する."""
+    caches = [EmbeddingCache(str(tmp_path))] if shared else [EmbeddingCache(str(tmp_path)) for _ in range(8)]
+
+    def put(worker: int) -> None:
+        cache = caches[worker % len(caches)]
+        for batch in range(50):
+            texts = [f"w{worker}-b{batch}-{i}" for i in range(20)]
+            cache.put_many("m", texts, [[float(worker), float(batch), float(i)] for i in range(20)])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(put, range(8)))
+
+    reloaded = EmbeddingCache(str(tmp_path))
+    for worker in range(8):
+        for batch in range(50):
+            texts = [f"w{worker}-b{batch}-{i}" for i in range(20)]
+            vectors = reloaded.get_many("m", texts)
+            assert [v.tolist() if v is not None else None for v in vectors] == [
+                [float(worker), float(batch), float(i)] for i in range(20)
+            ]
+
+
+def test_cache_appends_after_interrupted_write(tmp_path: Path) -> None:
+    """ベクトルだけ書き込まれて中断された追記の後でも、次の追記のキーとベクトルがずれない."""
+    cache = EmbeddingCache(str(tmp_path))
+    cache.put_many("m", ["a"], [[1.0, 1.0]])
+    with (tmp_path / "m" / "vectors.f32").open("ab") as f:
+        f.write(np.asarray([9.0, 9.0], dtype=np.float32).tobytes())
+
+    cache.put_many("m", ["b"], [[2.0, 2.0]])
+
+    vectors = EmbeddingCache(str(tmp_path)).get_many("m", ["a", "b"])
+    assert [v.tolist() for v in vectors if v is not None] == [[1.0, 1.0], [2.0, 2.0]]
+
+
+@pytest.mark.parametrize(
+    ("queries", "expected_calls", "expected_hits"),
+    [
+        (["q1", "q1"], [["q1"]], 1),
+        (["q1", " q1  ", "ｑ１"], [["q1"]], 2),
+        (["q1", "q2", "q3", "q1"], [["q1"], ["q2"], ["q3"], ["q1"]], 0),
+    ],
+)
+def test_embed_query_lru_cache(queries: list[str], expected_calls: list[list[str]], expected_hits: int) -> None:
+    """正規化後に同じクエリはLRUキャッシュから返し、上限を超えた古いクエリは追い出す."""
+    model = CountingEmbeddings()
+    client = EmbeddingClient(model, model_name="m", query_cache_size=2)
+    for query in queries:
+        client.embed_query(query)
+
+    assert model.calls == expected_calls
+    assert client.query_cache_stats()["hits"] == expected_hits
+    assert client.query_cache_stats()["misses"] == len(queries) - expected_hits
+
+
+def test_query_cache_persists_between_runs(tmp_path: Path) -> None:
+    """persist_queries有効時はクエリembeddingがディスク経由で次回実行に引き継がれる."""
+    model = CountingEmbeddings()
+    first = EmbeddingClient(model, cache=EmbeddingCache(str(tmp_path)), model_name="m", persist_queries=True)
+    first.embed_queries(["q1", "q2"])
+
+    second = EmbeddingClient(model, cache=EmbeddingCache(str(tmp_path)), model_name="m", persist_queries=True)
+    vectors = second.embed_queries(["q2", "q3"])
+
+    assert vectors == [[2.0, 1.0, 0.0], [2.0, 1.0, 0.0]]
+    assert model.calls == [["q1"], ["q2"], ["q3"]]
+    assert second.query_cache_stats() == {"hits": 1, "misses": 1, "size": 2}
+
+
+def test_embed_queries_uses_query_embeddings() -> None:
+    """embed_queriesはクエリ用のembeddingを生成し、embed_queryとキャッシュを共有しても結果が一致する."""
+
+    class AsymmetricEmbeddings(CountingEmbeddings):
+        def embed_query(self, text: str) -> list[float]:
+            return [0.0, 0.0, float(len(text))]
+
+    batch_first = EmbeddingClient(AsymmetricEmbeddings(), model_name="m")
+    single_first = EmbeddingClient(AsymmetricEmbeddings(), model_name="m")
+
+    assert batch_first.embed_queries(["q1", "q22"]) == [[0.0, 0.0, 2.0], [0.0, 0.0, 3.0]]
+    assert batch_first.embed_query("q1") == single_first.embed_query("q1")
+    assert batch_first.model.calls == []
+
+
+@pytest.mark.parametrize(
+    ("max_batch_size", "expected_batches"),
+    [
+        (16, [["q0", "q1", "q2", "q3", "q4"]]),
+        (2, [["q0", "q1"], ["q2", "q3"], ["q4"]]),
+    ],
+)
+def test_batcher_coalesces_concurrent_queries(max_batch_size: int, expected_batches: list[list[str]]) -> None:
+    """並行するクエリは上限件数ごとに1回のリクエストにまとめられ、各呼び出し元に自身のベクトルを返す."""
+    model = CountingEmbeddings()
+    batcher = QueryEmbeddingBatcher(model, max_batch_size=max_batch_size, max_wait_ms=50)
+    client = EmbeddingClient(model, model_name="m", batcher=batcher)
+    queries = [f"q{i}" for i in range(5)]
+
+    async def run() -> list[list[float]]:
+        return await asyncio.gather(*(client.aembed_query(q) for q in queries))
+
+    vectors = asyncio.run(run())
+    batcher.close()
+
+    assert vectors == [[2.0, 1.0, 0.0]] * len(queries)
+    assert sorted(model.calls) == expected_batches
+    assert client.embed_query("q0") == [2.0, 1.0, 0.0]
+    assert len(model.calls) == len(expected_batches)
+
+
+@pytest.mark.parametrize("dimension", [8, 64])
+def test_hashing_embeddings_are_deterministic(dimension: int) -> None:
+    """ローカルモデルは同じテキストに同じ正規化済みベクトルを返し、トークンを共有するテキストほど近い."""
+    model = create_embedding_model(LOCAL_HASHING_MODEL, dimension=dimension)
+    vectors = np.array(model.embed_documents(["富士山に登る", "富士山に登る", "富士山の天気", "zzz qqq"]))
+
+    assert isinstance(model, HashingEmbeddings)
+    assert vectors.shape == (4, dimension)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert np.array_equal(vectors[0], vectors[1])
+    assert vectors[0] @ vectors[2] > vectors[0] @ vectors[3]
+
+
+class FlakyEmbeddings(CountingEmbeddings):
+    """指定したテキストを含むリクエストを指定回数だけ失敗させるテスト用Embeddings."""
+
+    def __init__(self, failing_text: str, failures: int) -> None:
+        super().__init__()
+        self.failing_text = failing_text
+        self.failures = failures
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.failing_text in texts and self.failures > 0:
+            self.failures -= 1
+            msg = "transient error"
+            raise RuntimeError(msg)
+        return super().embed_documents(texts)
+
+
+@pytest.mark.parametrize(("failures", "succeeds"), [(0, True), (2, True), (3, False)])
+def test_bulk_embedding_retries_failed_chunks(tmp_path: Path, failures: int, succeeds: bool) -> None:  # noqa: FBT001
+    """チャンクは上限件数ごとに送られ、失敗したチャンクだけが再試行され、成功したチャンクはキャッシュに残る."""
+    model = FlakyEmbeddings("t3", failures)
+    bulk = BulkEmbedder(max_chunk_size=2, max_concurrency=2, max_retries=2, retry_backoff=0)
+    client = EmbeddingClient(model, cache=EmbeddingCache(str(tmp_path)), model_name="m", bulk_embedder=bulk)
+    texts = [f"t{i}" for i in range(5)]
+    progress: list[tuple[int, int]] = []
+
+    if succeeds:
+        vectors = client.embed_documents(texts, on_progress=lambda done, total: progress.append((done, total)))
+        assert vectors == [[2.0, 1.0, 0.0]] * len(texts)
+        assert progress[-1] == (5, 5)
+    else:
+        with pytest.raises(RuntimeError):
+            client.embed_documents(texts)
+    assert sorted(model.calls) == ([["t0", "t1"], ["t2", "t3"], ["t4"]] if succeeds else [["t0", "t1"], ["t4"]])
+    cached = EmbeddingCache(str(tmp_path)).get_many("m", texts)
+    assert [vector is not None for vector in cached] == [True, True, succeeds, succeeds, True]
+
+
+@pytest.mark.parametrize(
+    ("texts", "max_chunk_tokens", "expected"),
+    [
+        (["a" * 40] * 4, 25, [2, 2]),
+        (["日本語のテキスト"] * 3, 10, [1, 1, 1]),
+        (["x" * 400, "y"], 10, [1, 1]),
+    ],
+)
+def test_bulk_embedder_chunks_by_token_budget(texts: list[str], max_chunk_tokens: int, expected: list[int]) -> None:
+    """チャンクは概算トークン数の上限で区切られ、上限を単独で超えるテキストは1件のチャンクになる."""
+    chunks = BulkEmbedder(max_chunk_tokens=max_chunk_tokens).chunk(texts)
+    assert [len(chunk) for chunk in chunks] == expected
+    assert [text for chunk in chunks for text in chunk] == texts
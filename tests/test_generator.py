@@ -0,0 +1,57 @@
+"""GeneratorAgentのテスト."""
+
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.application.agents.generator import GenerationResponse, GeneratorAgent
+from src.components.hybrid_search.embedding_client import EmbeddingClient
+from src.components.hybrid_search.search import HybridSearch
+from src.components.hybrid_search.sharded_search import ShardedSearch
+from src.components.playbook_store.models import Bullet, Playbook
+from src.components.playbook_store.store import PlaybookStore
+
+
+def _bullet(bullet_id: str, text: str) -> Bullet:
+    return Bullet(id=bullet_id, section="general", content=text, searchable_text=text)
+
+
+@pytest.mark.parametrize(
+    ("search_datasets", "expected_ids"),
+    [
+        (None, {"l1", "l2"}),
+        (["left", "right"], {"l1", "l2", "r1"}),
+        (["right"], {"r1"}),
+    ],
+)
+def test_generator_searches_across_datasets(
+    tmp_path: Path,
+    search_datasets: list[str] | None,
+    expected_ids: set[str],
+) -> None:
+    """search_datasetsを指定した場合、実行対象のデータセットではなく指定したデータセットを横断検索する."""
+    store = PlaybookStore(str(tmp_path))
+    store.save("left", Playbook(bullets=[_bullet("l1", "apple pie"), _bullet("l2", "banana bread")]))
+    store.save("right", Playbook(bullets=[_bullet("r1", "apple juice")]))
+    client = EmbeddingClient(DeterministicFakeEmbedding(size=16))
+    sharded = ShardedSearch(lambda: HybridSearch(client), store, max_workers=2)
+    llm_client = MagicMock()
+    llm_client.invoke_structured_with_template.return_value = GenerationResponse(reasoning="r", answer="a")
+    generator = GeneratorAgent(
+        store,
+        HybridSearch(client),
+        llm_client,
+        MagicMock(),
+        sharded_search=sharded,
+        search_datasets=search_datasets,
+    )
+
+    trajectory = generator.run("apple", "left")
+    batched = generator.search_many(["apple"], "left")
+    sharded.close()
+
+    assert trajectory.status == "success"
+    assert set(trajectory.used_bullet_ids) == expected_ids
+    assert {r.bullet.id for r in batched[0]} == expected_ids
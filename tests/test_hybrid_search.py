@@ -0,0 +1,621 @@
+"""HybridSearchと検索インデックスのテスト."""
+
+import asyncio
+import json
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.components.hybrid_search.ann_index import IVFIndex
+from src.components.hybrid_search.bm25_index import BM25Index
+from src.components.hybrid_search.embedding_client import EmbeddingClient
+from src.components.hybrid_search.embedding_store import EmbeddingStore
+from src.components.hybrid_search.fusion import FUSION_STRATEGIES
+from src.components.hybrid_search.local_embeddings import HashingEmbeddings
+from src.components.hybrid_search.models import SearchQuery
+from src.components.hybrid_search.profiling import SEARCH_METRICS
+from src.components.hybrid_search.reduction import PCAReducer, TruncationReducer
+from src.components.hybrid_search.result_cache import SearchResultCache
+from src.components.hybrid_search.search import HybridSearch
+from src.components.hybrid_search.sharded_search import ShardedSearch
+from src.components.hybrid_search.tokenizer import tokenize
+from src.components.hybrid_search.vector_index import VectorIndex
+from src.components.playbook_store.models import Bullet, Playbook
+from src.components.playbook_store.store import PlaybookStore
+
+
+def _bullet(bullet_id: str, text: str, section: str = "general") -> Bullet:
+    return Bullet(id=bullet_id, section=section, content=text, searchable_text=text)
+
+
+@pytest.fixture
+def search() -> HybridSearch:
+    return HybridSearch(EmbeddingClient(DeterministicFakeEmbedding(size=16)), alpha=0.0)
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("富士山に登る", ["富士", "士山", "に", "登", "る"]),
+        ("ｺﾝﾋﾟｭｰﾀ", ["コンピ", "ンピュ", "ピュー", "ュータ"]),
+        ("GPT-4 Café", ["gpt", "4", "café"]),
+        ("  、。!? ", []),
+    ],
+)
+def test_tokenize(text: str, expected: list[str]) -> None:
+    """文字種ごとにn-gram分割され、英数字は単語単位になる."""
+    assert tokenize(text) == expected
+
+
+def test_bm25_matches_japanese_text(search: HybridSearch) -> None:
+    """空白のない日本語でもBM25で関連するBulletが上位になる."""
+    playbook = Playbook(
+        bullets=[
+            _bullet("mountain", "日本で最も高い山は富士山である"),
+            _bullet("river", "日本で最も長い川は信濃川である"),
+        ]
+    )
+    results = search.search(SearchQuery(query_text="富士山の高さは?", top_k=1), playbook)
+
+    assert results[0].bullet.id == "mountain"
+
+
+@pytest.mark.parametrize(
+    ("removed", "query", "expected_top"),
+    [
+        (None, "apple banana", "a"),
+        ("a", "apple banana", "b"),
+        (None, "cherry", "c"),
+    ],
+)
+def test_bm25_index_incremental(removed: str | None, query: str, expected_top: str) -> None:
+    """追加・削除後のインデックスでクエリ語を多く含むドキュメントが上位になる."""
+    index = BM25Index()
+    index.add("a", "apple banana apple".split())
+    index.add("b", "banana split".split())
+    index.add("c", "cherry pie".split())
+    if removed:
+        index.remove(removed)
+
+    scores = index.score(query.split())
+
+    assert max(scores, key=scores.get) == expected_top
+    assert removed not in scores
+
+
+def test_bm25_index_replaces_document() -> None:
+    """同じIDで追加すると古いポスティングは削除される."""
+    index = BM25Index()
+    index.add("a", ["old"])
+    index.add("a", ["new"])
+
+    assert index.score(["old"]) == {}
+    assert set(index.score(["new"])) == {"a"}
+    assert len(index) == 1
+
+
+def test_bm25_index_matrix_matches_formula() -> None:
+    """CSR重み行列によるスコアがBM25の定義式と一致し、バッチでも同じ値になる."""
+    docs = {"a": "apple banana apple".split(), "b": "banana split".split(), "c": "cherry pie pie".split()}
+    index = BM25Index(k1=1.2, b=0.75)
+    for doc_id, tokens in docs.items():
+        index.add(doc_id, tokens)
+    index.remove("b")
+    index.add("b", "banana banana split".split())
+    docs["b"] = "banana banana split".split()
+    queries = [["banana", "apple", "apple"], ["pie", "unknown"], []]
+
+    avgdl = sum(len(t) for t in docs.values()) / len(docs)
+    for tokens, scores in zip(queries, index.score_matrix(queries), strict=True):
+        for doc_id, doc_tokens in docs.items():
+            expected = 0.0
+            for term in tokens:
+                tf = doc_tokens.count(term)
+                df = sum(term in t for t in docs.values())
+                if tf:
+                    idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                    expected += idf * tf * 2.2 / (tf + 1.2 * (1 - 0.75 + 0.75 * len(doc_tokens) / avgdl))
+            assert scores[index.doc_ids.index(doc_id)] == pytest.approx(expected, rel=1e-5)
+
+
+@pytest.mark.parametrize("removed", [["a"], ["c"], ["a", "b", "c"], ["missing"]])
+def test_vector_index_keeps_rows_aligned(removed: list[str]) -> None:
+    """削除・更新後も各IDの行が正規化済みの自身のベクトルを指す."""
+    vectors = {"a": [3.0, 4.0], "b": [0.0, 2.0], "c": [1.0, 0.0]}
+    index = VectorIndex(initial_capacity=1)
+    index.upsert(list(vectors), list(vectors.values()))
+    index.upsert(["b"], [[5.0, 0.0]])
+    vectors["b"] = [5.0, 0.0]
+    index.remove(removed)
+
+    remaining = [i for i in vectors if i not in removed]
+    assert sorted(index.ids) == remaining
+    for bullet_id in remaining:
+        expected = np.array(vectors[bullet_id]) / np.linalg.norm(vectors[bullet_id])
+        np.testing.assert_allclose(index.matrix[index.id_to_row[bullet_id]], expected, rtol=1e-6)
+
+
+@pytest.mark.parametrize(
+    ("scores", "k", "expected"),
+    [
+        ([0.1, 0.9, 0.5, 0.7], 2, [1, 3]),
+        ([0.1, 0.9, 0.5, 0.7], 10, [1, 3, 2, 0]),
+        ([0.5, 0.2, 0.5, 0.5], 2, [0, 2]),
+        ([0.3], 1, [0]),
+        ([0.0] * 1000, 3, [0, 1, 2]),
+        ([0.4, 0.5, 0.4, 0.9, 0.4, 0.4], 4, [3, 1, 0, 2]),
+    ],
+)
+def test_top_k_selects_highest_scores_in_order(scores: list[float], k: int, expected: list[int]) -> None:
+    """上位k件をスコア降順で返し、同点は元の順序を保つ."""
+    assert HybridSearch._top_k(np.array(scores), k).tolist() == expected
+
+
+def test_top_k_sorts_only_k_candidates_for_large_tie_groups() -> None:
+    """k件目と同点の要素が多くても、ソートする候補はk件に収まる."""
+    lexsort = np.lexsort
+    sizes: list[int] = []
+
+    def recording_lexsort(keys: tuple[np.ndarray, ...]) -> np.ndarray:
+        sizes.append(len(keys[0]))
+        return lexsort(keys)
+
+    scores = np.zeros(10000)
+    scores[[5, 500]] = 1.0
+    with patch.object(np, "lexsort", recording_lexsort):
+        top = HybridSearch._top_k(scores, 5)  # noqa: SLF001
+
+    assert top.tolist() == [5, 500, 0, 1, 2]
+    assert sizes == [5]
+
+
+@pytest.mark.parametrize(
+    ("fusion", "expected"),
+    [
+        ("linear", [0.75, 0.75, 0.0]),
+        ("rrf", [0.5 / 62 + 0.5 / 61, 0.5 / 61 + 0.5 / 62, 0.5 / 63]),
+        ("zscore", [0.612372436, 0.612372436, -1.224744871]),
+    ],
+)
+def test_fusion_strategies(fusion: str, expected: list[float]) -> None:
+    """各スコア融合戦略が候補のスコア配列をまとめて統合する. BM25スコア0はRRFの順位に含めない."""
+    vector_scores = np.array([0.5, 0.9, 0.1])
+    bm25_scores = np.array([2.0, 1.0, 0.0])
+    combined = FUSION_STRATEGIES[fusion](vector_scores, bm25_scores, 0.5, 60)
+    assert np.allclose(combined, expected)
+
+
+def test_search_syncs_index_with_playbook(search: HybridSearch) -> None:
+    """Playbookの追加・更新・削除が検索のたびに反映される."""
+    playbook = Playbook(bullets=[_bullet("a", "apple pie"), _bullet("b", "banana bread")])
+    query = SearchQuery(query_text="cherry", top_k=1)
+    search.search(query, playbook)
+
+    playbook.bullets[1].searchable_text = "cherry tart"
+    playbook.bullets.append(_bullet("c", "cherry cherry cherry"))
+    results = search.search(query, playbook)
+    assert results[0].bullet.id == "c"
+
+    playbook.bullets = [b for b in playbook.bullets if b.id != "c"]
+    results = search.search(query, playbook)
+    assert results[0].bullet.id == "b"
+    assert "c" not in search.bm25_index
+
+
+def test_search_skips_sync_for_unchanged_playbook(search: HybridSearch, monkeypatch: pytest.MonkeyPatch) -> None:
+    """同じPlaybookへの再検索では属性列を書き直さず、読み込み直したPlaybookは差分だけ反映する."""
+    playbook = Playbook(bullets=[_bullet("a", "apple pie"), _bullet("b", "banana bread")])
+    query = SearchQuery(query_text="apple", top_k=2)
+    search.search(query, playbook)
+
+    written: list[list[str]] = []
+    write_attributes = search._write_attributes  # noqa: SLF001
+
+    def record(bullets: list[Bullet]) -> None:
+        written.append([b.id for b in bullets])
+        write_attributes(bullets)
+
+    monkeypatch.setattr(search, "_write_attributes", record)
+    search.search(query, playbook)
+    assert written == []
+
+    reloaded = playbook.model_copy(deep=True)
+    reloaded.metadata.version += 1
+    reloaded.bullets[0].helpful = 5
+    results = search.search(query, reloaded)
+    assert written == [["a", "b"]]
+    assert results[0].bullet.helpful == 5  # noqa: PLR2004
+
+
+def test_generation_only_advances_on_index_changes(search: HybridSearch) -> None:
+    """削除対象が無い削除や、重複IDを含む変化の無いPlaybookの同期ではインデックスの世代が進まない."""
+    playbook = Playbook(bullets=[_bullet("a", "apple pie"), _bullet("b", "banana bread"), _bullet("a", "apple pie")])
+    query = SearchQuery(query_text="apple", top_k=2)
+    search.search(query, playbook)
+    generation = search._generation  # noqa: SLF001
+
+    search.remove_bullets([])
+    search.remove_bullets(["unknown"])
+    search.increment_counters("a")
+    search.search(query, playbook)
+    search.search(query, playbook.model_copy(deep=True))
+    assert search._generation == generation  # noqa: SLF001
+
+    search.remove_bullets(["b", "b"])
+    assert search._generation == generation + 1  # noqa: SLF001
+
+
+@pytest.mark.parametrize(
+    ("section_filter", "min_confidence", "expected"),
+    [
+        (None, 0.0, {"a", "b", "c", "d"}),
+        (["tips"], 0.0, {"b", "d"}),
+        (None, 0.6, {"a", "d"}),
+        (["tips", "unknown"], 0.6, {"d"}),
+    ],
+)
+def test_search_filters_by_section_and_confidence(
+    search: HybridSearch,
+    section_filter: list[str] | None,
+    min_confidence: float,
+    expected: set[str],
+) -> None:
+    """セクションと信頼度の条件は削除・カウンター更新後も行マスクとして正しく適用される."""
+    playbook = Playbook(
+        bullets=[
+            _bullet("a", "apple"),
+            _bullet("b", "banana", section="tips"),
+            _bullet("c", "cherry"),
+            _bullet("d", "durian", section="tips"),
+            _bullet("e", "elderberry", section="tips"),
+        ]
+    )
+    playbook.bullets[0].helpful = 1
+    playbook.bullets[2].harmful = 1
+    search.search(SearchQuery(query_text="fruit"), playbook)
+    playbook.bullets = [b for b in playbook.bullets if b.id != "e"]
+    search.remove_bullets(["e"])
+    playbook.bullets[3].helpful = 2
+    search.increment_counters("d", helpful=2)
+    search.increment_counters("missing", helpful=1)
+
+    assert search.vector_index.column("confidence")[search.vector_index.id_to_row["d"]] == 1.0
+
+    query = SearchQuery(query_text="fruit", top_k=10, section_filter=section_filter, min_confidence=min_confidence)
+    results = search.search(query, playbook)
+    assert {r.bullet.id for r in results} == expected
+
+
+def test_concurrent_searches_share_index(search: HybridSearch) -> None:
+    """複数スレッドから異なるPlaybookを交互に検索しても、逐次実行と同じ結果になる."""
+    playbooks = [
+        Playbook(bullets=[_bullet(f"{name}{i}", f"{name} topic{i} note") for i in range(50)])
+        for name in ("left", "right")
+    ]
+    queries = [SearchQuery(query_text=f"topic{i} note", top_k=3) for i in range(20)]
+
+    def run(worker: int) -> list[list[str]]:
+        return [[r.bullet.id for r in search.search(q, playbooks[worker % 2])] for q in queries]
+
+    expected = [run(0), run(1)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(run, range(16)))
+    assert results == [expected[i % 2] for i in range(16)]
+
+
+def test_asearch_scores_off_the_event_loop(search: HybridSearch) -> None:
+    """asearchはインデックス同期とスコア計算をイベントループのスレッド外で行い、searchと同じ結果を返す."""
+    playbook = Playbook(bullets=[_bullet(f"b{i}", f"topic{i} note") for i in range(20)])
+    query = SearchQuery(query_text="topic3 note", top_k=3)
+    threads: list[int] = []
+    sync_index, rank = search._sync_index, search._rank  # noqa: SLF001
+
+    def record(method: object) -> object:
+        def wrapper(*args: object) -> object:
+            threads.append(threading.get_ident())
+            return method(*args)
+
+        return wrapper
+
+    with patch.object(search, "_sync_index", record(sync_index)), patch.object(search, "_rank", record(rank)):
+        results = asyncio.run(search.asearch(query, playbook))
+
+    assert [r.bullet.id for r in results] == [r.bullet.id for r in search.search(query, playbook)]
+    assert threads
+    assert threading.get_ident() not in threads
+
+
+@pytest.mark.parametrize("max_batch_queries", [1, 2, 256])
+def test_search_many_matches_single_search(search: HybridSearch, max_batch_queries: int) -> None:
+    """search_manyの結果は、クエリを分けて計算する場合も含めクエリごとのsearchと一致する."""
+    search.alpha = 0.5
+    playbook = Playbook(
+        bullets=[
+            _bullet("a", "apple pie", section="food"),
+            _bullet("b", "banana bread", section="food"),
+            _bullet("c", "cherry tart", section="dessert"),
+        ]
+    )
+    queries = [
+        SearchQuery(query_text="apple", top_k=2),
+        SearchQuery(query_text="cherry banana", top_k=3),
+        SearchQuery(query_text="banana", top_k=3, section_filter=["dessert"]),
+    ]
+
+    with patch("src.components.hybrid_search.search._MAX_BATCH_QUERIES", max_batch_queries):
+        batched = search.search_many(queries, playbook)
+    single = [search.search(q, playbook) for q in queries]
+
+    assert [[r.bullet.id for r in rs] for rs in batched] == [[r.bullet.id for r in rs] for rs in single]
+    for batch_results, single_results in zip(batched, single, strict=True):
+        for b, s in zip(batch_results, single_results, strict=True):
+            assert b.combined_score == pytest.approx(s.combined_score, abs=1e-6)
+
+
+@pytest.mark.parametrize("n_probe", [1, 3])
+def test_ivf_probe_contains_own_cluster(n_probe: int) -> None:
+    """登録済みベクトルをクエリにすると、自身の属するクラスタが必ず走査される."""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 8)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [str(i) for i in range(len(vectors))]
+    index = IVFIndex(n_lists=8, n_probe=n_probe, min_train_size=1)
+    index.train(ids, vectors)
+
+    for i in (0, 57, 199):
+        assert ids[i] in index.probe(vectors[i])
+    assert len(index.probe(vectors[0])) < len(ids)
+
+
+def test_approximate_search_matches_exact_when_probing_all_lists() -> None:
+    """全クラスタを走査する設定では近似検索と全件探索の結果が一致する."""
+    client = EmbeddingClient(DeterministicFakeEmbedding(size=16))
+    exact = HybridSearch(client)
+    approximate = HybridSearch(client, ann_index=IVFIndex(n_lists=4, n_probe=4, min_train_size=10))
+    playbook = Playbook(bullets=[_bullet(str(i), f"bullet number {i}") for i in range(30)])
+    query = SearchQuery(query_text="number 7", top_k=5)
+
+    expected = [r.bullet.id for r in exact.search(query, playbook)]
+    actual = [r.bullet.id for r in approximate.search(query, playbook)]
+
+    assert approximate.ann_index.is_trained
+    assert actual == expected
+
+
+@pytest.mark.parametrize(("dtype", "atol"), [("float16", 1e-3), ("int8", 1e-2)])
+def test_embedding_store_roundtrip(tmp_path: Path, dtype: str, atol: float) -> None:
+    """量子化して保存したembeddingをmemmapで読み戻せ、テキストが変わった行は返さない."""
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(3, 8)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    EmbeddingStore(tmp_path / "ds.embeddings").save("m", ["a", "b", "c"], ["ha", "hb", "hc"], matrix, dtype)
+
+    store = EmbeddingStore(tmp_path / "ds.embeddings")
+    assert store.load()
+    np.testing.assert_allclose(store.get("b", "hb"), matrix[1], atol=atol)
+    assert store.get("b", "changed") is None
+    assert store.get("missing", "hb") is None
+    found, vectors = store.get_many(["c", "missing", "a", "b"], ["hc", "hb", "ha", "changed"])
+    assert found.tolist() == [0, 2]
+    np.testing.assert_allclose(vectors, matrix[[2, 0]], atol=atol)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_embedding_store_concurrent_saves_keep_one_generation(tmp_path: Path, dtype: str) -> None:
+    """複数の書き込みが同時に保存しても、一時ファイルや参照されない世代のファイルを残さない."""
+    matrix = np.ones((2, 4), dtype=np.float32)
+    (tmp_path / "ds.embeddings.0123456789ab.npy").write_bytes(b"orphan")
+
+    def save(worker: int) -> None:
+        EmbeddingStore(tmp_path / "ds.embeddings").save("m", ["a", "b"], [f"ha{worker}", "hb"], matrix, dtype)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(save, range(8)))
+
+    store = EmbeddingStore(tmp_path / "ds.embeddings")
+    assert store.load()
+    meta = json.loads(store.meta_path.read_text(encoding="utf-8"))
+    generation_files = {meta["vectors"], meta["scales"]} - {None}
+    assert {p.name for p in tmp_path.iterdir()} == {"ds.embeddings.json", "ds.embeddings.lock", *generation_files}
+
+
+def test_save_embeddings_skips_rewrite_below_stale_ratio(tmp_path: Path) -> None:
+    """古い行の割合が閾値以下の間はサイドカーファイルを書き直さず、超えたら書き直す."""
+    search = HybridSearch(EmbeddingClient(DeterministicFakeEmbedding(size=16)))
+    path = tmp_path / "ds.embeddings"
+    playbook = Playbook(bullets=[_bullet(f"b{i}", f"topic{i}") for i in range(20)])
+    assert search.save_embeddings(path, playbook, min_stale_ratio=0.1)
+
+    playbook.bullets.append(_bullet("new0", "fresh"))
+    assert not search.save_embeddings(path, playbook, min_stale_ratio=0.1)
+    playbook.bullets = playbook.bullets[1:]
+    assert not search.save_embeddings(path, playbook, min_stale_ratio=0.1)
+    playbook.bullets.append(_bullet("new1", "fresh again"))
+    assert search.save_embeddings(path, playbook, min_stale_ratio=0.1)
+    assert len(search.embedding_store) == len(playbook.bullets)
+
+
+def test_search_reuses_saved_embeddings(tmp_path: Path) -> None:
+    """サイドカーを読み込んだHybridSearchは、保存済みの行をまとめて読み、テキストが変わったBulletだけを再embeddingする."""
+    client = EmbeddingClient(DeterministicFakeEmbedding(size=16))
+    playbook = Playbook(bullets=[_bullet("a", "apple pie"), _bullet("b", "banana bread"), _bullet("c", "cherry")])
+    saved = HybridSearch(client)
+    saved.save_embeddings(tmp_path / "ds.embeddings", playbook)
+
+    playbook.bullets[1].searchable_text = "banana split"
+    search = HybridSearch(client)
+    search.load_embeddings(tmp_path / "ds.embeddings")
+    with (
+        patch.object(client, "embed_documents", wraps=client.embed_documents) as embed_documents,
+        patch.object(EmbeddingStore, "get", side_effect=AssertionError("rows must be read in bulk")),
+    ):
+        search.search(SearchQuery(query_text="apple"), playbook)
+
+    embed_documents.assert_called_once_with(["banana split"])
+    rows = search.vector_index.rows(["a", "c"])
+    np.testing.assert_allclose(search.vector_index.matrix[rows], saved.vector_index.matrix[[0, 2]], atol=1e-3)
+
+
+@pytest.mark.parametrize(
+    ("reducer", "expected_dim"),
+    [(TruncationReducer(16), 16), (PCAReducer(8, min_fit_size=4), 8)],
+)
+def test_reduced_search_keeps_top_results(reducer: TruncationReducer, expected_dim: int) -> None:
+    """次元削減した検索でも、登録済みテキストと同じクエリの最上位は元の次元と同じBulletになる."""
+    texts = [f"topic{i} detail{i} note{i % 3}" for i in range(12)]
+    playbook = Playbook(bullets=[_bullet(f"b{i}", text) for i, text in enumerate(texts)])
+    client = EmbeddingClient(HashingEmbeddings(dimension=16))
+    baseline = HybridSearch(client, alpha=1.0)
+    reduced = HybridSearch(client, alpha=1.0, reducer=reducer)
+
+    for text in texts:
+        query = SearchQuery(query_text=text, top_k=1)
+        assert reduced.search(query, playbook)[0].bullet.id == baseline.search(query, playbook)[0].bullet.id
+    assert reduced.vector_index.matrix.shape == (len(texts), expected_dim)
+
+
+def test_pca_projection_is_saved_with_embeddings(tmp_path: Path) -> None:
+    """学習済みのPCA射影はサイドカーと一緒に保存され、次のプロセスはembeddingを再生成しない."""
+    client = EmbeddingClient(HashingEmbeddings(dimension=16))
+    playbook = Playbook(bullets=[_bullet(f"b{i}", f"topic{i} detail{i}") for i in range(6)])
+    first = HybridSearch(client, reducer=PCAReducer(4, min_fit_size=4))
+    first.save_embeddings(tmp_path / "ds.embeddings", playbook)
+
+    second = HybridSearch(client, reducer=PCAReducer(4, min_fit_size=4))
+    second.load_embeddings(tmp_path / "ds.embeddings")
+    with patch.object(client, "embed_documents", wraps=client.embed_documents) as embed_documents:
+        second.search(SearchQuery(query_text="topic1"), playbook)
+
+    embed_documents.assert_not_called()
+    assert second.reducer.signature == first.reducer.signature
+    np.testing.assert_allclose(second.vector_index.matrix, first.vector_index.matrix, atol=1e-2)
+
+
+def test_result_cache_is_invalidated_by_playbook_save(tmp_path: Path) -> None:
+    """同じバージョンのPlaybookへの同じクエリはキャッシュから返し、保存でバージョンが上がると検索し直す."""
+    cache = SearchResultCache()
+    search = HybridSearch(EmbeddingClient(DeterministicFakeEmbedding(size=16)), result_cache=cache)
+    store = PlaybookStore(str(tmp_path))
+    playbook = Playbook(bullets=[_bullet("a", "apple pie"), _bullet("b", "banana bread")])
+    store.save("ds", playbook)
+    query = SearchQuery(query_text="banana", top_k=1)
+
+    first = search.search(query, playbook)
+    second = search.search_many([query, SearchQuery(query_text="banana", top_k=2)], playbook)
+    assert second[0] == first
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 2}
+
+    playbook.bullets.append(_bullet("c", "banana banana banana"))
+    store.save("ds", playbook)
+    assert search.search(query, store.load("ds"))[0].bullet.id == "c"
+    assert playbook.metadata.version == 2
+
+
+@pytest.mark.parametrize("shared_search", [True, False])
+def test_result_cache_separates_playbooks_with_same_metadata(shared_search: bool) -> None:  # noqa: FBT001
+    """同じメタデータを持つ別のPlaybookや、変更した未保存のPlaybookにはキャッシュした結果を返さない."""
+    cache = SearchResultCache()
+    client = EmbeddingClient(DeterministicFakeEmbedding(size=16))
+    searches = [HybridSearch(client, result_cache=cache) for _ in range(1 if shared_search else 2)]
+    apples = Playbook(bullets=[_bullet("a", "apple pie")])
+    bananas = Playbook(metadata=apples.metadata.model_copy(), bullets=[_bullet("b", "banana bread")])
+    query = SearchQuery(query_text="pie", top_k=1)
+
+    assert searches[0].search(query, apples)[0].bullet.id == "a"
+    assert searches[-1].search(query, bananas)[0].bullet.id == "b"
+    assert searches[0].search(query, apples)[0].bullet.id == "a"
+
+    apples.bullets.append(_bullet("c", "cherry pie pie"))
+    assert searches[0].search(query, apples)[0].bullet.id == "c"
+
+
+@pytest.mark.parametrize("top_k", [1, 3, 10])
+def test_sharded_search_merges_top_k(tmp_path: Path, top_k: int) -> None:
+    """各シャードの上位k件が正規化前のスコアで統合し直され、データセット名が付与される."""
+    store = PlaybookStore(str(tmp_path))
+    store.save("left", Playbook(bullets=[_bullet("l1", "apple pie recipe"), _bullet("l2", "banana bread")]))
+    store.save("right", Playbook(bullets=[_bullet("r1", "apple apple juice"), _bullet("r2", "cherry tart")]))
+    sharded = ShardedSearch(
+        lambda: HybridSearch(EmbeddingClient(DeterministicFakeEmbedding(size=16)), alpha=0.0),
+        store,
+        max_workers=2,
+    )
+    query = SearchQuery(query_text="apple", top_k=top_k, min_confidence=0.0)
+
+    results = sharded.search(query, ["left", "right", "left"])
+    sharded.close()
+
+    candidates = sorted(
+        (
+            (dataset, r)
+            for dataset in ["left", "right"]
+            for r in HybridSearch(EmbeddingClient(DeterministicFakeEmbedding(size=16)), alpha=0.0).search(
+                query, store.load(dataset)
+            )
+        ),
+        key=lambda item: -item[1].raw_bm25_score,
+    )
+    assert [(r.dataset, r.bullet.id) for r in results] == [(d, r.bullet.id) for d, r in candidates[:top_k]]
+    assert [r.combined_score for r in results] == sorted((r.combined_score for r in results), reverse=True)
+
+
+def test_sharded_search_ranks_more_relevant_shard_first(tmp_path: Path) -> None:
+    """シャード内で正規化したスコアではなく、シャード間で比較できるスコアで全体の上位k件を選ぶ."""
+    store = PlaybookStore(str(tmp_path))
+    store.save("relevant", Playbook(bullets=[_bullet("a1", "apple pie"), _bullet("a2", "apple pie")]))
+    store.save("other", Playbook(bullets=[_bullet("b1", "banana bread"), _bullet("c1", "cherry tart")]))
+    sharded = ShardedSearch(
+        lambda: HybridSearch(EmbeddingClient(DeterministicFakeEmbedding(size=16)), alpha=1.0),
+        store,
+        max_workers=2,
+    )
+
+    results = sharded.search(SearchQuery(query_text="apple pie", top_k=2), ["other", "relevant"])
+    sharded.close()
+
+    assert [(r.dataset, r.bullet.id) for r in results] == [("relevant", "a1"), ("relevant", "a2")]
+    assert [r.raw_vector_score for r in results] == pytest.approx([1.0, 1.0])
+
+
+@pytest.mark.parametrize(
+    ("section_filter", "expected_counts"),
+    [
+        (None, {"indexed": 3, "after_confidence": 3, "candidates": 3, "returned": 2}),
+        (["tips"], {"indexed": 3, "after_confidence": 3, "after_section": 1, "candidates": 1, "returned": 1}),
+    ],
+)
+def test_explain_reports_stages_and_scores(
+    search: HybridSearch,
+    section_filter: list[str] | None,
+    expected_counts: dict[str, int],
+) -> None:
+    """explainはステージ別処理時間・候補数・スコア内訳を返し、プロセス全体の集計にも加わる."""
+    playbook = Playbook(
+        bullets=[
+            _bullet("a", "apple pie"),
+            _bullet("b", "banana bread", section="tips"),
+            _bullet("c", "apple banana smoothie"),
+        ]
+    )
+    query = SearchQuery(query_text="apple", top_k=2, section_filter=section_filter)
+    SEARCH_METRICS.reset()
+
+    explanation = search.explain(query, playbook)
+    search.search(query, playbook)
+
+    assert {"sync_index", "embed_documents", "embed_query", "bm25_score", "fusion"} <= set(explanation.stage_times_ms)
+    assert {k: explanation.candidate_counts[k] for k in expected_counts} == expected_counts
+    assert explanation.results == search.search(query, playbook)
+    assert [b.bullet_id for b in explanation.score_breakdowns] == [r.bullet.id for r in explanation.results]
+    for breakdown, result in zip(explanation.score_breakdowns, explanation.results, strict=True):
+        assert breakdown.combined_score == result.combined_score
+        assert (breakdown.raw_bm25_score > 0) == (result.bullet.id in {"a", "c"})
+    metrics = SEARCH_METRICS.snapshot()
+    assert metrics["searches"] == 3
+    assert metrics["candidates"]["returned"]["total"] == 3 * expected_counts["returned"]
@@ -0,0 +1,347 @@
+"""PlaybookStoreと近似重複インデックスのテスト."""
+
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from src.components.playbook_store.cached_store import CachedPlaybookStore
+from src.components.playbook_store.dedup import NearDuplicateIndex, create_duplicate_index, shingles
+from src.components.playbook_store.log_store import LoggedPlaybookStore
+from src.components.playbook_store.models import Bullet, Playbook
+from src.components.playbook_store.sqlite_store import SQLitePlaybookStore
+from src.components.playbook_store.store import PlaybookStore, PlaybookVersionConflictError
+
+
+def _bullet(bullet_id: str, text: str) -> Bullet:
+    return Bullet(id=bullet_id, section="general", content=text, searchable_text=text)
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("ＡＢＣ d", {"abc", "bc ", "c d"}),
+        ("富士山", {"富士山"}),
+        ("   ", set()),
+    ],
+)
+def test_shingles(text: str, expected: set[str]) -> None:
+    """NFKC正規化・小文字化した文字3-gramに分割される."""
+    assert shingles(text) == expected
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("Always check the API docs before calling an unfamiliar endpoint.", "a"),
+        ("Always check the API docs before calling an unfamiliar endpoint!", "a"),
+        ("回答する前に選択肢をすべて読み比べること。", "b"),
+        ("Prefer list comprehensions over explicit loops.", None),
+    ],
+)
+def test_find_duplicate(text: str, expected: str | None) -> None:
+    """ほぼ同じ本文のBulletだけが近似重複として見つかる."""
+    index = NearDuplicateIndex()
+    index.sync(
+        [
+            _bullet("a", "Always check the API docs before calling an unfamiliar endpoint."),
+            _bullet("b", "回答する前に選択肢をすべて読み比べること。"),
+        ]
+    )
+    assert index.find_duplicate(text) == expected
+
+
+def test_sync_and_duplicate_clusters() -> None:
+    """差分同期で更新・削除が反映され、近似重複がクラスタにまとまる."""
+    index = NearDuplicateIndex(threshold=0.7)
+    index.sync(
+        [
+            _bullet("a", "Read every option carefully before answering the question."),
+            _bullet("b", "Read every option carefully before answering the question!"),
+            _bullet("c", "Use a dictionary for constant time lookups."),
+            _bullet("d", "Read every option carefully before answering the questions."),
+        ]
+    )
+    assert index.duplicate_clusters() == [["a", "b", "d"]]
+
+    index.sync(
+        [
+            _bullet("a", "Read every option carefully before answering the question."),
+            _bullet("b", "Validate inputs at the system boundary."),
+            _bullet("c", "Use a dictionary for constant time lookups."),
+        ]
+    )
+    assert len(index) == 3
+    assert "d" not in index
+    assert index.duplicate_clusters() == []
+
+
+def test_invalid_bands() -> None:
+    """署名長が帯の数で割り切れない場合はエラーになる."""
+    with pytest.raises(ValueError, match="divisible"):
+        NearDuplicateIndex(num_perm=100, bands=16)
+
+
+@pytest.mark.parametrize("file_format", ["json", "arrow"])
+def test_store_file_formats_round_trip(tmp_path: Path, file_format: str) -> None:
+    """どちらの形式でも保存した内容を復元でき、列ごとにも読み込める."""
+    store = PlaybookStore(str(tmp_path), file_format=file_format)
+    playbook = Playbook(bullets=[_bullet("a", "apple"), _bullet("b", "banana")])
+    playbook.bullets[1].keywords = ["fruit", "バナナ"]
+    playbook.bullets[1].harmful = 2
+    store.save("ds", playbook)
+    assert store.playbook_path("ds").name == f"ds.{file_format}"
+
+    restored = store.load("ds")
+    assert restored.bullets == playbook.bullets
+    assert restored.metadata == playbook.metadata
+
+    columns = store.load_columns("ds")
+    assert len(columns) == 2  # noqa: PLR2004
+    assert columns.column("id") == ["a", "b"]
+    assert columns[-1] == playbook.bullets[1]
+    assert list(columns) == playbook.bullets
+
+
+def test_copy_from_keeps_metadata_across_formats(tmp_path: Path) -> None:
+    """形式の変換ではバージョンを変えず、キャッシュ付きストアもArrow形式のバージョンを読み取れる."""
+    source = PlaybookStore(str(tmp_path))
+    playbook = Playbook(bullets=[_bullet("a", "apple")])
+    source.save("ds", playbook)
+    source.save("ds", playbook)
+
+    target = CachedPlaybookStore(str(tmp_path), file_format="arrow")
+    target.copy_from(source, "ds")
+    converted = target.load("ds")
+    assert converted.metadata == source.load("ds").metadata
+    assert converted.metadata.version == 2  # noqa: PLR2004
+    assert target.load("ds") is converted
+
+
+def test_cached_store_reuses_parsed_playbook(tmp_path: Path) -> None:
+    """ファイルが変化しない限り同じPlaybookを返し、saveでキャッシュを置き換える."""
+    store = CachedPlaybookStore(str(tmp_path))
+    assert store.load("ds").bullets == []
+
+    playbook = Playbook(bullets=[_bullet("a", "apple")])
+    store.save("ds", playbook)
+    assert store.load("ds") is playbook
+    assert store.load("ds") is playbook
+
+    store.invalidate("ds")
+    reloaded = store.load("ds")
+    assert reloaded is not playbook
+    assert reloaded.bullets == playbook.bullets
+    assert store.stats() == {"hits": 2, "misses": 2, "reloads": 0, "size": 1}
+
+
+@pytest.mark.parametrize("same_stat", [False, True])
+def test_cached_store_detects_external_writes(tmp_path: Path, same_stat: bool) -> None:  # noqa: FBT001
+    """他のストアが保存するとmtime・サイズ・バージョンの変化を検出して読み直す."""
+    store = CachedPlaybookStore(str(tmp_path))
+    store.save("ds", Playbook(bullets=[_bullet("a", "apple")]))
+    cached = store.load("ds")
+    stat = store.playbook_path("ds").stat()
+
+    other = PlaybookStore(str(tmp_path))
+    external = other.load("ds")
+    external.bullets[0].helpful = 7
+    other.save("ds", external)
+    if same_stat:
+        os.utime(store.playbook_path("ds"), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    reloaded = store.load("ds")
+    assert reloaded is not cached
+    assert reloaded.bullets[0].helpful == 7
+    assert store.stats()["reloads"] == 1
+
+
+def test_logged_store_appends_only_changes(tmp_path: Path) -> None:
+    """保存は差分だけを追記し、別のストアからスナップショットとログの再生で同じ内容を復元できる."""
+    store = LoggedPlaybookStore(str(tmp_path))
+    playbook = store.load("ds")
+    playbook.bullets = [_bullet("a", "apple"), _bullet("b", "banana"), _bullet("c", "cherry")]
+    store.save("ds", playbook)
+
+    playbook.bullets[0].helpful += 2
+    playbook.bullets[1].content = "banana bread"
+    playbook.bullets = [b for b in playbook.bullets if b.id != "c"]
+    playbook.bullets.append(_bullet("d", "date"))
+    store.save("ds", playbook)
+
+    lines = store.log_path("ds").read_text().splitlines()
+    assert [line.split('"type":"')[1].split('"')[0] for line in lines[4:]] == [
+        "COUNTER",
+        "UPDATE",
+        "ADD",
+        "DELETE",
+        "COMMIT",
+    ]
+    restored = LoggedPlaybookStore(str(tmp_path)).load("ds")
+    assert restored.bullets == playbook.bullets
+    assert restored.metadata.version == playbook.metadata.version == 2
+
+
+@pytest.mark.parametrize("compact_threshold", [1, 1000])
+def test_logged_store_compaction_and_torn_tail(tmp_path: Path, compact_threshold: int) -> None:
+    """畳み込み済みのCOMMITと書き込み途中の末尾は再生しない."""
+    store = LoggedPlaybookStore(str(tmp_path), compact_threshold=compact_threshold)
+    playbook = Playbook(bullets=[_bullet("a", "apple")])
+    store.save("ds", playbook)
+    playbook.bullets[0].helpful += 1
+    store.save("ds", playbook)
+    assert store.log_path("ds").exists() == (compact_threshold > 1)
+
+    with store.log_path("ds").open("a") as f:
+        f.write('{"type":"COUNTER","bullet_id":"a","helpful":5}\n{"type":"COMMIT","vers')
+    restored = LoggedPlaybookStore(str(tmp_path)).load("ds")
+    assert restored.bullets[0].helpful == 1
+    assert restored.metadata.version == 2
+
+
+def test_sqlite_store_round_trip_and_fine_grained_updates(tmp_path: Path) -> None:
+    """保存・読み込みの往復と、1件単位の更新・検索がPlaybookのバージョンを進める."""
+    store = SQLitePlaybookStore(str(tmp_path))
+    assert store.load("ds").bullets == []
+
+    playbook = Playbook(bullets=[_bullet("a", "apple"), _bullet("b", "banana"), _bullet("c", "cherry")])
+    playbook.bullets[1].section = "pitfalls"
+    store.save("ds", playbook)
+    playbook.bullets = playbook.bullets[:2]
+    store.save("ds", playbook)
+    restored = SQLitePlaybookStore(str(tmp_path)).load("ds")
+    assert restored.bullets == playbook.bullets
+    assert restored.metadata.version == 2
+
+    store.upsert("ds", [_bullet("d", "date"), _bullet("a", "avocado")])
+    store.increment_counters("ds", "b", helpful=1, harmful=3)
+    store.delete("ds", ["missing"])
+    assert store.get("ds", "a").content == "avocado"
+    assert store.get("ds", "c") is None
+    assert [b.id for b in store.find("ds")] == ["a", "b", "d"]
+    assert [b.id for b in store.find("ds", section="pitfalls")] == ["b"]
+    assert [b.id for b in store.find("ds", min_confidence=0.5)] == ["a", "d"]
+    assert store.load("ds").metadata.version == 5  # noqa: PLR2004
+
+
+def test_sqlite_store_upserts_more_bullets_than_parameter_limit(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """ホストパラメーター数の上限を超える件数のBulletもupsertできる."""
+    connect = sqlite3.connect
+
+    def limited_connect(*args: object, **kwargs: object) -> sqlite3.Connection:
+        conn = connect(*args, **kwargs)
+        conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 50)
+        return conn
+
+    store = SQLitePlaybookStore(str(tmp_path))
+    store.save("ds", Playbook(bullets=[_bullet("b0", "existing")]))
+    monkeypatch.setattr(sqlite3, "connect", limited_connect)
+    bullets = [_bullet(f"b{i}", f"text {i}") for i in range(200)]
+    store.upsert("ds", bullets)
+
+    assert [b.id for b in store.load("ds").bullets] == [b.id for b in bullets]
+    assert store.get("ds", "b0").content == "text 0"
+
+
+def test_sqlite_store_copies_and_rejects_file_methods(tmp_path: Path) -> None:
+    """copy_fromとload_columnsはデータベースを使い、ファイルのパスとロックは拒否する."""
+    source = PlaybookStore(str(tmp_path / "json"))
+    source.save("ds", Playbook(bullets=[_bullet("a", "apple"), _bullet("b", "banana")]))
+    store = SQLitePlaybookStore(str(tmp_path / "sqlite"))
+
+    copied = store.copy_from(source, "ds")
+
+    restored = store.load("ds")
+    assert restored.bullets == copied.bullets
+    assert restored.metadata == copied.metadata
+    assert store.load_columns("ds").column("id") == ["a", "b"]
+    assert not list((tmp_path / "sqlite").glob("*.json"))
+    store.save("ds", restored)
+    assert store.load("ds").metadata.version == 2  # noqa: PLR2004
+    with pytest.raises(NotImplementedError):
+        store.playbook_path("ds")
+    with pytest.raises(NotImplementedError), store.lock("ds"):
+        pass
+
+
+@pytest.mark.parametrize(
+    "tail",
+    [
+        '{"type":"COUNTER","bullet_id":"a","helpful":5}\n{"type":"COMMIT","vers',
+        '{"type":"COUNTER","bullet_id":"a","helpful":100}\n',
+    ],
+)
+def test_logged_store_saves_after_crashed_tail(tmp_path: Path, tail: str) -> None:
+    """クラッシュした保存が残した末尾は次の保存の前に切り詰め、後続のCOMMITで適用しない."""
+    LoggedPlaybookStore(str(tmp_path)).save("ds", Playbook(bullets=[_bullet("a", "apple")]))
+    store = LoggedPlaybookStore(str(tmp_path))
+    with store.log_path("ds").open("a") as f:
+        f.write(tail)
+
+    playbook = store.load("ds")
+    playbook.bullets.append(_bullet("b", "banana"))
+    store.save("ds", playbook)
+    playbook.bullets[1].harmful += 1
+    store.save("ds", playbook)
+
+    restored = LoggedPlaybookStore(str(tmp_path)).load("ds")
+    assert [(b.id, b.helpful, b.harmful) for b in restored.bullets] == [("a", 0, 0), ("b", 0, 1)]
+    assert restored.metadata.version == 3  # noqa: PLR2004
+    assert '"bullet_id":"a"' not in store.log_path("ds").read_text()
+
+
+@pytest.mark.parametrize("store_class", [PlaybookStore, CachedPlaybookStore, LoggedPlaybookStore, SQLitePlaybookStore])
+def test_save_rejects_stale_version(tmp_path: Path, store_class: type[PlaybookStore]) -> None:
+    """読み込み後に他のストアが保存した場合は保存を拒否し、updateは最新のPlaybookに適用し直す."""
+    first, second = store_class(str(tmp_path)), store_class(str(tmp_path))
+    first.save("ds", Playbook(bullets=[_bullet("a", "apple")]))
+    mine, theirs = first.load("ds"), second.load("ds")
+
+    theirs.bullets.append(_bullet("b", "banana"))
+    second.save("ds", theirs)
+    mine.bullets[0].helpful += 1
+    with pytest.raises(PlaybookVersionConflictError) as exc_info:
+        first.save("ds", mine)
+    assert (exc_info.value.expected, exc_info.value.actual) == (1, 2)
+
+    def add_helpful(playbook: Playbook) -> None:
+        playbook.bullets[0].helpful += 1
+
+    saved = first.update("ds", add_helpful, mine)
+    restored = store_class(str(tmp_path)).load("ds")
+    assert [(b.id, b.helpful) for b in restored.bullets] == [("a", 1), ("b", 0)]
+    assert restored.metadata.version == saved.metadata.version == 3  # noqa: PLR2004
+
+
+@pytest.mark.parametrize("store_class", [PlaybookStore, LoggedPlaybookStore])
+def test_concurrent_updates_keep_every_change(tmp_path: Path, store_class: type[PlaybookStore]) -> None:
+    """複数のストアから並行にupdateしても更新が失われず、一時ファイルも残らない."""
+    store_class(str(tmp_path)).save("ds", Playbook(bullets=[_bullet("a", "apple")]))
+
+    def add_helpful(playbook: Playbook) -> None:
+        playbook.bullets[0].helpful += 1
+
+    def worker(_: int) -> None:
+        store = store_class(str(tmp_path))
+        for _ in range(10):
+            store.update("ds", add_helpful, max_retries=100)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(worker, range(4)))
+    restored = store_class(str(tmp_path)).load("ds")
+    assert restored.bullets[0].helpful == 40  # noqa: PLR2004
+    assert restored.metadata.version == 41  # noqa: PLR2004
+    assert not list(tmp_path.glob(".*.tmp"))
+
+
+def test_create_duplicate_index_is_opt_in() -> None:
+    """閾値を指定しない場合は近似重複インデックスを生成しない."""
+    assert create_duplicate_index(None) is None
+    index = create_duplicate_index(0.7, num_perm=64, bands=8)
+    assert index is not None
+    assert (index.threshold, index.num_perm, index.bands) == (0.7, 64, 8)